@@ -0,0 +1,10 @@
+import sys
+from spacebotty.engine import serve
+from spacebotty.profiles import PROFILES
+
+# All bots in one deployment: shared connection pools, caches and queue worker.
+# Updates are routed by ?bot=<name>, or by each bot's own <NAME>_WEBHOOK_SECRET header.
+engine = serve(PROFILES.values(), globals())
+
+if __name__ == "__main__":
+    engine.main(sys.argv[1:])
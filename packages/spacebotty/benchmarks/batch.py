@@ -0,0 +1,62 @@
+"""Batch generation throughput: one request per prompt vs. multi-prompt requests (`batch.complete_many`).
+
+    python packages/spacebotty/benchmarks/batch.py [--live] [prompts]
+
+By default the model is simulated: each request costs OVERHEAD seconds plus PER_ANSWER
+seconds per answer it contains, and at most BATCH_CONCURRENCY requests run at once (the
+rate limit both paths share). `--live` calls OpenAI with OPENAI_API_KEY instead.
+Input tokens are estimated at 4 characters per token.
+"""
+import re, sys, time, threading
+from concurrent.futures import ThreadPoolExecutor
+from spacebotty import batch, llm
+from spacebotty.engine import Bot
+from spacebotty.profiles import PROFILES
+
+OVERHEAD, PER_ANSWER = 0.25, 0.05
+
+class Meter:
+    def __init__(self, generate):
+        self.generate, self.requests, self.chars = generate, 0, 0
+        self.lock = threading.Lock()
+    def __call__(self, prompt):
+        with self.lock: self.requests += 1; self.chars += len(prompt)
+        return self.generate(prompt)
+
+def simulated(prompt):
+    markers = re.findall(r"^<<<(\d+)>>>$", prompt, re.M)
+    time.sleep(OVERHEAD + PER_ANSWER * max(len(markers), 1))
+    if not markers: return llm.Completion("answer")
+    return llm.Completion("\n".join(f"<<<{n}>>>\nanswer {n}" for n in markers))
+
+def workload(n, name="secondhand"):
+    # A bot's presets rendered through their templates (a seller's bulk run), repeated up to n prompts.
+    bot = Bot(PROFILES[name])
+    prompts = [(bot.system_prompt, bot.prompt(c, arg)) for c, arg in bot.profile.presets if c in bot.llm_commands]
+    return (prompts * (n // len(prompts) + 1))[:n]
+
+def run(label, prompts, generate, fn):
+    meter = Meter(generate); started = time.perf_counter()
+    answers = fn([p for _, p in prompts], meter)
+    elapsed = time.perf_counter() - started
+    assert len(answers) == len(prompts)
+    system = len(prompts[0][0]) * meter.requests
+    print(f"{label:<22}{meter.requests:>9}{elapsed:>9.2f}{len(prompts) / elapsed:>11.1f}{(meter.chars + system) // 4:>13}")
+
+def main(argv):
+    live = "--live" in argv
+    n = int(next((a for a in argv if a.isdigit()), "36"))
+    prompts = workload(n); system = prompts[0][0]
+    generate = (lambda p: llm.complete(system, p)) if live else simulated
+    print(f"{n} prompts, BATCH_SIZE={batch.BATCH_SIZE}, BATCH_CONCURRENCY={batch.BATCH_CONCURRENCY}, "
+          f"{'live OpenAI' if live else 'simulated model'}")
+    print(f"{'path':<22}{'requests':>9}{'seconds':>9}{'prompts/s':>11}{'input tok':>13}")
+
+    def single(ps, meter):
+        with ThreadPoolExecutor(max_workers=batch.BATCH_CONCURRENCY) as pool: return list(pool.map(meter, ps))
+    run("one call per prompt", prompts, generate, single)
+    run(f"multi-prompt x{batch.BATCH_SIZE}", prompts, generate,
+        lambda ps, meter: batch.complete_many(system, ps, generate=meter))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
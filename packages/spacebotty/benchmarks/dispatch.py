@@ -0,0 +1,43 @@
+"""Command dispatch microbenchmark: the command table vs. the old startswith chain, for every bot.
+
+    python packages/spacebotty/benchmarks/dispatch.py [iterations]
+
+Only routing is timed (text -> handler, arg); no handler runs and nothing touches the network.
+"""
+import sys, timeit
+from spacebotty.engine import Bot, Command, Profile
+from spacebotty.profiles import PROFILES
+
+BUILTINS = ("/start", "/premium", "/buy", "/status", "/presets", "/redeem")
+
+def legacy_route(bot, text):
+    # The pre-table dispatch: first prefix match wins, then the command is cut out of the text.
+    for command in BUILTINS + bot.llm_commands:
+        if text.startswith(command): return command, text.replace(command, "", 1).strip()
+    return None, text
+
+def synthetic(count=48):
+    # A bot with dozens of templates, to show how each dispatch scales with the table size.
+    commands = {f"/template{i:02d}": Command("topic", "usage", "{topic}") for i in range(count)}
+    presets = [(c, "some topic") for c in list(commands)[::6]]
+    return Profile("synthetic", "Synthetic", "", commands, presets, "", "")
+
+def messages(bot):
+    texts = [f"{command} {arg}" for command, arg in bot.profile.presets]
+    texts += [f"{command}@{bot.name}_bot {arg}" for command, arg in bot.profile.presets]
+    texts += ["/status", "/redeem VIP-2025", "hello there", "/unknown command"]
+    return texts
+
+def bench(fn, texts, n):
+    return min(timeit.repeat(lambda: [fn(t) for t in texts], number=n, repeat=5)) / (n * len(texts))
+
+def main(n=20000):
+    print(f"{'bot':<12}{'commands':>9}{'table ns':>10}{'chain ns':>10}")
+    for profile in [*PROFILES.values(), synthetic()]:
+        bot = Bot(profile); texts = messages(bot)
+        table = bench(bot.route, texts, n)
+        chain = bench(lambda t: legacy_route(bot, t), texts, n)
+        print(f"{bot.name:<12}{len(bot.routes):>9}{table * 1e9:>10.0f}{chain * 1e9:>10.0f}")
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,129 @@
+"""Cold start per app: import time (`-X importtime` and wall clock) and the first requests of a fresh process.
+
+    python packages/spacebotty/benchmarks/startup.py [--runs 5] [--apps a,b] [--save | --check [--strict]]
+
+Each run is a new interpreter that imports `apps/<app>/api/telegram.py` the way Vercel does,
+then serves a health-check GET, a `/status` update and an LLM command through `handler`,
+against `spacebotty.standin`. Reported are medians over the runs: import ms, first GET,
+first /status and first LLM command ms, the modules loaded after the import, and whether
+`requests` was imported before the first LLM call (it should not be). A separate
+`-X importtime` run lists the slowest imports.
+
+`--save` writes baselines/startup.json; `--check` exits 1 when the module count grows
+beyond --tolerance or `requests` comes back on the light path, and with `--strict` also
+when import or first-request times regress.
+"""
+import os, sys, json, argparse, statistics, subprocess
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+APPS_DIR = HERE.parents[2] / "apps"
+BASELINE = HERE / "baselines" / "startup.json"
+APPS = ("linkedin", "creators", "secondhand")
+
+# Runs in the fresh interpreter; only stdlib modules the handler needs anyway.
+CHILD = r"""
+import io, sys, json, time, importlib.util
+from http.client import HTTPMessage
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("api", sys.argv[1])
+module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)
+out = {"import_ms": (time.perf_counter() - started) * 1000, "modules": len(sys.modules)}
+profile = next(iter(module.engine.bots.values())).profile
+command, arg = profile.presets[0]
+
+def call(method, update=None):
+    h = module.handler.__new__(module.handler)
+    body = json.dumps(update).encode() if update else b""
+    h.rfile, h.wfile, h.command, h.path = io.BytesIO(body), io.BytesIO(), method, "/api/telegram"
+    h.request_version, h.requestline, h.client_address = "HTTP/1.1", f"{method} /api/telegram HTTP/1.1", ("127.0.0.1", 0)
+    h.headers = HTTPMessage(); h.headers["Content-Length"] = str(len(body)); h.headers["X-Telegram-Bot-Api-Secret-Token"] = "startup"
+    h.log_message = lambda *args: None
+    t = time.perf_counter(); getattr(h, "do_" + method)(); return (time.perf_counter() - t) * 1000
+
+message = lambda i, text: {"update_id": i, "message": {"message_id": i, "chat": {"id": 7}, "from": {"id": 7}, "text": text}}
+out["get_ms"] = call("GET")
+out["status_ms"] = call("POST", message(1, "/status"))
+out["requests_before_llm"] = "requests" in sys.modules
+out["llm_ms"] = call("POST", message(2, f"{command} {arg}"))
+print(json.dumps(out))
+"""
+
+def environment(standin, apps):
+    env = dict(os.environ, **standin.env(), ASYNC_WEBHOOK="false", TRACE_LOG="false")
+    for app in apps:
+        env[f"{app.upper()}_BOT_TOKEN"] = f"100{APPS.index(app)}:startup"
+        env[f"{app.upper()}_WEBHOOK_SECRET"] = "startup"
+    return env
+
+def run(app, env):
+    path = str(APPS_DIR / app / "api" / "telegram.py")
+    out = subprocess.run([sys.executable, "-c", CHILD, path], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def importtime(app, env, top=5):
+    """The slowest imports (self time, ms) of the app module, from `python -X importtime`."""
+    code = "import importlib.util, sys; s = importlib.util.spec_from_file_location('api', sys.argv[1]); " \
+           "s.loader.exec_module(importlib.util.module_from_spec(s))"
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code, str(APPS_DIR / app / "api" / "telegram.py")],
+                         env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[0].startswith("import time:") and parts[1].strip().isdigit():
+            rows.append((int(parts[0].split(":")[1]) / 1000, parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+COLUMNS = ("import_ms", "get_ms", "status_ms", "llm_ms", "modules")
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--apps", default=",".join(APPS))
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--check", action="store_true", help="compare with the baseline, exit 1 on regressions")
+    parser.add_argument("--strict", action="store_true", help="timing regressions fail --check too")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+    apps = [a for a in args.apps.split(",") if a]
+
+    from spacebotty import standin as standins
+    standin = standins.StandIn(args.port).start()
+    env = environment(standin, apps)
+    print(f"{'app':<12}" + "".join(f"{c:>11}" for c in COLUMNS) + "  requests before LLM")
+    results = {}
+    for app in apps:
+        runs = []
+        for _ in range(args.runs):
+            standin.redis.data.clear()  # every run starts cold: no cached answers, a fresh quota
+            runs.append(run(app, env))
+        result = {c: round(statistics.median(r[c] for r in runs), 1) for c in COLUMNS}
+        result["requests_before_llm"] = any(r["requests_before_llm"] for r in runs)
+        results[app] = result
+        print(f"{app:<12}" + "".join(f"{result[c]:>11}" for c in COLUMNS) + f"  {result['requests_before_llm']}")
+        print("    slowest imports: " + ", ".join(f"{name} {ms:.1f}ms" for ms, name in importtime(app, env)))
+    standin.stop()
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    if args.save:
+        BASELINE.parent.mkdir(exist_ok=True)
+        BASELINE.write_text(json.dumps(baseline | results, indent=2, sort_keys=True) + "\n")
+    if args.check:
+        failed, messages = False, []
+        for app, result in results.items():
+            base = baseline.get(app)
+            if not base: continue
+            if result["requests_before_llm"] and not base["requests_before_llm"]:
+                failed = True; messages.append(f"FAIL {app}: requests is imported before the first LLM call again")
+            for key in COLUMNS:
+                if result[key] <= base[key] * (1 + args.tolerance) + (0 if key == "modules" else 1): continue
+                fatal = key == "modules" or args.strict
+                failed |= fatal
+                messages.append(f"{'FAIL' if fatal else 'warn'} {app} {key}: {result[key]} (baseline {base[key]})")
+        print("\n".join(messages) or "no regressions against the baseline")
+        return 1 if failed else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,186 @@
+"""End-to-end webhook benchmark: replayed Telegram update streams through each app's `handler.do_POST`.
+
+    python packages/spacebotty/benchmarks/webhook.py [--updates 2000] [--concurrency 8] [--apps a,b]
+                                                    [--llm "tokens=40"] [--save | --check [--strict]]
+
+Telegram, Upstash and chat completions are served by `spacebotty.standin`, started before
+the package is imported (settings are read at import). The stream is seeded: LLM commands
+with preset or pasted arguments, /start /help /status /presets, edited messages, payments,
+Telegram redeliveries, chatter and bursts from one user. Per app it reports throughput and
+p50/p95/p99 of do_POST, outbound calls per update and, from a second single-threaded
+tracemalloc pass, the peak KiB allocated per update.
+
+`--save` writes the numbers to baselines/webhook.json. `--check` exits 1 when calls or
+allocations per update grow beyond --tolerance; throughput and p95 depend on the machine,
+so their regressions only fail with `--strict`.
+"""
+import io, os, sys, json, time, random, argparse, tracemalloc, importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPMessage
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+APPS_DIR = HERE.parents[2] / "apps"
+BASELINE = HERE / "baselines" / "webhook.json"
+APPS = ("linkedin", "creators", "secondhand")
+SECRET = "bench-secret"
+PASTE = ("Selling my barely used {}, bought last spring, original box and receipt included, "
+         "small scratch on the side, pickup downtown or shipping at buyer's cost. ")
+
+def environment(standin, apps):
+    os.environ.update(standin.env())
+    os.environ["ASYNC_WEBHOOK"] = "false"
+    # Updates are replayed far faster than anyone types; per-chat pacing would only measure sleeps.
+    os.environ.update(TELEGRAM_RATE="0", TELEGRAM_CHAT_RATE="0")
+    for app in apps:
+        os.environ[f"{app.upper()}_BOT_TOKEN"] = f"100{APPS.index(app)}:bench"
+        os.environ[f"{app.upper()}_WEBHOOK_SECRET"] = SECRET
+    from spacebotty import trace
+    for handler in trace.log.handlers: handler.setStream(open(os.devnull, "w"))  # formatted, not printed
+
+def load(app):
+    """The app's Vercel `handler` class with request logging silenced."""
+    spec = importlib.util.spec_from_file_location(f"bench_{app}", APPS_DIR / app / "api" / "telegram.py")
+    module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)
+    profile = next(iter(module.engine.bots.values())).profile
+    return type("Handler", (module.handler,), {"log_message": lambda self, *args: None}), profile
+
+def workload(profile, n, seed, uid_base):
+    """`n` realistic update dicts for `profile`."""
+    rng = random.Random(seed)
+    commands = list(profile.commands)
+    args = {c: [a for cmd, a in profile.presets if cmd == c] or [a for _, a in profile.presets] for c in commands}
+    users = [uid_base + i for i in range(max(n // 5, 1))]
+    updates, ids = [], iter(range(uid_base * 10, uid_base * 10 + 10 * n))
+
+    def message(uid, text, kind="message", **extra):
+        msg = {"message_id": rng.randrange(1, 10 ** 6), "date": 1760000000, "chat": {"id": uid, "type": "private"},
+               "from": {"id": uid, "is_bot": False, "first_name": "Bench"}, "text": text, **extra}
+        if text.startswith("/"): msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(ids), kind: msg}
+
+    def llm(uid, kind="message"):
+        command = rng.choice(commands)
+        arg = rng.choice(args[command]) if rng.random() < 0.7 else PASTE.format(rng.choice(args[command])) * rng.randint(1, 12)
+        return message(uid, f"{command} {arg}", kind)
+
+    while len(updates) < n:
+        uid, r = rng.choice(users), rng.random()
+        if r < 0.05: updates += [llm(uid) for _ in range(6)]  # burst: one user, over the free plan
+        elif r < 0.12: updates.append(message(uid, rng.choice(["/start", "/help", "/status", "/presets", "/premium"])))
+        elif r < 0.15: updates.append(llm(uid, "edited_message"))
+        elif r < 0.17:
+            updates.append({"update_id": next(ids), "pre_checkout_query": {
+                "id": str(next(ids)), "from": {"id": uid}, "currency": "EUR", "total_amount": 500,
+                "invoice_payload": "premium-purchase-30d"}})
+            updates.append(message(uid, "", successful_payment={"currency": "EUR", "total_amount": 500,
+                                                                "invoice_payload": "premium-purchase-30d"}))
+        elif r < 0.20 and updates: updates.append(rng.choice(updates))  # Telegram redelivery
+        elif r < 0.24: updates.append(message(uid, rng.choice(["thanks!", "hi", "does this work?"])))
+        else: updates.append(llm(uid))
+    return updates[:n]
+
+def post(handler, update):
+    h = handler.__new__(handler)
+    body = json.dumps(update).encode()
+    h.rfile, h.wfile = io.BytesIO(body), io.BytesIO()
+    h.command, h.path, h.request_version = "POST", "/api/telegram", "HTTP/1.1"
+    h.requestline, h.client_address = "POST /api/telegram HTTP/1.1", ("127.0.0.1", 0)
+    h.headers = HTTPMessage()
+    h.headers["Content-Type"] = "application/json"; h.headers["Content-Length"] = str(len(body))
+    h.headers["X-Telegram-Bot-Api-Secret-Token"] = SECRET
+    started = time.perf_counter()
+    h.do_POST()
+    elapsed = time.perf_counter() - started
+    status = h.wfile.getvalue().split(b"\r\n", 1)[0]
+    assert b" 200 " in status, status
+    return elapsed
+
+def quantile(values, q): return values[min(int(q * len(values)), len(values) - 1)]
+
+def calls(standin):
+    return {service: sum(c.values()) for service, c in standin.stats().items()}
+
+def bench(standin, app, n, concurrency, seed):
+    handler, profile = load(app)
+    standin.redis.data.clear(); standin.redis.expires.clear()
+    updates = workload(profile, n, seed, uid_base=(APPS.index(app) + 1) * 10 ** 6)
+    before = calls(standin); started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool: latencies = sorted(pool.map(lambda u: post(handler, u), updates))
+    elapsed = time.perf_counter() - started
+    after = calls(standin)
+    # Allocation pass: a fresh stream (new ids and users), one update at a time so peaks don't overlap.
+    fresh = workload(profile, min(n, 300), seed + 1, uid_base=(APPS.index(app) + 5) * 10 ** 6)
+    tracemalloc.start(); peaks = []
+    for update in fresh:
+        tracemalloc.reset_peak(); base = tracemalloc.get_traced_memory()[0]
+        post(handler, update)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    result = {"updates": n, "per_sec": round(n / elapsed, 1)}
+    result.update({f"p{int(q * 100)}_ms": round(quantile(latencies, q) * 1000, 2) for q in (0.5, 0.95, 0.99)})
+    result.update({f"{service}_per_update": round((after[service] - before[service]) / n, 3) for service in after})
+    result["alloc_kib_per_update"] = round(sum(peaks) / len(peaks) / 1024, 1)
+    return result
+
+COLUMNS = ("per_sec", "p50_ms", "p95_ms", "p99_ms", "telegram_per_update", "upstash_per_update",
+           "completions_per_update", "alloc_kib_per_update")
+LABELS = {"telegram_per_update": "tg/upd", "upstash_per_update": "redis/upd", "completions_per_update": "llm/upd",
+          "alloc_kib_per_update": "KiB/upd"}
+DETERMINISTIC = ("telegram_per_update", "upstash_per_update", "completions_per_update", "alloc_kib_per_update")
+
+def compare(results, baseline, tolerance, strict):
+    """Regressions against the baseline as messages, and whether any of them fails the run."""
+    messages, failed = [], False
+    for app, result in results.items():
+        base = baseline.get(app)
+        if not base or base.get("updates") != result["updates"]: continue
+        for key in COLUMNS:
+            if key not in base: continue
+            worse = result[key] < base[key] * (1 - tolerance) if key == "per_sec" else \
+                result[key] > base[key] * (1 + tolerance) + 0.01
+            if not worse: continue
+            fatal = key in DETERMINISTIC or strict
+            failed |= fatal
+            messages.append(f"{'FAIL' if fatal else 'warn'} {app} {key}: {result[key]} (baseline {base[key]})")
+    return messages, failed
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, help="per app (default 2000, or the baseline's with --check)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--apps", default=",".join(APPS))
+    parser.add_argument("--llm", default="tokens=40", help="fake.Behaviour of the completions stand-in")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--check", action="store_true", help="compare with the baseline, exit 1 on regressions")
+    parser.add_argument("--strict", action="store_true", help="timing regressions fail --check too")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+    apps = [a for a in args.apps.split(",") if a]
+    # Cache hits and paywalls depend on the stream length, so a check replays the baseline's.
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    n = args.updates or (args.check and max((baseline.get(a, {}).get("updates", 0) for a in apps), default=0)) or 2000
+
+    from spacebotty import fake, standin as standins
+    standin = standins.StandIn(args.port, fake.Behaviour.parse(args.llm)).start()
+    environment(standin, apps)
+    print(f"{'app':<12}" + "".join(f"{LABELS.get(c, c):>11}" for c in COLUMNS))
+    results = {}
+    for app in apps:
+        results[app] = bench(standin, app, n, args.concurrency, args.seed)
+        print(f"{app:<12}" + "".join(f"{results[app][c]:>11}" for c in COLUMNS))
+    standin.stop()
+
+    if args.save:
+        BASELINE.parent.mkdir(exist_ok=True)
+        BASELINE.write_text(json.dumps(baseline | results, indent=2, sort_keys=True) + "\n")
+    if args.check:
+        messages, failed = compare(results, baseline, args.tolerance, args.strict)
+        print("\n".join(messages) or "no regressions against the baseline")
+        return 1 if failed else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1 @@
+"""Shared runtime for the Spacebotty Telegram bots (Redis, transport, LLM)."""
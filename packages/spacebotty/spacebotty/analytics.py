@@ -0,0 +1,171 @@
+import os, json, time, atexit, bisect, logging, threading
+from spacebotty import trace
+from spacebotty.upstash import command, multi_exec, pipeline
+
+log = logging.getLogger("spacebotty.analytics")
+
+# One event per handled update (bot, command, status, ms, tokens, cache, uid hash), taken from its
+# trace (TRACE=false stops them too). "redis": a capped stream rolled up by `aggregate`;
+# "jsonl": appended to ANALYTICS_PATH; "off".
+ANALYTICS = os.getenv("ANALYTICS", "redis").lower()
+ANALYTICS_PATH = os.getenv("ANALYTICS_PATH", "analytics.jsonl")
+# Events are buffered in-process and written with one pipelined XADD (or one append) once
+# ANALYTICS_BATCH are waiting or the oldest is ANALYTICS_FLUSH_INTERVAL seconds old. A recycled
+# serverless instance loses what it still buffers.
+ANALYTICS_BATCH = int(os.getenv("ANALYTICS_BATCH", "50"))
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "30"))
+# Stream cap: if aggregation falls this far behind, the oldest events are dropped.
+ANALYTICS_STREAM_MAX = int(os.getenv("ANALYTICS_STREAM_MAX", "100000"))
+# How long hourly counters and daily funnel sets are kept.
+ANALYTICS_DAYS = int(os.getenv("ANALYTICS_DAYS", "30"))
+
+STREAM = "analytics:events"
+CURSOR = "analytics:cursor"
+LOCK = "analytics:lock"
+# Latency histogram bucket upper bounds in milliseconds (one more bucket for anything slower).
+BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 15000, 30000)
+# Daily distinct-user sets (HyperLogLog, uid hashes) behind the paywall -> /buy -> payment funnel.
+FUNNEL = ("paywall", "buy", "payment")
+
+_buffer, _lock = [], threading.Lock()
+_oldest = 0.0
+
+def hour_key(bot, ts): return f"analytics:{bot}:{time.strftime('%Y%m%d%H', time.gmtime(ts))}"
+def funnel_key(bot, ts, step): return f"analytics:{bot}:{time.strftime('%Y%m%d', time.gmtime(ts))}:{step}"
+
+def record(t, status, seconds):
+    """`trace.sinks` hook: buffer one event for a finished update, flushing when a batch is due."""
+    global _oldest
+    tags = t.tags
+    if not tags.get("command"): return
+    event = {"ts": t.wall // 1_000_000_000, "bot": t.bot, "command": tags["command"], "status": status,
+             "ms": round(seconds * 1000)}
+    event.update((k, tags[k]) for k in ("uid", "tokens", "cache", "model") if tags.get(k))
+    with _lock:
+        if not _buffer: _oldest = time.monotonic()
+        _buffer.append(event)
+        due = len(_buffer) >= ANALYTICS_BATCH or time.monotonic() - _oldest >= ANALYTICS_FLUSH_INTERVAL
+    if due: flush()
+
+def flush():
+    """Write the buffered events; returns how many. Analytics never fail an update: on error they are dropped."""
+    with _lock:
+        events = _buffer[:]; del _buffer[:]
+    if not events: return 0
+    lines = [json.dumps(e, separators=(",", ":")) for e in events]
+    try:
+        if ANALYTICS == "jsonl":
+            with open(ANALYTICS_PATH, "a", encoding="utf-8") as f: f.write("".join(line + "\n" for line in lines))
+        else:
+            pipeline([["XADD", STREAM, "MAXLEN", "~", ANALYTICS_STREAM_MAX, "*", "e", line] for line in lines])
+    except Exception:
+        log.warning("dropped %d analytics events", len(events))
+    return len(events)
+
+atexit.register(flush)
+
+def _rollup(events):
+    # HINCRBY per (hour, field), PFADD per (day, funnel step), and the keys' expiry.
+    counts, users = {}, {}
+    def inc(key, field, n):
+        if n: counts[(key, field)] = counts.get((key, field), 0) + n
+    for e in events:
+        key, cmd, status = hour_key(e["bot"], e["ts"]), e["command"], e["status"]
+        inc(key, f"n:{cmd}:{status}", 1)
+        inc(key, f"ms:{cmd}", e["ms"])
+        inc(key, f"h:{cmd}:{bisect.bisect_left(BUCKETS, e['ms'])}", 1)
+        inc(key, f"tokens:{cmd}", e.get("tokens", 0))
+        if e.get("cache"): inc(key, f"cache:{e['cache']}", 1)
+        step = "paywall" if status == "paywall" else "buy" if cmd == "/buy" else "payment" if cmd == "payment" else None
+        if step and e.get("uid"): users.setdefault(funnel_key(e["bot"], e["ts"], step), set()).add(e["uid"])
+    cmds = [["HINCRBY", key, field, n] for (key, field), n in counts.items()]
+    cmds += [["PFADD", key, *sorted(uids)] for key, uids in users.items()]
+    return cmds + [["EXPIRE", key, ANALYTICS_DAYS * 24 * 60 * 60] for key in {k for k, _ in counts} | set(users)]
+
+def _stream_batches(batch):
+    cursor = command("GET", CURSOR) or "0"
+    while True:
+        entries = command("XRANGE", STREAM, f"({cursor}", "+", "COUNT", batch) or []
+        if not entries: return
+        cursor = entries[-1][0]
+        events = [json.loads(fields[fields.index("e") + 1]) for _, fields in entries if "e" in fields]
+        # The cursor moves in the same transaction as the counters, so no event is counted twice.
+        yield events, [["SET", CURSOR, cursor], ["XTRIM", STREAM, "MINID", cursor]]
+
+def _file_batches(batch):
+    cursor_key = f"{CURSOR}:{os.path.abspath(ANALYTICS_PATH)}"
+    offset = int(command("GET", cursor_key) or 0)
+    try: f = open(ANALYTICS_PATH, "rb")
+    except FileNotFoundError: return
+    with f:
+        f.seek(offset)
+        while True:
+            lines = [line for line in (f.readline() for _ in range(batch)) if line.endswith(b"\n")]
+            if not lines: return
+            offset += sum(map(len, lines)); f.seek(offset)  # a half-written last line is read next time
+            yield [json.loads(line) for line in lines], [["SET", cursor_key, offset]]
+
+def aggregate(batch=1000):
+    """Roll new events (stream or ANALYTICS_PATH) into hourly counters; returns how many were added.
+
+    `analytics:<bot>:<YYYYMMDDHH>` (UTC) holds per command `n:<cmd>:<status>`, `ms:<cmd>`,
+    `tokens:<cmd>` and latency buckets `h:<cmd>:<i>` (see BUCKETS), plus `cache:<hit|miss>`.
+    One run at a time: a second concurrent call returns 0.
+    """
+    flush()
+    if command("SET", LOCK, "1", "NX", "EX", 300) is None: return 0
+    done = 0
+    try:
+        for events, advance in (_file_batches if ANALYTICS == "jsonl" else _stream_batches)(batch):
+            multi_exec(_rollup(events) + advance)
+            done += len(events)
+    finally:
+        command("DEL", LOCK)
+    return done
+
+def _quantile(counts, q):
+    # Upper bound (ms) of the bucket holding the q-quantile, like routing.Histogram.quantile.
+    total, seen = sum(counts), 0
+    for i, n in enumerate(counts):
+        seen += n
+        if total and seen >= q * total: return BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1] * 2
+    return None
+
+def summary(bot, hours=24):
+    """The last `hours` of `bot`'s rollups in one pipelined read.
+
+    Per command: calls by status, tokens per call, mean and p50/p95 latency (ms); the cache hit
+    ratio; and distinct users over the covered UTC days who hit the paywall, sent /buy, and paid.
+    `paywall_to_buy` is the share of paywalled users who also sent /buy (HyperLogLog estimate).
+    """
+    now = int(time.time())
+    hours_ago = [now - i * 3600 for i in range(hours)]
+    days = {time.strftime("%Y%m%d", time.gmtime(ts)): ts for ts in hours_ago}.values()
+    steps = {step: [funnel_key(bot, ts, step) for ts in days] for step in FUNNEL}
+    replies = pipeline([["HGETALL", hour_key(bot, ts)] for ts in hours_ago] +
+                       [["PFCOUNT", *keys] for keys in steps.values()] +
+                       [["PFCOUNT", *steps["paywall"], *steps["buy"]]])
+    totals = {}
+    for fields in replies[:hours]:
+        for field, n in zip((fields or [])[::2], (fields or [])[1::2]): totals[field] = totals.get(field, 0) + int(n)
+    commands = {}
+    for field, n in totals.items():
+        kind, _, rest = field.partition(":")
+        if kind == "cache": continue
+        cmd, _, sub = rest.rpartition(":") if kind in ("n", "h") else (rest, "", "")
+        c = commands.setdefault(cmd, {"calls": 0, "status": {}, "tokens": 0, "ms": 0, "h": [0] * (len(BUCKETS) + 1)})
+        if kind == "n": c["calls"] += n; c["status"][sub] = n
+        elif kind == "h": c["h"][int(sub)] += n
+        else: c[kind] += n
+    for c in commands.values():
+        h = c.pop("h")
+        c.update(tokens_per_call=round(c["tokens"] / c["calls"], 1) if c["calls"] else 0,
+                 ms_avg=round(c.pop("ms") / c["calls"]) if c["calls"] else None,
+                 p50=_quantile(h, 0.5), p95=_quantile(h, 0.95))
+    hit, miss = totals.get("cache:hit", 0), totals.get("cache:miss", 0)
+    paywall, buy, payment, either = (int(n or 0) for n in replies[hours:])
+    return {"hours": hours, "commands": commands, "cache_hit_ratio": round(hit / (hit + miss), 3) if hit + miss else None,
+            "funnel": {"paywall_users": paywall, "buy_users": buy, "paying_users": payment,
+                       "paywall_to_buy": round(max(paywall + buy - either, 0) / paywall, 3) if paywall else None}}
+
+if ANALYTICS != "off": trace.sinks.append(record)
@@ -0,0 +1,70 @@
+import asyncio, json
+from urllib.parse import parse_qs
+from spacebotty import jobs
+from spacebotty.telegram import parse_command
+
+MAX_BODY = 1 << 20
+
+class WebhookApp:
+    """ASGI entry point around an `engine.Engine` and its bots' synchronous handlers.
+
+    Each update is routed to its bot, whose blocking `accept_update` runs on a
+    worker thread while the I/O that does not depend on it (the typing indicator
+    for LLM commands) runs concurrently on the event loop. The pooled transport
+    sessions are thread-safe, so concurrent requests share the same connections.
+    An authorised `GET ?<name>=1` (Vercel Cron) runs the engine's `cron[name]` task.
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.cron = engine.cron
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan": return await self._lifespan(receive, send)
+        if scope["type"] != "http": return
+        if scope["method"] != "POST": return await self._get(scope, send)
+        query = parse_qs(scope.get("query_string", b"").decode())
+        headers = {k.decode().lower(): v.decode() for k, v in scope.get("headers") or []}
+        bot = self.engine.route(query, headers)
+        if bot is None: return await self._respond(send, 403, b"")
+        body = await self._read_body(receive)
+        if body is None: return await self._respond(send, 413, b"")
+        update = json.loads(body.decode("utf-8") or "{}")
+        await asyncio.gather(self._typing(bot, update), asyncio.to_thread(bot.accept_update, update))
+        await self._respond(send, 200, b"")
+
+    async def _get(self, scope, send):
+        query = parse_qs(scope.get("query_string", b"").decode())
+        task = next((fn for name, fn in self.cron.items() if query.get(name) == ["1"]), None)
+        if task is None: return await self._respond(send, 200, b"OK")
+        auth = dict(scope.get("headers") or []).get(b"authorization", b"").decode()
+        if not jobs.cron_authorized(auth): return await self._respond(send, 401, b"")
+        done = await asyncio.to_thread(task)
+        await self._respond(send, 200, str(done).encode())
+
+    async def _typing(self, bot, update):
+        chat_id, _, command = parse_command(update)
+        if chat_id is None or command not in bot.llm_commands: return
+        try: await asyncio.to_thread(bot.tg, "sendChatAction", {"chat_id": chat_id, "action": "typing"})
+        except Exception: pass  # cosmetic; never fail the update over it
+
+    async def _read_body(self, receive):
+        chunks, size, more = [], 0, True
+        while more:
+            event = await receive()
+            if event["type"] == "http.disconnect": break
+            chunk = event.get("body", b""); size += len(chunk)
+            if size > MAX_BODY: return None
+            chunks.append(chunk); more = event.get("more_body", False)
+        return b"".join(chunks)
+
+    async def _respond(self, send, status, body):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            event = await receive()
+            if event["type"] == "lifespan.startup": await send({"type": "lifespan.startup.complete"})
+            elif event["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"}); return
@@ -0,0 +1,118 @@
+import os, re, json, logging
+from concurrent.futures import ThreadPoolExecutor
+from spacebotty import llm, trace, transport
+from spacebotty.upstash import command
+
+log = logging.getLogger("spacebotty.batch")
+
+# Non-interactive generation (prewarm, bulk runs): "multi" packs BATCH_SIZE prompts into one
+# chat request, "openai" submits a Batch API job (half price, results within 24h), "off" sends
+# one request per prompt.
+BATCH_MODE = os.getenv("BATCH_MODE", "multi").lower()
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "6"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "2"))
+FILES_URL = f"{llm.OPENAI_BASE_URL}/files"
+BATCHES_URL = f"{llm.OPENAI_BASE_URL}/batches"
+
+_MARKER = re.compile(r"^\s*<<<(\d+)>>>\s*$", re.M)
+
+def combine(prompts):
+    """One prompt asking for every answer, each introduced by a `<<<n>>>` marker line."""
+    items = "\n\n".join(f"<<<{i}>>>\n{p.strip()}" for i, p in enumerate(prompts, 1))
+    return (f"Handle each of the {len(prompts)} requests below independently, exactly as if it were the only one. "
+            f"Start each answer with its marker line (<<<1>>> to <<<{len(prompts)}>>>) and write nothing else.\n\n{items}")
+
+def split(text, n):
+    """The n answers of a combined reply, in order; None where the model skipped one."""
+    parts, answers = _MARKER.split(text), [None] * n
+    for number, body in zip(parts[1::2], parts[2::2]):
+        i = int(number) - 1
+        if 0 <= i < n and body.strip(): answers[i] = body.strip()
+    return answers
+
+def complete_many(system, prompts, size=BATCH_SIZE, generate=None, concurrency=BATCH_CONCURRENCY):
+    """Answers (`llm.Completion`) for `prompts`, `size` per request, `concurrency` requests at a time.
+
+    Token usage of a combined request is shared evenly among its answers. Items the
+    model dropped, or the one the token limit cut, are retried one request each, so the
+    result always lines up with `prompts`.
+    """
+    generate = generate or (lambda prompt: llm.complete(system, prompt))
+    size = max(size, 1)
+
+    def one(chunk):
+        if len(chunk) == 1: return [generate(chunk[0])]
+        reply = generate(combine(chunk))
+        share = llm.total_tokens(getattr(reply, "usage", None)) // len(chunk)
+        answers = split(str(reply), len(chunk))
+        if getattr(reply, "finish_reason", None) == "length":
+            # The token limit stopped the reply inside its last answer: that one is retried too.
+            answers[max(i for i, a in enumerate(answers) if a is not None) if any(answers) else 0] = None
+        out = []
+        for prompt, answer in zip(chunk, answers):
+            if answer is None: out.append(generate(prompt)); continue
+            text = llm.Completion(answer); text.usage = {"total_tokens": share}
+            out.append(text)
+        return out
+
+    chunks = [prompts[i:i + size] for i in range(0, len(prompts), size)]
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        futures = [trace.run_in_context(pool, one, chunk) for chunk in chunks]
+        return [text for f in futures for text in f.result()]
+
+def submit(system, prompts, model=None, temperature=0.7):
+    """Upload `{custom_id: prompt}` as a Batch API input file and start the job; returns the batch id."""
+    lines = [json.dumps({"custom_id": cid, "method": "POST", "url": "/v1/chat/completions",
+                         "body": llm._body(system, prompt, model, temperature)}) for cid, prompt in prompts.items()]
+    r = transport.post(FILES_URL, headers=llm._headers(), data={"purpose": "batch"},
+                       files={"file": ("batch.jsonl", "\n".join(lines).encode())})
+    r.raise_for_status()
+    r = transport.post(BATCHES_URL, headers=llm._headers(), json={
+        "input_file_id": r.json()["id"], "endpoint": "/v1/chat/completions", "completion_window": "24h"})
+    r.raise_for_status()
+    return r.json()["id"]
+
+def results(batch_id):
+    """None while the batch runs; then `{custom_id: Completion or None}` (None for failed items)."""
+    r = transport.get(f"{BATCHES_URL}/{batch_id}", headers=llm._headers()); r.raise_for_status()
+    batch = r.json()
+    if batch["status"] in ("validating", "in_progress", "finalizing", "cancelling"): return None
+    out = {}
+    if batch.get("output_file_id"):
+        r = transport.get(f"{FILES_URL}/{batch['output_file_id']}/content", headers=llm._headers())
+        r.raise_for_status()
+        for line in r.text.splitlines():
+            if not line.strip(): continue
+            item = json.loads(line); body = (item.get("response") or {}).get("body") or {}
+            try: text = llm.Completion(body["choices"][0]["message"]["content"].strip())
+            except (KeyError, IndexError, TypeError): out[item["custom_id"]] = None; continue
+            text.usage = body.get("usage"); out[item["custom_id"]] = text
+    return out
+
+class Pending:
+    """Submitted Batch API jobs of one bot, with what to do with each item once it is ready.
+
+    Stored as a Redis hash `batch:{bot}:pending` of batch id -> {custom_id: delivery}.
+    """
+    def __init__(self, bot):
+        self.key = f"batch:{bot}:pending"
+
+    def add(self, batch_id, deliveries): command("HSET", self.key, batch_id, json.dumps(deliveries))
+
+    def collect(self, deliver):
+        """Call `deliver(delivery, text)` for every item of every finished batch; returns items delivered."""
+        fields = command("HGETALL", self.key) or []
+        done = 0
+        for batch_id, raw in zip(fields[::2], fields[1::2]):
+            try: ready = results(batch_id)
+            except Exception:
+                log.exception("batch %s: status check failed", batch_id); continue
+            if ready is None: continue
+            # HDEL is the claim: with overlapping cron runs only one of them delivers a batch.
+            if not command("HDEL", self.key, batch_id): continue
+            for cid, delivery in json.loads(raw).items():
+                text = ready.get(cid)
+                if text is None: log.warning("batch %s: item %s failed", batch_id, cid); continue
+                try: deliver(delivery, text); done += 1
+                except Exception: log.exception("batch %s: delivering %s failed", batch_id, cid)
+        return done
@@ -0,0 +1,133 @@
+import io, os, csv, json, time, zlib, base64, secrets, logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from spacebotty import trace
+from spacebotty.telegram import MAX_MESSAGE_LEN
+from spacebotty.upstash import command
+
+log = logging.getLogger("spacebotty.bulk")
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(1 << 20)))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+BULK_PROGRESS_INTERVAL = float(os.getenv("BULK_PROGRESS_INTERVAL", "3"))
+# Seconds of generation per function invocation (0: no limit) before the rest of a run is saved and
+# queued as a job that resumes it; keep it under vercel.json's maxDuration with room for the upload.
+BULK_BUDGET = float(os.getenv("BULK_BUDGET", "6"))
+# How long a run's saved state waits for its next job.
+BULK_STATE_TTL = int(os.getenv("BULK_STATE_TTL", "86400"))
+
+class BulkError(ValueError):
+    """An inventory file that cannot be processed; the message is shown to the user."""
+
+def parse(filename, data):
+    """(rows, fmt) for an uploaded inventory: CSV with a header row, or JSONL (objects or strings)."""
+    try: text = data.decode("utf-8-sig")
+    except UnicodeDecodeError: raise BulkError("The file must be UTF-8 text (CSV or JSONL).")
+    if (filename or "").lower().endswith((".jsonl", ".json", ".ndjson")):
+        rows, fmt = [], "jsonl"
+        for n, line in enumerate(text.splitlines(), 1):
+            if not line.strip(): continue
+            try: item = json.loads(line)
+            except ValueError: raise BulkError(f"Line {n} is not valid JSON.")
+            rows.append(item if isinstance(item, dict) else {"item": str(item)})
+    else:
+        rows, fmt = [dict(r) for r in csv.DictReader(io.StringIO(text)) if any((v or "").strip() for v in r.values())], "csv"
+    if not rows: raise BulkError("No items found: send a CSV with a header row, or one JSON item per line.")
+    if len(rows) > BULK_MAX_ITEMS: raise BulkError(f"Too many items ({len(rows)}); the limit is {BULK_MAX_ITEMS}.")
+    return rows, fmt
+
+def describe(row):
+    """The item text handed to the prompt templates."""
+    fields = [(k, str(v).strip()) for k, v in row.items() if k and v is not None and str(v).strip()]
+    if len(fields) == 1: return fields[0][1]
+    return "; ".join(f"{k}: {v}" for k, v in fields)
+
+def render(rows, fmt):
+    """The inventory with one extra column per command, in the format it was uploaded in."""
+    if fmt == "jsonl": return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows).encode()
+    columns = list(dict.fromkeys(k for r in rows for k in r))
+    out = io.StringIO()
+    writer = csv.DictWriter(out, columns); writer.writeheader(); writer.writerows(rows)
+    return out.getvalue().encode()
+
+class Progress:
+    """A status message edited at most once per `interval` seconds; a resumed run passes its `message_id`."""
+    def __init__(self, tg, chat_id, total, interval=BULK_PROGRESS_INTERVAL, message_id=None):
+        self.tg, self.chat_id, self.total, self.interval = tg, chat_id, total, interval
+        self.last, self.message_id = 0.0, message_id
+        if message_id is not None: return
+        sent = tg("sendMessage", {"chat_id": chat_id, "text": self._text(0)})
+        try: self.message_id = sent.json()["result"]["message_id"]
+        except (AttributeError, ValueError, KeyError, TypeError): self.message_id = None
+
+    def _text(self, done): return f"⏳ Bulk run: {done}/{self.total} items"
+
+    def update(self, done, text=None, force=False):
+        if not self.message_id or not (force or time.monotonic() - self.last >= self.interval): return
+        self.tg("editMessageText", {"chat_id": self.chat_id, "message_id": self.message_id,
+                                    "text": (text or self._text(done))[:MAX_MESSAGE_LEN]})
+        self.last = time.monotonic()
+
+def column(command): return "ai_" + command.lstrip("/")
+
+def parts(n, commands, chunk=1):
+    # One command per part, so each part goes to that command's model.
+    size = max(chunk, 1)
+    return [[(i, c) for i in range(s, min(s + size, n))] for c in commands for s in range(0, n, size)]
+
+def run(rows, commands, prompt, generate_many, chunk=1, concurrency=BULK_CONCURRENCY, progress=None, start=0,
+        deadline=None):
+    """Fill an `ai_<command>` column of every row, from part `start` of `parts(len(rows), commands, chunk)`.
+
+    Prompts are built with `prompt(command, item)` and generated a part at a time by
+    `generate_many(prompts, command)`, with at most `concurrency` parts in flight.
+    `progress(done)` is called with the number of finished rows as parts complete.
+    No part starts past `deadline` (time.monotonic()); returns the index of the first
+    part not run, to resume from, or None once every part ran (see `failures`).
+    """
+    todo = parts(len(rows), commands, chunk)
+    if not start:
+        for row in rows: row.update({column(c): "" for c in commands})
+    texts = [describe(r) for r in rows]
+    left = [0] * len(rows)
+    for part in todo[start:]:
+        for i, _ in part: left[i] += 1
+
+    def one(part):
+        return generate_many([prompt(c, texts[i]) for i, c in part], part[0][1])
+
+    n, running = start, {}
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        while True:
+            while n < len(todo) and len(running) < max(concurrency, 1) and (deadline is None or time.monotonic() < deadline):
+                running[trace.run_in_context(pool, one, todo[n])] = todo[n]; n += 1
+            if not running: break
+            for future in wait(running, return_when=FIRST_COMPLETED).done:
+                part = running.pop(future)
+                try: answers = future.result()
+                except Exception:
+                    log.exception("bulk chunk failed"); answers = []
+                for (i, c), answer in zip(part, answers):
+                    if getattr(answer, "cut", False): continue  # empty or truncated: counted as failed
+                    rows[i][column(c)] = str(answer)
+                for i, _ in part: left[i] -= 1
+            if progress: progress(sum(1 for k in left if not k))
+    return n if n < len(todo) else None
+
+def failures(rows, commands):
+    """(rows with a failed command, failed (row, command) pairs) of a finished run: a row with one
+    failed command out of three failed one prompt, not three."""
+    missing = [sum(1 for c in commands if not row.get(column(c))) for row in rows]
+    return sum(1 for k in missing if k), sum(missing)
+
+def save(bot, state, key=None):
+    """Store a run's state (rows and all) for its next job; returns its key."""
+    key = key or f"bulk:{bot}:{secrets.token_hex(8)}"
+    command("SET", key, base64.b64encode(zlib.compress(json.dumps(state).encode())).decode(), "EX", BULK_STATE_TTL)
+    return key
+
+def load(key):
+    raw = command("GET", key)
+    return raw and json.loads(zlib.decompress(base64.b64decode(raw)))
+
+def drop(key): command("DEL", key)
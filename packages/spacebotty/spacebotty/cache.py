@@ -0,0 +1,50 @@
+import os, time, threading
+from collections import OrderedDict
+
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", "4096"))
+# Staleness bound: how long another instance's write (e.g. a payment) may go unseen here.
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "30"))
+
+MISSING = object()
+
+class TTLCache:
+    """Bounded LRU whose entries also expire after `ttl` seconds. Cached values may be None."""
+    def __init__(self, maxsize=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None: del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        if self.ttl <= 0 or self.maxsize <= 0: return
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize: self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock: self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock: self._data.clear(); self.hits = self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hits / total if total else 0.0,
+                "size": len(self._data), "maxsize": self.maxsize, "ttl": self.ttl}
+
+# Lives at module level so it survives across warm serverless invocations.
+local = TTLCache()
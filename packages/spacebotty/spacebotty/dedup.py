@@ -0,0 +1,21 @@
+import os
+from spacebotty.upstash import command, command_reply
+
+# Telegram gives up redelivering after ~24h; remembering update ids for a day covers every retry.
+UPDATE_DEDUP_TTL = int(os.getenv("UPDATE_DEDUP_TTL", "86400"))
+
+def update_key(bot, update):
+    update_id = update.get("update_id")
+    return f"update:{bot}:{update_id}" if update_id is not None else None
+
+def first_delivery(key):
+    """SET NX with TTL: True the first time an update is seen, False for a redelivery."""
+    if key is None: return True
+    reply = command_reply("SET", key, "1", "NX", "EX", UPDATE_DEDUP_TTL)
+    # Only a clean nil means "already seen"; on an error reply, process rather than drop. A connection
+    # error propagates, so the update fails and Telegram retries it.
+    return reply is None or "error" in reply or reply.get("result") is not None
+
+def forget(key):
+    # Lets Telegram's retry of an update we failed to handle go through.
+    if key is not None: command("DEL", key)
@@ -0,0 +1,535 @@
+import os, hmac, json, time
+from textwrap import dedent
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from spacebotty import analytics, batch, bulk, cache, dedup, inflight, jobs, presets, quota, responses, routing, telegram, tokens, trace, transport, users
+from spacebotty import llm as openai
+
+ASYNC_WEBHOOK = os.getenv("ASYNC_WEBHOOK", "false").lower() == "true"
+
+def setting(bot, key, default=None):
+    # Per-bot override first (LINKEDIN_FREE_DAILY), then the shared variable (FREE_DAILY).
+    return os.getenv(f"{bot.upper()}_{key}") or os.getenv(key) or default
+
+def flag(bot, key, default="false"): return setting(bot, key, default).lower() == "true"
+
+class Command:
+    """One LLM command: the argument's name, the hint shown without it, and the prompt template.
+
+    The template is compiled once: split around its `{arg}` placeholder, so rendering is a
+    join. `budget` caps the argument's tokens (longer input is cut by `tokens.fit`) and
+    `max_tokens` caps the completion, reasoning tokens included, so a command's response
+    time stays predictable. `tier` picks the model (see `routing.MODELS`).
+    """
+    def __init__(self, arg, usage, template, budget=tokens.PROMPT_ARG_TOKENS, max_tokens=None, tier="standard"):
+        self.arg = arg
+        self.usage = usage
+        self.template = dedent(template)
+        self.parts = [part.replace("{{", "{").replace("}}", "}") for part in self.template.split("{%s}" % arg)]
+        self.budget = budget
+        self.max_tokens = max_tokens
+        self.tier = tier
+
+    @property
+    def template_tokens(self):
+        # Counted on use, not at import: loading tiktoken is not paid on every cold start.
+        return tokens.estimate("".join(self.parts))
+
+    def fit(self, value): return tokens.fit(value, self.budget)
+
+    def prompt(self, value): return self.fit(value).join(self.parts)
+
+class Profile:
+    """Everything that makes one bot different from the others; the engine supplies the rest."""
+    def __init__(self, name, title, system_prompt, commands, presets, start, paywall, bulk=()):
+        self.name = name
+        self.title = title
+        self.system_prompt = system_prompt
+        self.commands = commands
+        self.presets = presets
+        self.start = start
+        self.paywall = paywall
+        self.bulk = bulk  # commands run over every item of an uploaded inventory file
+
+class Bot:
+    """A profile bound to its token and settings, with the command handlers every bot shares."""
+    def __init__(self, profile):
+        p, name = profile, profile.name
+        self.profile = p
+        self.name = name
+        self.token = os.getenv(f"{name.upper()}_BOT_TOKEN") or os.getenv("TELEGRAM_BOT_TOKEN")
+        self.webhook_secret = setting(name, "WEBHOOK_SECRET", "")
+        self.free_daily = int(setting(name, "FREE_DAILY", "3"))
+        self.premium_code = setting(name, "PREMIUM_CODE", "VIP-2025")
+        self.stripe_payment_link = setting(name, "STRIPE_PAYMENT_LINK", "")
+        self.stream_replies = flag(name, "STREAM_REPLIES", "true")
+        self.queue_updates = flag(name, "QUEUE_UPDATES")
+        self.queue = jobs.Queue(name)
+        self.bulk_budget = bulk.BULK_BUDGET  # 0 in long-running processes: a bulk run goes in one pass
+        self.batches = batch.Pending(name)
+        # Telegram Payments
+        self.enable_tg_pay = flag(name, "ENABLE_TELEGRAM_PAYMENTS")
+        self.provider_token = setting(name, "PROVIDER_TOKEN", "")
+        self.premium_price_eur = int(setting(name, "PREMIUM_PRICE_EUR", "7"))
+        self.premium_title = setting(name, "PREMIUM_TITLE", "Premium 30 days")
+        self.premium_description = setting(name, "PREMIUM_DESCRIPTION", "30‑day pass: unlimited prompts & priority")
+        self.premium_days = int(setting(name, "PREMIUM_DAYS", "30"))
+        self.username = setting(name, "BOT_USERNAME", "").lstrip("@").lower()
+        self.system_prompt = p.system_prompt
+        self.llm_commands = tuple(p.commands)
+        # Command table: one dict lookup per message, whatever the number of templates.
+        self.routes = {
+            "/start": lambda chat_id, uid, arg: self.cmd_start(chat_id),
+            "/premium": lambda chat_id, uid, arg: self.cmd_premium(chat_id),
+            "/buy": lambda chat_id, uid, arg: self.cmd_buy(chat_id),
+            "/status": lambda chat_id, uid, arg: self.cmd_status(chat_id, uid),
+            "/presets": lambda chat_id, uid, arg: self.cmd_presets(chat_id),
+            "/redeem": lambda chat_id, uid, arg: self.cmd_redeem(chat_id, uid, arg.split()),
+        }
+        self.routes.update({c: self._llm_route(c) for c in self.llm_commands})
+        if p.bulk: self.routes["/bulk"] = lambda chat_id, uid, arg: self.cmd_bulk_help(chat_id)
+
+    def tg(self, method, payload, files=None, coalesce=False):
+        return telegram.call(self.token, method, payload, files, coalesce=coalesce)
+    def reply(self, chat_id, text, parse_mode="Markdown"):
+        # Nobody reads the response, so a reply may be merged into one already waiting for the chat.
+        self.tg("sendMessage", {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}, coalesce=True)
+
+    def user_state(self, uid):
+        # Premium and today's uses from the user's record: local cache first, else one HMGET.
+        record = users.read(self.name, [uid])[0]
+        return record.premium(), record.uses_today()
+
+    def prefetch(self, uids):
+        # The records of a whole getUpdates batch in one pipelined read.
+        users.read(self.name, uids)
+
+    def reserve_quota(self, uid, cost=1, command=""):
+        # Premium check, day rollover and increment in one atomic call; refunded if the LLM call fails.
+        return quota.reserve(self.name, uid, self.free_daily, cost, command)
+
+    def set_premium(self, uid, days=None):
+        users.set_premium(self.name, uid, int(days or self.premium_days) * 24 * 60 * 60)
+
+    def llm(self, prompt, max_tokens=None, model=None):
+        return openai.complete(self.system_prompt, prompt, model=model, max_tokens=max_tokens)
+    def llm_stream(self, prompt, max_tokens=None, tier="standard", premium=False):
+        return routing.stream(self.system_prompt, prompt, tier, premium, max_tokens)
+    def llm_routed(self, prompt, max_tokens=None, tier="standard", premium=False):
+        return routing.complete(self.system_prompt, prompt, tier, premium, max_tokens)
+
+    def model_for(self, command):
+        # Model for work nobody waits on (prewarm, bulk, batches): the command's free-plan primary.
+        spec = self.profile.commands.get(command)
+        return routing.pick(spec.tier)[0] if spec else None
+
+    def answer(self, chat_id, prompt, topic="", max_tokens=None, tier="standard", premium=False):
+        # Looked up under the routed primary model, so prewarmed presets serve free users.
+        model = routing.pick(tier, premium)[0]
+        cached = responses.lookup(self.name, self.system_prompt, prompt, topic, model)
+        trace.tag(cache="hit" if cached.text is not None else "miss", model=model)
+        if cached.text is not None:
+            self.reply(chat_id, cached.text); responses.record_hit(cached); return cached.text
+        if self.stream_replies:
+            # Stream into a progressively edited message so the first tokens show up right away.
+            stream = self.llm_stream(prompt, max_tokens, tier, premium)
+            text, usage, answered = telegram.stream_reply(self.tg, chat_id, stream), stream.usage, stream.model
+            if text.cut: trace.tag(status="cut"); return text  # partial: not cached
+        else:
+            text = self.llm_routed(prompt, max_tokens, tier, premium)
+            if getattr(text, "cut", False):  # empty, or stopped by the token limit: not cached
+                self.reply(chat_id, (text + telegram.CUT_NOTE).strip()); trace.tag(status="cut"); return text
+            self.reply(chat_id, text); usage, answered = getattr(text, "usage", None), getattr(text, "model", model)
+        if answered != model:
+            # A hedged request the fallback won: its answer belongs to the fallback's pool.
+            trace.tag(model=answered)
+            if cached.key: cached = responses.Lookup(self.name, responses.cache_key(answered, self.system_prompt, prompt, topic))
+        responses.store(cached, text, openai.total_tokens(usage))
+        return text
+
+    def cmd_premium(self, chat_id):
+        # Brand-forward premium pitch + inline Stripe button
+        parts = []
+        parts.append("💎 *Spacebotty Premium* — grow faster, publish more\n")
+        parts.append("Unlimited prompts · Priority responses · Advanced templates\n\n")
+        parts.append("⚡ *Two ways to upgrade:*\n")
+        parts.append("1) **/buy** — In‑app 30‑day pass (€7)\n")
+        if self.stripe_payment_link:
+            parts.append("2) **Stripe** — Monthly subscription (€9)\n")
+        text = "".join(parts)
+
+        if self.stripe_payment_link:
+            self.tg("sendMessage", {
+                "chat_id": chat_id,
+                "text": text,
+                "parse_mode": "Markdown",
+                "reply_markup": {
+                    "inline_keyboard": [[
+                        {"text": "Open Stripe (€9 / month)", "url": self.stripe_payment_link}
+                    ]]
+                }
+            })
+        else:
+            self.reply(chat_id, text)
+
+    def cmd_redeem(self, chat_id, uid, args):
+        code = (args[0] if args else "").strip()
+        if not code: self.reply(chat_id, "Usage: /redeem <CODE>"); return
+        if code == self.premium_code:
+            self.set_premium(uid, self.premium_days); self.reply(chat_id, "✅ Premium activated.")
+        else: self.reply(chat_id, "❌ Invalid code.")
+
+    def cmd_buy(self, chat_id):
+        if not self.enable_tg_pay or not self.provider_token:
+            self.reply(chat_id, "In‑app payments not configured. Use /premium for alternatives.")
+            return
+        prices = [{"label": self.premium_title, "amount": self.premium_price_eur * 100}]
+        self.tg("sendInvoice", {
+            "chat_id": chat_id, "title": self.premium_title, "description": self.premium_description,
+            "payload": "premium-purchase-30d", "provider_token": self.provider_token,
+            "currency": "EUR", "prices": prices, "need_name": False, "need_phone_number": False,
+            "need_email": False, "is_flexible": False
+        })
+
+    def handle_pre_checkout(self, pre_checkout_query):
+        self.tg("answerPreCheckoutQuery", {"pre_checkout_query_id": pre_checkout_query["id"], "ok": True})
+
+    def handle_successful_payment(self, chat_id, uid):
+        self.set_premium(uid, self.premium_days)
+        self.reply(chat_id, "🎉 Payment received! Premium activated for 30 days.")
+
+    def cmd_status(self, chat_id, uid):
+        premium, uses = self.user_state(uid)
+        prem = "✅ active" if premium else "❌ not active"
+        self.reply(chat_id, f"*Status*\nPremium: {prem}\nToday: {uses}/{self.free_daily}", "Markdown")
+
+    def cmd_presets(self, chat_id):
+        lines = "\n".join(f"{command} {arg}" for command, arg in self.profile.presets)
+        self.reply(chat_id, f"Presets ({self.profile.title}):\n{lines}")
+
+    def cmd_start(self, chat_id):
+        self.reply(chat_id, self.profile.start.format(free=self.free_daily))
+
+    def ensure_quota_or_block(self, chat_id, uid, command=""):
+        reservation = self.reserve_quota(uid, command=command)
+        if reservation: return reservation
+        trace.tag(status="paywall")
+        self.reply(chat_id, self.profile.paywall.format(free=self.free_daily))
+        return None
+
+    def prompt(self, command, arg): return self.profile.commands[command].prompt(arg)
+
+    def _llm_route(self, command): return lambda chat_id, uid, arg: self.run_command(chat_id, uid, command, arg)
+
+    def claim(self, chat_id, uid, command, arg):
+        """The in-flight claim for a request, or None after handling a duplicate or a busy user."""
+        flight = inflight.claim(self.name, uid, command, arg)
+        if flight.status == "claimed": return flight
+        trace.tag(status="busy" if flight.status == "busy" else "coalesced")
+        # Same request running here: its reply already answers this tap, so only wait for it to finish.
+        # Nothing is charged, the claim comes before the quota.
+        if flight.status == "joined": flight.wait()
+        elif flight.status == "busy":
+            self.reply(chat_id, f"⏳ You already have {flight.running} requests running, "
+                                "send this again when they are done.")
+        return None
+
+    def run_command(self, chat_id, uid, command, arg):
+        spec = self.profile.commands[command]
+        if not arg: self.reply(chat_id, spec.usage); return
+        arg = spec.fit(arg)  # the cut argument also keys the response cache and the in-flight claim
+        # Claimed before the quota: a duplicate tap is neither charged nor sent to the LLM.
+        flight = self.claim(chat_id, uid, command, arg)
+        if not flight: return
+        with flight:
+            reservation = self.ensure_quota_or_block(chat_id, uid, command)
+            if not reservation: return
+            with reservation:
+                flight.result = self.answer(chat_id, spec.prompt(arg), arg, spec.max_tokens, spec.tier,
+                                            reservation.premium)
+                if getattr(flight.result, "cut", False): reservation.refund()  # deadline or token limit hit
+
+    def help_text(self):
+        bulk_help = " /bulk" if self.profile.bulk else ""
+        return "Commands: " + " ".join(self.llm_commands) + bulk_help + " /presets /status /premium /redeem /buy"
+
+    def cmd_bulk_help(self, chat_id):
+        names = " ".join(self.profile.bulk)
+        self.reply(chat_id, "📦 *Bulk mode*: send your inventory as a CSV (with a header row) or JSONL file, "
+                            f"up to {bulk.BULK_MAX_ITEMS} items. Put the commands to run in the caption "
+                            f"(default: {names}). Each item uses one prompt per command.")
+
+    def cmd_bulk(self, chat_id, uid, document, caption):
+        """Run the profile's bulk commands over an uploaded inventory and send it back with the results."""
+        commands = [c for c in caption.lower().split() if c in self.profile.bulk] or list(self.profile.bulk)
+        if int(document.get("file_size") or 0) > bulk.BULK_MAX_BYTES:
+            self.reply(chat_id, f"The file is too large (max {bulk.BULK_MAX_BYTES // 1024} KB)."); return
+        # The same file sent again while its first run is going is one run.
+        flight = self.claim(chat_id, uid, "/bulk", f"{document.get('file_unique_id') or document['file_id']} {caption}")
+        if not flight: return
+        with flight: self._bulk_run(chat_id, uid, document, commands)
+
+    def _bulk_run(self, chat_id, uid, document, commands):
+        stop = self._bulk_deadline()  # counted from before the download
+        try: rows, fmt = bulk.parse(document.get("file_name"), telegram.download(self.token, document["file_id"]) or b"")
+        except bulk.BulkError as e: self.reply(chat_id, str(e)); return
+        # One reservation for the whole file: a single quota round trip, refunded for items that fail.
+        cost = len(rows) * len(commands)
+        reservation = self.reserve_quota(uid, cost, "/bulk")
+        if not reservation:
+            self.reply(chat_id, f"📦 This file needs {cost} prompts and the free plan has {self.free_daily} a day.\n"
+                                "Bulk runs are unlimited with **/buy** or **/premium**.")
+            return
+        with reservation:
+            progress = bulk.Progress(self.tg, chat_id, len(rows))
+            state = {"chat_id": chat_id, "uid": uid, "rows": rows, "fmt": fmt, "commands": commands, "next": 0,
+                     "name": (document.get("file_name") or "inventory").rsplit(".", 1)[0] + "-listings." + fmt,
+                     "message_id": progress.message_id,
+                     "reservation": [reservation.user_key, reservation.day, reservation.charged]}
+            self._bulk_step(state, progress, reservation, stop)
+
+    def _bulk_resume(self, key):
+        # A queued continuation: picks the run up at the part where the last invocation stopped.
+        state = bulk.load(key)
+        if state is None: trace.tag(status="expired"); return
+        progress = bulk.Progress(self.tg, state["chat_id"], len(state["rows"]), message_id=state["message_id"])
+        user_key, day, charged = state["reservation"]
+        # Not a context manager: a failing continuation is retried by the queue, with the quota still held.
+        self._bulk_step(state, progress, quota.Reservation(user_key, day, True, 0, charged), self._bulk_deadline(), key)
+
+    def _bulk_deadline(self):
+        # This invocation's share of a run: bulk_budget seconds, never past the deadline of the job running it.
+        limits = [d for d in (jobs.deadline.get(), self.bulk_budget and time.monotonic() + self.bulk_budget) if d]
+        return min(limits) if limits else None
+
+    def _bulk_step(self, state, progress, reservation, stop, key=None):
+        rows, commands = state["rows"], state["commands"]
+        chunk = batch.BATCH_SIZE if batch.BATCH_MODE == "multi" else 1
+        state["next"] = bulk.run(rows, commands, self.prompt, self._generate, chunk, progress=progress.update,
+                                 start=state["next"], deadline=stop)
+        if state["next"] is not None:
+            # Out of time: the rest goes to the queue (drained by ?drain=1 or the worker) and resumes from here.
+            self.queue.push({"bulk_run": bulk.save(self.name, state, key)}, state["uid"])
+            return
+        if key: bulk.drop(key)
+        failed, prompts = bulk.failures(rows, commands)
+        reservation.release(prompts)
+        chat_id = state["chat_id"]
+        self.tg("sendDocument", {"chat_id": chat_id, "caption": f"{len(rows) - failed}/{len(rows)} items"},
+                files={"document": (state["name"], bulk.render(rows, state["fmt"]))})
+        note = f", {failed} failed ({prompts} prompts not charged)" if failed else ""
+        icon = "⚠️" if failed else "✅"
+        progress.update(len(rows), f"{icon} Bulk run done: {len(rows) - failed}/{len(rows)} items{note}", force=True)
+
+    def route(self, text):
+        """(handler, arg) for a message text; handler is None for text addressed to another bot."""
+        command, mention, arg = telegram.split_command(text)
+        if mention and self.username and mention != self.username: return None, arg
+        return self.routes.get(command, self._help), arg
+
+    def _help(self, chat_id, uid, arg): self.reply(chat_id, self.help_text())
+
+    def handle_update(self, update):
+        # Every update id is claimed (SET NX) before anything else runs, so a redelivery sends nothing;
+        # if handling fails the claim is dropped and Telegram's retry goes through.
+        with trace.update(self.name, update.get("update_id")):
+            key = dedup.update_key(self.name, update)
+            if not dedup.first_delivery(key): trace.tag(status="duplicate"); return
+            try: self._dispatch(update)
+            except Exception:
+                dedup.forget(key); raise
+
+    def _dispatch(self, update):
+        if "bulk_run" in update:
+            trace.tag(command="/bulk")
+            with trace.span("handler", "/bulk"): self._bulk_resume(update["bulk_run"])
+            return
+        if "pre_checkout_query" in update:
+            trace.tag(command="pre_checkout")
+            self.handle_pre_checkout(update["pre_checkout_query"])
+            return
+        msg = update.get("message") or update.get("edited_message")
+        if not msg: return
+
+        chat_id = msg["chat"]["id"]; uid = msg["from"]["id"]; text = msg.get("text","")
+        trace.tag(uid=trace.uid_hash(uid))
+        if "successful_payment" in msg:
+            trace.tag(command="payment")
+            self.handle_successful_payment(chat_id, uid)
+            return
+
+        if "document" in msg and self.profile.bulk:
+            trace.tag(command="/bulk")
+            with trace.span("handler", "/bulk"): self.cmd_bulk(chat_id, uid, msg["document"], msg.get("caption") or "")
+            return
+
+        handler, arg = self.route(text)
+        if not handler: return
+        command = telegram.split_command(text)[0]
+        command = command if command in self.routes else "help"  # bounded label values
+        trace.tag(command=command)
+        with trace.span("handler", command): handler(chat_id, uid, arg)
+
+    def accept_update(self, update):
+        # Queue mode: LLM work goes to Redis and the webhook answers before Telegram retries.
+        _, uid, command = telegram.parse_command(update)
+        heavy = command in self.llm_commands or (self.profile.bulk and "document" in (update.get("message") or {}))
+        if self.queue_updates and heavy: self.queue.push(update, uid)
+        else: self.handle_update(update)
+
+    def generate_many(self, prompts, model=None):
+        return batch.complete_many(self.system_prompt, prompts, generate=lambda p: self.llm(p, model=model))
+
+    def _generate(self, prompts, command=None):
+        # Answers right away: multi-prompt requests with BATCH_MODE=multi, else one call per prompt.
+        model = self.model_for(command)
+        if batch.BATCH_MODE == "multi": return self.generate_many(prompts, model)
+        return [self.llm(p, model=model) for p in prompts]
+
+    def submit_batch(self, items, model=None):
+        """Send `{custom_id: (prompt, delivery)}` to the Batch API; `collect_batches` delivers the answers."""
+        batch_id = batch.submit(self.system_prompt, {cid: prompt for cid, (prompt, _) in items.items()}, model)
+        self.batches.add(batch_id, {cid: delivery for cid, (_, delivery) in items.items()})
+        return batch_id
+
+    def deliver(self, delivery, text):
+        # A delivery pins the answer in the response cache (prewarmed presets).
+        if "pin" in delivery: responses.pin(delivery["pin"], [(str(text), openai.total_tokens(text.usage))])
+
+    def collect_batches(self): return self.batches.collect(self.deliver)
+
+    def warm_presets(self, variants=1):
+        # Scheduled refresh: each run rotates `variants` new answers into every preset's pool.
+        builders = {c: spec.prompt for c, spec in self.profile.commands.items()}
+        models = {c: self.model_for(c) for c in builders}
+        if batch.BATCH_MODE == "openai":
+            # A Batch API input file targets a single model: one job per model.
+            pending = presets.prompts(self.system_prompt, self.profile.presets, builders, models)
+            for model in dict.fromkeys(job[4] for job in pending):
+                self.submit_batch({f"preset-{i}-{v}": (prompt, {"pin": key}) for v in range(variants)
+                                   for i, (_, _, prompt, key, m) in enumerate(pending) if m == model}, model)
+            return len(pending) * variants
+        many = self.generate_many if batch.BATCH_MODE == "multi" else None
+        return presets.warm(self.name, self.system_prompt, self.profile.presets, builders, self.llm, variants,
+                            generate_many=many, models=models)
+
+class Engine:
+    """Hosts one or more bots in a process so they share connection pools, caches and the queue worker.
+
+    Updates are routed by a `?bot=<name>` query or, without one, by the
+    `X-Telegram-Bot-Api-Secret-Token` header (each bot's WEBHOOK_SECRET); with a single bot
+    everything goes to it. A bot with a secret only accepts updates that carry it, however
+    they were routed. A secret several bots share (the shared WEBHOOK_SECRET) does not pick
+    a bot: those webhooks need `?bot=`.
+    """
+    def __init__(self, profiles):
+        self.bots = {p.name: Bot(p) for p in profiles}
+        secrets = [b.webhook_secret for b in self.bots.values() if b.webhook_secret]
+        self.by_secret = {b.webhook_secret: b for b in self.bots.values()
+                          if b.webhook_secret and secrets.count(b.webhook_secret) == 1}
+        self.cron = {"drain": self.drain, "prewarm": self.prewarm, "batches": self.collect_batches,
+                     "metrics": trace.metrics.render,
+                     "latency": lambda: json.dumps(routing.stats()),
+                     "transport": lambda: json.dumps(transport.stats()),
+                     "cache": lambda: json.dumps(cache.local.stats()),
+                     "responses": lambda: json.dumps({name: responses.stats(name) for name in self.bots}),
+                     "aggregate": analytics.aggregate, "analytics": lambda: json.dumps(self.analytics_summary())}
+
+    def route(self, query, headers):
+        secret = headers.get("x-telegram-bot-api-secret-token") or ""
+        name = (query.get("bot") or [""])[0]
+        if name: bot = self.bots.get(name)
+        else: bot = self.by_secret.get(secret) or (next(iter(self.bots.values())) if len(self.bots) == 1 else None)
+        if bot is None or (bot.webhook_secret and not hmac.compare_digest(secret.encode(), bot.webhook_secret.encode())): return None
+        return bot
+
+    def drain(self, budget=jobs.WORKER_BUDGET):
+        # One time budget for all bots, so a cron invocation stays under maxDuration.
+        started, done = time.monotonic(), 0
+        for bot in self.bots.values():
+            left = None if budget is None else budget - (time.monotonic() - started)
+            if left is not None and left <= 0: break
+            done += jobs.drain(bot.queue, bot.handle_update, budget=left)
+        return done
+
+    def prewarm(self, variants=1): return sum(bot.warm_presets(variants) for bot in self.bots.values())
+
+    def collect_batches(self): return sum(bot.collect_batches() for bot in self.bots.values())
+
+    def analytics_summary(self, hours=24): return {name: analytics.summary(name, hours) for name in self.bots}
+
+    def migrate_users(self, name=None):
+        # The old keys were shared: every bot hosted here (or the named one) gets its own copy.
+        return sum(users.migrate(bot) for bot in ([name] if name else self.bots))
+
+    def run_worker(self):
+        for bot in self.bots.values(): bot.bulk_budget = 0
+        jobs.run_worker([(bot.queue, bot.handle_update) for bot in self.bots.values()])
+
+    def poll(self, delete_webhook=False):
+        from spacebotty import polling
+        for bot in self.bots.values(): bot.bulk_budget = 0  # nothing drains the queue while polling
+        polling.run(list(self.bots.values()), delete_webhook=delete_webhook)
+
+    def http_handler(self):
+        """BaseHTTPRequestHandler class for Vercel's Python runtime, bound to this engine."""
+        engine = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                query = parse_qs(urlsplit(self.path).query)
+                bot = engine.route(query, {k.lower(): v for k, v in self.headers.items()})
+                if bot is None: self.send_response(403); self.end_headers(); return
+                body = self.rfile.read(int(self.headers.get("content-length","0")))
+                update = json.loads(body.decode("utf-8"))
+                bot.accept_update(update)
+                self._ok()
+            def do_GET(self):
+                query = parse_qs(urlsplit(self.path).query)
+                task = next((fn for name, fn in engine.cron.items() if query.get(name) == ["1"]), None)
+                if task:
+                    # Vercel Cron entry point: ?drain=1 (queue consumer), ?prewarm=1 (preset refresh),
+                    # ?batches=1 (Batch API results), ?latency=1 (model latency quantiles),
+                    # ?transport=1 (this instance's requests and new connections per upstream host),
+                    # ?cache=1 (this instance's local user-record cache: hits, misses, size),
+                    # ?responses=1 (response cache hit ratio and saved tokens per bot, all instances),
+                    # ?metrics=1 (this instance's span and update metrics, Prometheus text format),
+                    # ?aggregate=1 (roll analytics events into hourly counters), ?analytics=1 (last 24h per bot).
+                    if not jobs.cron_authorized(self.headers.get("authorization")):
+                        self.send_response(401); self.end_headers(); return
+                    done = task(); self._ok(); self.wfile.write(str(done).encode()); return
+                self._ok(); self.wfile.write(b"OK")
+            def _ok(self): self.send_response(200); self.send_header("Content-Type","text/plain"); self.end_headers()
+
+        return WebhookHandler
+
+    def asgi_app(self):
+        from spacebotty.asgi import WebhookApp
+        return WebhookApp(self)
+
+    def main(self, argv):
+        # python api/telegram.py            -> long-running queue consumer
+        # python api/telegram.py prewarm    -> fill every preset's variant pool
+        # python api/telegram.py batches    -> deliver finished Batch API jobs
+        # python api/telegram.py poll [--delete-webhook] -> getUpdates long polling instead of the webhook
+        # python api/telegram.py migrate-users [bot] -> copy the old premium flags into each bot's user records
+        # python api/telegram.py aggregate  -> roll analytics events into hourly counters
+        # python api/telegram.py analytics [hours] -> per-bot command, latency, token and funnel summary
+        if argv == ["prewarm"]: print(self.prewarm(responses.RESPONSE_CACHE_VARIANTS))
+        elif argv == ["batches"]: print(self.collect_batches())
+        elif argv[:1] == ["migrate-users"]: print(self.migrate_users(*argv[1:2]))
+        elif argv == ["aggregate"]: print(analytics.aggregate())
+        elif argv[:1] == ["analytics"]: print(json.dumps(self.analytics_summary(*map(int, argv[1:2])), indent=2))
+        elif argv[:1] == ["poll"]: self.poll(delete_webhook="--delete-webhook" in argv)
+        else: self.run_worker()
+
+def serve(profiles, namespace):
+    """Populate an `api/*.py` module namespace with what Vercel looks for.
+
+    Vercel serves `handler` (BaseHTTPRequestHandler) or, if absent, the ASGI `app`.
+    """
+    engine = Engine(profiles)
+    if ASYNC_WEBHOOK: namespace["app"] = engine.asgi_app()
+    else: namespace["handler"] = engine.http_handler()
+    namespace["engine"] = engine
+    return engine
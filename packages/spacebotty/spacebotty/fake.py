@@ -0,0 +1,68 @@
+import re, time, zlib, random
+
+WORDS = ("growth audience hook story launch simple proven honest fresh bold clear quick smart "
+         "listing condition brand size value deal style classic vintage perfect daily plan").split()
+_MARKER = re.compile(r"^<<<(\d+)>>>$", re.M)
+
+class Behaviour:
+    """Latency and error profile of a fake upstream, parsed from "key=value,..." settings.
+
+    ttft: seconds before the first token (or the whole answer's base latency);
+    per_token: seconds per generated word; tokens: words per answer; jitter: +/- fraction
+    applied to every delay; error_rate: share of calls failing with error_status;
+    seed: makes the error pattern repeatable.
+    """
+    def __init__(self, ttft=0.0, per_token=0.0, tokens=40, jitter=0.0, error_rate=0.0, error_status=500, seed=0):
+        self.ttft = float(ttft)
+        self.per_token = float(per_token)
+        self.tokens = int(tokens)
+        self.jitter = float(jitter)
+        self.error_rate = float(error_rate)
+        self.error_status = int(error_status)
+        self.rng = random.Random(int(seed))
+
+    @classmethod
+    def parse(cls, spec):
+        fields = dict(part.split("=", 1) for part in (spec or "").replace(" ", "").split(",") if "=" in part)
+        return cls(**fields)
+
+    def delay(self, seconds):
+        return max(seconds * (1 + self.jitter * (2 * self.rng.random() - 1)), 0.0) if seconds else 0.0
+
+    def sleep(self, seconds):
+        seconds = self.delay(seconds)
+        if seconds: time.sleep(seconds)
+
+    def fails(self): return self.error_rate > 0 and self.rng.random() < self.error_rate
+
+def text(prompt, words=40):
+    """A deterministic answer for `prompt`; combined `<<<n>>>` prompts get one answer per marker."""
+    markers = _MARKER.findall(prompt)
+    if markers: return "\n".join(f"<<<{n}>>>\n{text(f'{n}:{prompt}', words)}" for n in markers)
+    rng = random.Random(zlib.crc32(prompt.encode()))
+    return " ".join(rng.choice(WORDS) for _ in range(max(words, 1))).capitalize() + "."
+
+def _usage(body, answer):
+    prompt = sum(len(m.get("content") or "") for m in body.get("messages") or []) // 4
+    completion = len(answer) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+def _prompt(body): return ((body.get("messages") or [{}])[-1].get("content")) or ""
+
+def completion(body, behaviour):
+    """A chat.completion response dict for `body`, after the behaviour's latency."""
+    answer = text(_prompt(body), behaviour.tokens)
+    behaviour.sleep(behaviour.ttft + behaviour.per_token * len(answer.split()))
+    return {"id": "chatcmpl-fake", "object": "chat.completion", "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+            "usage": _usage(body, answer)}
+
+def chunks(body, behaviour):
+    """chat.completion.chunk event dicts for `body`, each yielded after its delay; usage comes last."""
+    answer = text(_prompt(body), behaviour.tokens)
+    behaviour.sleep(behaviour.ttft)
+    for i, word in enumerate(answer.split(" ")):
+        if i: behaviour.sleep(behaviour.per_token)
+        yield {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": (" " if i else "") + word}}]}
+    yield {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    yield {"object": "chat.completion.chunk", "choices": [], "usage": _usage(body, answer)}
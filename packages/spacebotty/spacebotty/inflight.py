@@ -0,0 +1,93 @@
+import os, time, hashlib, logging, threading
+from spacebotty.responses import normalize
+from spacebotty.upstash import eval_script
+
+log = logging.getLogger("spacebotty.inflight")
+
+# Claim each LLM command in Redis: a marker per (uid, command, args) so a duplicate on any
+# instance attaches to the running request, and a lease counting the user's running requests.
+INFLIGHT_GUARD = os.getenv("INFLIGHT_GUARD", "true").lower() == "true"
+# LLM commands (and bulk runs) one user may have running at once across all instances; 0: no cap.
+USER_INFLIGHT_MAX = int(os.getenv("USER_INFLIGHT_MAX", "2"))
+# Marker and lease lifetime: longer than any request, so a killed function frees them.
+INFLIGHT_TTL = int(os.getenv("INFLIGHT_TTL", "120"))
+# How long a duplicate in this process waits for the running request's answer.
+INFLIGHT_WAIT = float(os.getenv("INFLIGHT_WAIT", "30"))
+
+# KEYS[1] request marker, KEYS[2] the user's leases (sorted set of markers scored by expiry);
+# ARGV[1] cap (0: none), ARGV[2] TTL, ARGV[3] now (unix seconds). A lease left by a killed
+# function expires on its own, whatever the user sends meanwhile.
+# Returns {0, 0} when the same request is already running, {-1, n} when the user already has
+# n requests running, {1, n} once claimed as the user's n-th.
+ENTER_LUA = """
+if redis.call("EXISTS", KEYS[1]) == 1 then return {0, 0} end
+redis.call("ZREMRANGEBYSCORE", KEYS[2], "-inf", ARGV[3])
+local n = redis.call("ZCARD", KEYS[2])
+if tonumber(ARGV[1]) > 0 and n >= tonumber(ARGV[1]) then return {-1, n} end
+redis.call("ZADD", KEYS[2], tonumber(ARGV[3]) + tonumber(ARGV[2]), KEYS[1])
+redis.call("EXPIRE", KEYS[2], ARGV[2])
+redis.call("SET", KEYS[1], "1", "EX", ARGV[2])
+return {1, n + 1}
+"""
+
+# KEYS[1] request marker, KEYS[2] the user's leases; returns the leases left.
+LEAVE_LUA = """
+redis.call("DEL", KEYS[1])
+redis.call("ZREM", KEYS[2], KEYS[1])
+return redis.call("ZCARD", KEYS[2])
+"""
+
+_flights, _lock = {}, threading.Lock()
+
+def request_key(bot, uid, command, arg):
+    digest = hashlib.sha1(f"{command}\x1f{normalize(arg)}".encode()).hexdigest()[:16]
+    return f"inflight:{bot}:{uid}:{digest}"
+
+def lease_key(uid): return f"user:{uid}:leases"
+
+class Flight:
+    """One claimed request; `status` is "claimed", "joined" (same request running in this
+    process), "running" (on another instance) or "busy" (the user is at USER_INFLIGHT_MAX).
+
+    Run a claimed flight as a context manager and set `result`; a duplicate that joined it
+    can `wait()` for it to finish (and get `result`). Leaving the block releases the marker
+    and the lease.
+    """
+    def __init__(self, key, uid, status="claimed"):
+        self.key, self.uid, self.status = key, uid, status
+        self.result, self.running, self.redis = None, 0, False
+        self.done = threading.Event()
+
+    def wait(self, timeout=INFLIGHT_WAIT):
+        return self.result if self.done.wait(timeout) else None
+
+    def __enter__(self): return self
+
+    def __exit__(self, *exc):
+        try:
+            if self.redis: eval_script(LEAVE_LUA, [self.key, lease_key(self.uid)])
+        finally:
+            with _lock: _flights.pop(self.key, None)
+            self.done.set()
+        return False
+
+class Joined:
+    def __init__(self, flight): self.status, self.flight = "joined", flight
+    def wait(self, timeout=INFLIGHT_WAIT): return self.flight.wait(timeout)
+
+def claim(bot, uid, command, arg):
+    """Claim (uid, command, normalized arg) for this update: a `Flight`, or how it is already taken."""
+    key = request_key(bot, uid, command, arg)
+    with _lock:
+        running = _flights.get(key)
+        if running is not None: return Joined(running)
+        flight = _flights[key] = Flight(key, uid)
+    if not INFLIGHT_GUARD: return flight
+    try: result = eval_script(ENTER_LUA, [key, lease_key(uid)], [USER_INFLIGHT_MAX, INFLIGHT_TTL, int(time.time())])
+    except Exception: log.warning("in-flight claim failed for %s", key, exc_info=True); result = None
+    if not result: return flight  # Redis unreachable or erroring: fail open, like quota.reserve
+    claimed, flight.running = (int(x) for x in result)
+    if claimed == 1: flight.redis = True; return flight
+    flight.status = "running" if claimed == 0 else "busy"
+    flight.__exit__(None, None, None)
+    return flight
@@ -0,0 +1,158 @@
+import os, json, time, hmac, logging, contextvars
+from concurrent.futures import ThreadPoolExecutor
+from spacebotty.upstash import command, eval_script, multi_exec, pipeline
+
+log = logging.getLogger("spacebotty.jobs")
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+WORKER_BATCH = int(os.getenv("WORKER_BATCH", "16"))
+# Vercel functions get maxDuration=10s; leave room to answer the cron request.
+WORKER_BUDGET = float(os.getenv("WORKER_BUDGET", "7"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Seconds a claimed job may stay unacknowledged before a drain puts it back (its function was
+# killed mid-job); longer than any job, since a job running past it is handled twice.
+JOB_VISIBILITY = int(os.getenv("JOB_VISIBILITY", "120"))
+CRON_SECRET = os.getenv("CRON_SECRET", "")
+
+# time.monotonic() by which the job being handled should be done (None: no limit); long jobs such
+# as bulk runs stop there and queue the rest.
+deadline = contextvars.ContextVar("job_deadline", default=None)
+
+def cron_authorized(authorization):
+    # Vercel Cron sends "Authorization: Bearer $CRON_SECRET"; without a secret the drain stays closed.
+    return bool(CRON_SECRET) and hmac.compare_digest((authorization or "").encode(), f"Bearer {CRON_SECRET}".encode())
+
+# KEYS[1] queue, KEYS[2] processing list, KEYS[3] claims (jobs scored by visibility deadline);
+# ARGV[1] jobs to take, ARGV[2] their deadline. Returns the claimed jobs.
+CLAIM_LUA = """
+local raws = {}
+for i = 1, tonumber(ARGV[1]) do
+  local raw = redis.call("LMOVE", KEYS[1], KEYS[2], "RIGHT", "LEFT")
+  if not raw then break end
+  redis.call("ZADD", KEYS[3], ARGV[2], raw)
+  raws[#raws + 1] = raw
+end
+return raws
+"""
+
+# Same keys; ARGV[1] now. Claims past their deadline go back to the head of the queue, walking
+# the processing list newest first so the oldest job ends up first in line again.
+RECLAIM_LUA = """
+local stale, moved = {}, 0
+for _, raw in ipairs(redis.call("ZRANGEBYSCORE", KEYS[3], "-inf", ARGV[1])) do
+  stale[raw] = true
+  redis.call("ZREM", KEYS[3], raw)
+end
+for _, raw in ipairs(redis.call("LRANGE", KEYS[2], 0, -1)) do
+  if stale[raw] then
+    stale[raw] = nil
+    redis.call("LREM", KEYS[2], 1, raw)
+    redis.call("RPUSH", KEYS[1], raw)
+    moved = moved + 1
+  end
+end
+return moved
+"""
+
+class Queue:
+    """Durable FIFO of Telegram updates (and continuations of bulk runs) in a Redis list.
+
+    Jobs are claimed with LMOVE into a processing list and only removed once
+    handled. Each claim carries a visibility deadline: a job whose function was
+    killed is put back by the next `drain` (`reclaim`), and `recover()` puts
+    back everything when a long-running worker starts.
+    """
+    def __init__(self, name):
+        self.key = f"queue:{name}"
+        self.processing = f"{self.key}:processing"
+        self.dead = f"{self.key}:dead"
+        self.claims = f"{self.key}:claims"
+        self.keys = [self.key, self.processing, self.claims]
+
+    def push(self, update, uid):
+        command("LPUSH", self.key, json.dumps({"uid": uid, "update": update, "attempts": 0}))
+
+    def claim(self, n):
+        # One EVAL for up to n jobs, each stamped with its visibility deadline.
+        return eval_script(CLAIM_LUA, self.keys, [n, int(time.time()) + JOB_VISIBILITY]) or []
+
+    def ack(self, raw): pipeline([["LREM", self.processing, 1, raw], ["ZREM", self.claims, raw]])
+
+    def release(self, raws):
+        """Put claimed jobs that were not started back at the head of the queue, in their order."""
+        multi_exec([c for raw in reversed(raws) for c in
+                    (["LREM", self.processing, 1, raw], ["ZREM", self.claims, raw], ["RPUSH", self.key, raw])])
+
+    def reclaim(self):
+        """Put back jobs claimed longer than JOB_VISIBILITY ago; returns how many."""
+        return int(eval_script(RECLAIM_LUA, self.keys, [int(time.time())]) or 0)
+
+    def fail(self, raw, job):
+        job["attempts"] = job.get("attempts", 0) + 1
+        target = self.key if job["attempts"] < JOB_MAX_ATTEMPTS else self.dead
+        # Failed jobs go to the back of the queue, behind the user's later updates.
+        multi_exec([["LREM", self.processing, 1, raw], ["ZREM", self.claims, raw], ["LPUSH", target, json.dumps(job)]])
+
+    def recover(self):
+        """Move every claimed-but-unacknowledged job back to the head of the queue."""
+        moved = 0
+        while command("LMOVE", self.processing, self.key, "LEFT", "RIGHT"): moved += 1
+        command("DEL", self.claims)
+        return moved
+
+    def depth(self): return int(command("LLEN", self.key) or 0)
+
+def _run_user_jobs(queue, handle_update, jobs, stop=None):
+    # Returns the jobs handled; past `stop` the rest go back unstarted. A running job sees `stop` as `deadline`.
+    token = deadline.set(stop)
+    try:
+        for i, (raw, job) in enumerate(jobs):
+            if stop is not None and time.monotonic() >= stop:
+                queue.release([raw for raw, _ in jobs[i:]]); return i
+            try:
+                handle_update(job["update"])
+            except Exception:
+                log.exception("job for uid %s failed (attempt %s)", job.get("uid"), job.get("attempts", 0) + 1)
+                queue.fail(raw, job)
+            else:
+                queue.ack(raw)
+        return len(jobs)
+    finally: deadline.reset(token)
+
+def drain(queue, handle_update, concurrency=WORKER_CONCURRENCY, batch=WORKER_BATCH, budget=WORKER_BUDGET):
+    """Process queued updates until the queue is empty or `budget` seconds have passed.
+
+    Jobs run on at most `concurrency` threads. Each user's jobs in a batch stay on
+    one thread in queue order, so one user's replies never overtake each other.
+    The budget is checked before every job, and `deadline` tells a running job
+    when it ends; jobs not started in time go back to the queue. Returns the
+    number of jobs handled.
+    """
+    started, done = time.monotonic(), 0
+    stop = None if budget is None else started + budget
+    reclaimed = queue.reclaim()
+    if reclaimed: log.warning("%s: requeued %d jobs past their visibility timeout", queue.key, reclaimed)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while stop is None or time.monotonic() < stop:
+            claimed = queue.claim(batch)
+            if not claimed: break
+            by_user = {}
+            for raw in claimed:
+                job = json.loads(raw)
+                by_user.setdefault(job.get("uid"), []).append((raw, job))
+            done += sum(f.result() for f in [pool.submit(_run_user_jobs, queue, handle_update, jobs, stop)
+                                             for jobs in by_user.values()])
+    return done
+
+def run_worker(queues, idle_sleep=1.0):
+    """Long-running consumer for local use or a container: recover, then drain forever.
+
+    `queues` is a list of (queue, handle_update) pairs, one per bot; each pass
+    drains every queue so one busy bot cannot starve the others.
+    """
+    logging.basicConfig(level=logging.INFO)
+    for queue, _ in queues: log.info("%s: recovered %d unacknowledged jobs", queue.key, queue.recover())
+    budget = WORKER_BUDGET if len(queues) > 1 else None
+    while True:
+        done = sum(drain(queue, handle_update, budget=budget) for queue, handle_update in queues)
+        if not done: time.sleep(idle_sleep)
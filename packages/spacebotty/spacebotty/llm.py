@@ -0,0 +1,122 @@
+import os, json
+from spacebotty import trace, transport
+
+# Any OpenAI-compatible server works here: OpenAI, a local vLLM/Ollama/llama.cpp server,
+# or the stand-in from `python -m spacebotty.standin`.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+OPENAI_URL = f"{OPENAI_BASE_URL}/chat/completions"
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-5-mini")
+# "http" (default) or "fake": deterministic in-process answers, no network, shaped by FAKE_LLM
+# (e.g. "ttft=0.4,per_token=0.01,jitter=0.3,error_rate=0.02", see fake.Behaviour).
+LLM_BACKEND = os.getenv("LLM_BACKEND", "http").lower()
+
+def _body(system, prompt, model, temperature, max_tokens=None):
+    body = {
+        "model": model or OPENAI_MODEL, "temperature": temperature,
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ]
+    }
+    # max_completion_tokens replaces max_tokens and also bounds reasoning models' hidden tokens.
+    if max_tokens: body["max_completion_tokens"] = max_tokens
+    return body
+
+def _headers(): return {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+
+def _cut(finish_reason, text):
+    # Reasoning models spend max_completion_tokens on hidden tokens too, so "length" can leave
+    # a partial answer or none at all.
+    return finish_reason == "length" or not text.strip()
+
+class Completion(str):
+    """The answer text; `usage` carries the response's token counts, `finish_reason` why it ended."""
+    usage = None
+    finish_reason = None
+
+    @property
+    def cut(self): return _cut(self.finish_reason, self)
+
+def total_tokens(usage): return int((usage or {}).get("total_tokens") or 0)
+
+class HTTPBackend:
+    """Chat completions from an OpenAI-compatible HTTP endpoint over the pooled transport."""
+    def __init__(self, url=OPENAI_URL):
+        self.url = url
+
+    def complete(self, body):
+        r = transport.post(self.url, json=body, headers=_headers())
+        r.raise_for_status()
+        return r.json()
+
+    def events(self, body):
+        """Parsed SSE events; the read timeout applies between chunks, not to the whole completion."""
+        with transport.post(self.url, json=body, headers=_headers(), stream=True) as r:
+            r.raise_for_status()
+            r.encoding = "utf-8"  # text/event-stream has no charset; requests would assume latin-1
+            for line in r.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"): continue
+                data = line[5:].strip()
+                if data == "[DONE]": continue  # read on to the end, so the connection can be reused
+                yield json.loads(data)
+
+class FakeBackend:
+    """Deterministic answers generated in-process, with the latency and errors of a `fake.Behaviour`."""
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+
+    def _check(self):
+        if self.behaviour.fails():
+            from requests import HTTPError
+            raise HTTPError(f"{self.behaviour.error_status} fake completion error")
+
+    def complete(self, body):
+        self._check()
+        from spacebotty import fake
+        return fake.completion(body, self.behaviour)
+
+    def events(self, body):
+        self._check()
+        from spacebotty import fake
+        yield from fake.chunks(body, self.behaviour)
+
+def _backend():
+    if LLM_BACKEND != "fake": return HTTPBackend()
+    from spacebotty import fake
+    return FakeBackend(fake.Behaviour.parse(os.getenv("FAKE_LLM")))
+
+backend = _backend()
+
+def complete(system, prompt, model=None, temperature=0.7, max_tokens=None):
+    with trace.span("llm", model or OPENAI_MODEL):
+        data = backend.complete(_body(system, prompt, model, temperature, max_tokens))
+    choice = data["choices"][0]
+    text = Completion((choice["message"].get("content") or "").strip())
+    text.usage, text.finish_reason = data.get("usage"), choice.get("finish_reason")
+    trace.add("tokens", total_tokens(text.usage))
+    return text
+
+class Stream:
+    """Iterate to get content deltas as the model produces them; `usage` and `cut` are set once exhausted."""
+    def __init__(self, system, prompt, model=None, temperature=0.7, max_tokens=None):
+        self.body = dict(_body(system, prompt, model, temperature, max_tokens), stream=True,
+                         stream_options={"include_usage": True})
+        self.usage = self.finish_reason = None
+        self.text = ""
+
+    @property
+    def cut(self): return _cut(self.finish_reason, self.text)
+
+    def __iter__(self):
+        with trace.span("llm", self.body.get("model") or OPENAI_MODEL):
+            for event in backend.events(self.body):
+                if event.get("usage"): self.usage = event["usage"]
+                choices = event.get("choices") or [{}]
+                self.finish_reason = choices[0].get("finish_reason") or self.finish_reason
+                delta = (choices[0].get("delta") or {}).get("content")
+                if delta: self.text += delta; yield delta
+        trace.add("tokens", total_tokens(self.usage))
+
+def stream(system, prompt, model=None, temperature=0.7, max_tokens=None):
+    return Stream(system, prompt, model, temperature, max_tokens)
@@ -0,0 +1,143 @@
+import os, time, logging, threading
+
+log = logging.getLogger("spacebotty.outbox")
+
+# Telegram allows a bot about 30 messages/s in total and about one per second in a chat
+# (short bursts pass). 0 turns a limit off.
+TELEGRAM_RATE = float(os.getenv("TELEGRAM_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+# Longest a call waits for its slot and retry_after pauses; beyond it RateLimited is raised,
+# which refunds the quota and lets Telegram (or the job queue) retry the update.
+TELEGRAM_MAX_WAIT = float(os.getenv("TELEGRAM_MAX_WAIT", "5"))
+TELEGRAM_RETRIES = int(os.getenv("TELEGRAM_RETRIES", "2"))
+# Plain replies queued behind each other for one chat go out as one message.
+TELEGRAM_COALESCE = os.getenv("TELEGRAM_COALESCE", "true").lower() == "true"
+MAX_MESSAGE_LEN = 4096
+MAX_CHATS = 10000
+
+# Reads and webhook setup are not counted against the send limits.
+UNLIMITED = {"getUpdates", "getFile", "getMe", "getWebhookInfo", "setWebhook", "deleteWebhook"}
+PLAIN = {"chat_id", "text", "parse_mode"}
+
+def chat_paced(method):
+    # New messages take a token from the chat's bucket; edits are paced by stream_reply
+    # (STREAM_EDIT_INTERVAL) but, like every call with a chat_id, wait out the chat's retry_after.
+    return method.startswith("send") and method != "sendChatAction"
+
+_lock = threading.Lock()
+_bots, _chats, _boxes = {}, {}, {}
+
+class RateLimited(Exception):
+    def __init__(self, method, retry_after):
+        super().__init__(f"{method}: rate limited for {retry_after:.1f}s")
+        self.method, self.retry_after = method, retry_after
+
+class Bucket:
+    """Token bucket; `reserve` takes a token now (or, with take=False, only honours a
+    retry_after block) and returns how long to wait before using it."""
+    def __init__(self, rate, burst):
+        self.rate, self.burst = rate, burst
+        self.tokens, self.at, self.blocked = burst, time.monotonic(), 0.0
+
+    def reserve(self, now, take=True):
+        wait = self.blocked - now
+        if self.rate and take:
+            self.tokens = min(self.burst, self.tokens + (now - self.at) * self.rate) - 1; self.at = now
+            if self.tokens < 0: wait = max(wait, -self.tokens / self.rate)
+        return max(wait, 0.0)
+
+    def cancel(self):
+        if self.rate: self.tokens += 1
+
+    def idle(self, now): return self.blocked <= now and self.tokens + (now - self.at) * self.rate >= self.burst
+
+class Box:
+    """A message waiting for its chat's slot; plain replies queued behind it are merged into it."""
+    def __init__(self, method, payload, coalesce):
+        self.payload = dict(payload)
+        self.coalesce = coalesce and method == "sendMessage" and payload.keys() <= PLAIN
+        self.done, self.response, self.error = threading.Event(), None, None
+
+    def merge(self, method, payload):
+        if not self.coalesce or method != "sendMessage" or payload.keys() - PLAIN: return False
+        if payload.get("parse_mode") != self.payload.get("parse_mode"): return False
+        text = f"{self.payload['text']}\n\n{payload['text']}"
+        if len(text) > MAX_MESSAGE_LEN: return False
+        self.payload["text"] = text
+        return True
+
+def send(token, method, payload, post, coalesce=False):
+    """`post(payload)` once the bot's and the chat's buckets allow it, retrying after 429s.
+
+    `coalesce` marks a reply whose response nobody reads: while an earlier message
+    for the chat waits for its slot, the reply is appended to it and both share
+    that message's response.
+    """
+    if method in UNLIMITED: return post(payload)
+    chat = payload.get("chat_id")
+    deadline = time.monotonic() + TELEGRAM_MAX_WAIT
+    key, box = (token, chat), None
+    with _lock:
+        waiting = _boxes.get(key)
+        if waiting is not None and coalesce and TELEGRAM_COALESCE and waiting.merge(method, payload):
+            box = waiting
+        else:
+            wait = _reserve(token, chat, method)
+            if wait and chat is not None and chat_paced(method): waiting = _boxes[key] = Box(method, payload, coalesce)
+            else: waiting = None
+    if box is not None:
+        box.done.wait()
+        if box.error is not None: raise box.error
+        return box.response
+    if wait: time.sleep(wait)
+    if waiting is None: return _post(token, chat, method, payload, post, deadline)
+    with _lock:
+        if _boxes.get(key) is waiting: del _boxes[key]
+    try:
+        waiting.response = _post(token, chat, method, waiting.payload, post, deadline); return waiting.response
+    except Exception as e:
+        waiting.error = e; raise
+    finally:
+        waiting.done.set()
+
+def _reserve(token, chat, method):
+    # Caller holds _lock. One token from the bot's bucket and, for new chat messages, the chat's.
+    now = time.monotonic()
+    bot = _bots.get(token) or _bots.setdefault(token, Bucket(TELEGRAM_RATE, max(TELEGRAM_RATE, 1)))
+    buckets = [bot]
+    if chat is not None:
+        bucket = _chats.get((token, chat))
+        if bucket is None:
+            if len(_chats) >= MAX_CHATS: _prune(now)
+            bucket = _chats[(token, chat)] = Bucket(TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST)
+        buckets.append(bucket)
+    takes = [True, chat_paced(method)]
+    wait = max(b.reserve(now, take) for b, take in zip(buckets, takes))
+    if wait > TELEGRAM_MAX_WAIT:
+        for b, take in zip(buckets, takes):
+            if take: b.cancel()
+        raise RateLimited(method, wait)
+    return wait
+
+def _prune(now):
+    for key in [k for k, b in _chats.items() if b.idle(now)]: del _chats[key]
+
+def _retry_after(r):
+    try: return float(r.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError): return float(r.headers.get("Retry-After") or 1)
+
+def _post(token, chat, method, payload, post, deadline):
+    for attempt in range(TELEGRAM_RETRIES + 1):
+        r = post(payload)
+        status = getattr(r, "status_code", 200)
+        if status != 429:
+            if status >= 400: log.warning("%s failed: HTTP %s %s", method, status, r.text[:200])
+            return r
+        # Telegram does not say which limit was hit: pause the chat the call was for (sends and
+        # edits alike), and the whole bot only for chat-less calls.
+        retry_after = _retry_after(r)
+        with _lock: (_chats.get((token, chat)) or _bots[token]).blocked = time.monotonic() + retry_after
+        if attempt == TELEGRAM_RETRIES or time.monotonic() + retry_after > deadline: raise RateLimited(method, retry_after)
+        log.warning("%s: 429, retrying in %.1fs", method, retry_after)
+        time.sleep(retry_after)
@@ -0,0 +1,117 @@
+import os, time, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from spacebotty import telegram, trace
+
+log = logging.getLogger("spacebotty.polling")
+
+# Seconds Telegram holds a getUpdates request open when there is nothing to deliver.
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", "25"))
+# Updates per getUpdates call (Telegram caps it at 100).
+POLL_LIMIT = int(os.getenv("POLL_LIMIT", "100"))
+# Worker threads shared by every bot in the process; one chat's updates stay on one thread.
+POLL_WORKERS = int(os.getenv("POLL_WORKERS", "8"))
+# Longest wait between retries after getUpdates or an update fails.
+POLL_BACKOFF_MAX = float(os.getenv("POLL_BACKOFF_MAX", "30"))
+# Times one update is handled before it is logged and skipped, so it cannot stall its chat forever.
+POLL_ATTEMPTS = int(os.getenv("POLL_ATTEMPTS", "5"))
+ALLOWED_UPDATES = ["message", "edited_message", "pre_checkout_query"]
+
+def chat_of(update):
+    msg = update.get("message") or update.get("edited_message")
+    if msg: return (msg.get("chat") or {}).get("id")
+    return ((update.get("pre_checkout_query") or {}).get("from") or {}).get("id")
+
+def uid_of(update):
+    body = update.get("message") or update.get("edited_message") or update.get("pre_checkout_query") or {}
+    return (body.get("from") or {}).get("id")
+
+def _run_chat(handle_update, updates, attempts, completed):
+    # Stops at the chat's first failure, so its later updates stay queued behind it; returns that
+    # update's id. Ids handled here (or given up on) go into `completed`.
+    for update in updates:
+        uid = update["update_id"]
+        try: handle_update(update)
+        except Exception:
+            n = attempts[uid] = attempts.get(uid, 0) + 1
+            if n < POLL_ATTEMPTS: log.exception("update %s failed (attempt %d), retrying", uid, n); return uid
+            log.exception("update %s failed %d times, skipping it", uid, n)
+        attempts.pop(uid, None); completed.add(uid)
+    return None
+
+class PollError(Exception):
+    def __init__(self, status, body):
+        super().__init__(f"getUpdates: HTTP {status} {body.get('description', '')}")
+        self.status, self.body = status, body
+
+class Poller:
+    """getUpdates loop for one bot.
+
+    Each batch is grouped by chat; the groups run on the shared pool, each in
+    update order, after one pipelined read of every uid's premium flag and day
+    counter. Ordering is per chat: a chat's update is never handled before
+    that chat's earlier ones have been, so its group stops at the first failed
+    update. The offset then stays at the earliest failure and the batch is
+    fetched again after a backoff; the ids already handled are remembered in
+    `completed` and skipped, so only the failed update and the ones queued
+    behind it in its chat run. After POLL_ATTEMPTS failures an update is
+    skipped. A crash redelivers the batch, and `dedup` drops what was answered.
+    """
+    def __init__(self, bot, pool, stop=None):
+        self.bot, self.pool = bot, pool
+        self.stop = stop or threading.Event()
+        self.offset, self.attempts, self.completed = None, {}, set()
+
+    def fetch(self):
+        payload = {"timeout": POLL_TIMEOUT, "limit": POLL_LIMIT, "allowed_updates": ALLOWED_UPDATES}
+        if self.offset is not None: payload["offset"] = self.offset
+        r = telegram.call(self.bot.token, "getUpdates", payload, timeout=(3, POLL_TIMEOUT + 10))
+        body = r.json()
+        if not body.get("ok"): raise PollError(r.status_code, body)
+        return body["result"]
+
+    def process(self, updates):
+        """Handle a batch; False when an update failed and the offset was kept at it."""
+        by_chat = {}
+        for update in updates:
+            if update["update_id"] not in self.completed: by_chat.setdefault(chat_of(update), []).append(update)
+        self.bot.prefetch({uid_of(u) for group in by_chat.values() for u in group} - {None})
+        futures = [trace.run_in_context(self.pool, _run_chat, self.bot.handle_update, group, self.attempts, self.completed)
+                   for group in by_chat.values()]
+        failed = [uid for uid in (f.result() for f in futures) if uid is not None]
+        self.offset = min(failed) if failed else updates[-1]["update_id"] + 1
+        self.completed = {uid for uid in self.completed if uid >= self.offset}
+        return not failed
+
+    def run(self):
+        backoff = 1.0
+        while not self.stop.is_set():
+            try:
+                updates = self.fetch()
+            except PollError as e:
+                if e.status == 409: log.error("%s: a webhook is set; run with --delete-webhook", self.bot.name)
+                else: log.warning("%s: getUpdates failed: %s", self.bot.name, e.body.get("description"))
+                wait = (e.body.get("parameters") or {}).get("retry_after") or backoff
+            except Exception:
+                log.exception("%s: getUpdates failed", self.bot.name); wait = backoff
+            else:
+                if not updates or self.process(updates): backoff = 1.0; continue
+                wait = backoff  # an update failed: fetch it again after a pause
+            backoff = min(backoff * 2, POLL_BACKOFF_MAX)
+            self.stop.wait(wait)
+
+def run(bots, workers=POLL_WORKERS, delete_webhook=False):
+    """Poll every bot in one process on a shared worker pool until interrupted."""
+    logging.basicConfig(level=logging.INFO)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pollers = [Poller(bot, pool, stop) for bot in bots]
+        threads = []
+        for p in pollers:
+            if delete_webhook: telegram.call(p.bot.token, "deleteWebhook", {})
+            log.info("%s: polling", p.bot.name)
+            threads.append(threading.Thread(target=p.run, name=f"poll-{p.bot.name}", daemon=True)); threads[-1].start()
+        try:
+            while any(t.is_alive() for t in threads): time.sleep(0.5)
+        except KeyboardInterrupt:
+            log.info("stopping after the current batches"); stop.set()
+        for t in threads: t.join()
@@ -0,0 +1,64 @@
+import os, logging
+from concurrent.futures import ThreadPoolExecutor
+from spacebotty import responses
+from spacebotty.llm import OPENAI_MODEL, total_tokens
+
+log = logging.getLogger("spacebotty.presets")
+
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "4"))
+
+def warmable(presets):
+    # "[paste your current listing]"-style entries are instructions, not prompts.
+    return [(command, arg) for command, arg in presets if arg and not arg.startswith("[")]
+
+def prompts(system, presets, builders, models=None):
+    """(command, arg, prompt, cache key, model) for every warmable preset.
+
+    `models` maps commands to the model their answers are generated with (and cached under).
+    """
+    out = []
+    for command, arg in warmable(presets):
+        if command not in builders: continue
+        prompt, model = builders[command](arg), (models or {}).get(command) or OPENAI_MODEL
+        out.append((command, arg, prompt, responses.cache_key(model, system, prompt, arg), model))
+    return out
+
+def _answer(text): return str(text), total_tokens(getattr(text, "usage", None))
+
+def warm(bot, system, presets, builders, generate, variants=1, concurrency=PREWARM_CONCURRENCY, generate_many=None,
+         models=None):
+    """Render each preset through its command's prompt builder and pin `variants` fresh answers.
+
+    Run on a schedule with variants=1, each run rotates one new answer into every
+    preset's pool; `variants=responses.RESPONSE_CACHE_VARIANTS` fills the pools at once.
+    `generate(prompt, model=...)` makes one answer; with `generate_many(prompts, model)`
+    each model's prompts are generated in batched requests instead. Returns the number
+    of answers generated.
+    """
+    jobs = prompts(system, presets, builders, models)
+    if generate_many:
+        done = 0
+        for model in dict.fromkeys(job[4] for job in jobs):
+            group = [job for job in jobs if job[4] == model]
+            # Variant-major order keeps repeats of one prompt out of the same combined request.
+            try: texts = generate_many([job[2] for _ in range(variants) for job in group], model)
+            except Exception:
+                log.exception("prewarm %s batch for %s failed", bot, model); continue
+            for i, job in enumerate(group):
+                responses.pin(job[3], [_answer(t) for t in texts[i::len(group)] if not getattr(t, "cut", False)])
+            done += len(texts)
+        return done
+
+    def one(job):
+        command, _, prompt, key, model = job
+        answers = []
+        for _ in range(variants):
+            try: text = generate(prompt, model=model)
+            except Exception:
+                log.exception("prewarm %s %s failed", bot, command); continue
+            if not getattr(text, "cut", False): answers.append(_answer(text))
+        responses.pin(key, answers)
+        return len(answers)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return sum(pool.map(one, jobs))
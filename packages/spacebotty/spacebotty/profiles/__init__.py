@@ -0,0 +1,4 @@
+"""Declarative bot profiles: prompts, commands, presets and copy; `engine.Engine` does the rest."""
+from spacebotty.profiles import creators, linkedin, secondhand
+
+PROFILES = {p.name: p for p in (linkedin.PROFILE, creators.PROFILE, secondhand.PROFILE)}
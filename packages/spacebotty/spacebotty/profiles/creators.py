@@ -0,0 +1,73 @@
+from textwrap import dedent
+from spacebotty.engine import Command, Profile
+
+SYSTEM_PROMPT = "You are an English content strategist for TikTok/Instagram. Return only the requested content; short, punchy, ready to use."
+
+COMMANDS = {
+    "/hooks": Command(
+        "topic", "Give me a topic: /hooks Instagram growth",
+        """
+        Generate *10 viral hooks* (1 line each) for Reels/Shorts/TikTok.
+        Techniques: curiosity, shock, bold promise, common mistake, counterintuitive fact.
+        Topic: {topic}
+        """, max_tokens=1200),
+    "/reels": Command(
+        "topic", "Give me a topic: /reels office automation",
+        """
+        Create *5 short scripts* (~20–35s) with structure:
+        1) Hook (1 line)
+        2) Beat-by-beat (3–5 points)
+        3) CTA (1 line)
+        Topic: {topic}
+        """, max_tokens=2000),
+    "/captions": Command(
+        "topic", "Give me a topic: /captions TikTok growth",
+        """
+        Create *5 captions* for IG/TikTok.
+        - Human, direct tone
+        - 1–2 emojis per sentence
+        - End with 5–8 targeted hashtags
+        Topic: {topic}
+        """, max_tokens=1600),
+    "/ideas": Command(
+        "topic", "Give me a topic: /ideas home fitness",
+        """
+        Propose *10 content ideas* for the specified niche.
+        Each in 1–2 lines: idea + unique angle + promised outcome.
+        Topic: {topic}
+        """, max_tokens=1600),
+}
+
+PRESETS = [
+    ("/hooks", "home workout tips"),
+    ("/reels", "quick editing tricks"),
+    ("/captions", "growth on TikTok"),
+    ("/ideas", "budget travel niche"),
+]
+
+START = dedent("""
+    🎬 **Welcome to *Creators AI***
+    Your AI assistant for hooks, reels scripts, captions, and viral ideas.
+
+    ⚡ Quick commands:
+    • /hooks → 10 viral hooks
+    • /reels → 5 short-form video scripts
+    • /captions → captions with emojis + hashtags
+    • /ideas → 10 fresh content ideas
+
+    🧩 {free} free prompts per day.
+    💎 Need more? **/buy** (€7 / 30 days) or **/premium** (€9 / month).
+
+    ✨ Try /presets to start in 10 seconds.
+    """)
+
+PAYWALL = dedent("""
+    💡 You’ve reached your {free} free prompts for today.
+
+    🔓 Unlock *unlimited prompts* with **/buy** (€7 / 30 days)
+    or **/premium** (€9 / month).
+
+    ✨ More ideas. More content. More reach.
+    """)
+
+PROFILE = Profile("creators", "Creators", SYSTEM_PROMPT, COMMANDS, PRESETS, START, PAYWALL)
@@ -0,0 +1,74 @@
+from textwrap import dedent
+from spacebotty.engine import Command, Profile
+
+SYSTEM_PROMPT = "You are an English content strategist for LinkedIn. Return only the requested content, clear and scannable."
+
+COMMANDS = {
+    "/openers": Command(
+        "topic", "Give me a topic: /openers grow your LinkedIn audience",
+        """
+        Generate *10 high-impact openers* (1 line each) for LinkedIn posts.
+        Mix formats: provocative question, counterintuitive fact, promise, common mistake, opinion.
+        Topic: {topic}
+        """, max_tokens=1200),
+    "/post": Command(
+        "topic", "Give me a topic: /post 3-step framework to grow on LinkedIn",
+        """
+        Write a *LinkedIn post* with:
+        - Headline (1 line) with strong hook
+        - Body: 6–10 short lines, spaced for readability (bullets if useful)
+        - Final CTA (1 line)
+        Be specific and practical; avoid empty buzzwords.
+        Topic: {topic}
+        """, max_tokens=1600),
+    "/comment": Command(
+        "topic", "Give me a topic: /comment personal branding for PMs",
+        """
+        Generate *5 sharp comments* for LinkedIn posts on the given topic.
+        Each: 1–2 sentences, concrete value or original angle; no empty praise.
+        Topic: {topic}
+        """, max_tokens=1200),
+    "/contentplan": Command(
+        "niche", "Give me a niche: /contentplan B2B SaaS",
+        """
+        Create a *7-day content plan* for LinkedIn.
+        For each day: Post title + Unique angle + Promised outcome (1–2 lines).
+        Niche: {niche}
+        """, max_tokens=2000, tier="large"),
+}
+
+PRESETS = [
+    ("/openers", "grow your LinkedIn audience as a PM"),
+    ("/post", "case study: reduce churn in B2B SaaS"),
+    ("/comment", "personal branding for engineers"),
+    ("/contentplan", "AI consultant in B2B"),
+]
+
+START = dedent("""
+    🚀 **Welcome to *LinkedIn Growth AI***
+    Your assistant for creating LinkedIn posts, hooks, and strategies that turn views into clients.
+
+    ✍️ *What you can do right now:*
+    • /openers → viral openers for your posts
+    • /post → full post (headline, body, CTA)
+    • /comment → sharp comments to increase reach
+    • /contentplan → 7-day content calendar
+
+    💎 You have {free} free prompts per day.
+    Unlock unlimited usage → **/buy** (€7 / 30 days) or **/premium** (€9 / month).
+
+    👉 Try /presets to get instant inspiration.
+    """)
+
+PAYWALL = dedent("""
+    ⚠️ You’ve used your {free} free prompts for today.
+
+    🚀 Go *Premium* to unlock:
+    ✅ Unlimited prompts
+    ⚡ Faster responses
+    💡 Advanced personal-branding templates
+
+    👉 **/buy** (€7 / 30 days)  |  **/premium** (€9 / month)
+    """)
+
+PROFILE = Profile("linkedin", "LinkedIn", SYSTEM_PROMPT, COMMANDS, PRESETS, START, PAYWALL)
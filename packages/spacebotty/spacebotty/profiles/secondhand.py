@@ -0,0 +1,75 @@
+from textwrap import dedent
+from spacebotty.engine import Command, Profile
+
+SYSTEM_PROMPT = "You are an English copywriter for secondhand marketplaces (Vinted/Subito/eBay). Short, persuasive, clear."
+
+COMMANDS = {
+    "/title": Command(
+        "item", "Give me the item: /title Nike sneakers 42 barely used",
+        """
+        Create *5 click‑through optimized titles* for a secondhand listing.
+        Rules: 60–70 chars; include brand/model, condition, size/color if relevant.
+        Item: {item}
+        """, max_tokens=1000, tier="fast"),
+    "/desc": Command(
+        "details", "Provide details: /desc Zara jacket M, great condition, local pickup Parma",
+        """
+        Write a *sales description* with:
+        - Benefit & value (1–2 sentences)
+        - Honest condition & defects (bullets)
+        - Specs/Sizing (bullets)
+        - Shipping/Delivery suggestions
+        Details: {details}
+        """, max_tokens=1600),
+    "/optimize": Command(
+        "listing", "Paste your listing: /optimize <text>",
+        """
+        Rewrite this listing to *maximize search & conversion* on Vinted/Subito/eBay.
+        Improve title, first 2 paragraphs, and final bullets. Keep it truthful.
+        Original listing: {listing}
+        """, budget=1000, max_tokens=2000),
+    "/hashtags": Command(
+        "category", "Category? /hashtags men sneakers",
+        """
+        Generate *20 targeted hashtags* for secondhand marketplaces (mix mid-volume and long‑tail).
+        Category: {category}
+        """, max_tokens=1000, tier="fast"),
+}
+
+PRESETS = [
+    ("/title", "Nike sneakers 42 barely used"),
+    ("/desc", "Zara jacket M, great condition, pickup in Parma"),
+    ("/optimize", "[paste your current listing]"),
+    ("/hashtags", "women winter clothing"),
+]
+
+START = dedent("""
+    🛍️ **Welcome to *Secondhand Seller AI***
+    I help you write titles and descriptions that actually sell.
+
+    💬 Commands:
+    • /title → 5 click‑worthy titles
+    • /desc → persuasive description
+    • /optimize → rewrite your existing listing
+    • /hashtags → 20 targeted hashtags
+    • /bulk → send a CSV/JSONL inventory, get every listing back in one file
+
+    🪙 {free} free prompts per day.
+    Unlock everything → **/buy** (€7 / 30 days) or **/premium** (€9 / month).
+
+    📦 Try /presets to see a live example.
+    """)
+
+PAYWALL = dedent("""
+    🕒 You’ve used your {free} free prompts today.
+
+    💎 Upgrade to *Premium* to sell faster:
+    • SEO‑optimized titles
+    • Persuasive copywriting
+    • Auto‑generated hashtags
+
+    👉 **/buy** (€7 / 30 days)  |  **/premium** (€9 / month)
+    """)
+
+PROFILE = Profile("secondhand", "Secondhand", SYSTEM_PROMPT, COMMANDS, PRESETS, START, PAYWALL,
+                  bulk=("/title", "/desc", "/hashtags"))
@@ -0,0 +1,104 @@
+import time, logging
+from spacebotty import users
+from spacebotty.cache import MISSING, local
+from spacebotty.upstash import eval_script
+
+log = logging.getLogger("spacebotty.quota")
+
+# KEYS[1] user record (see spacebotty.users), KEYS[2]/KEYS[3] the old premium flag and day counter;
+# ARGV[1] daily limit, ARGV[2] today (YYYYMMDD), ARGV[3] now (unix seconds), ARGV[4] units to take
+# (a bulk run reserves all of its items at once), ARGV[5] the command, ARGV[6] record TTL,
+# ARGV[7] "1" to fold in the old keys, ARGV[8] expiry for an old premium flag without TTL.
+# Returns {allowed, used, charged, premium expiry}. Premium users always pass, whatever the count,
+# and are not counted; every call records the last command.
+RESERVE_LUA = """
+local now, today = tonumber(ARGV[3]), ARGV[2]
+local r = redis.call("HMGET", KEYS[1], "p", "d", "n")
+local expiry, day, used = tonumber(r[1] or "0"), r[2], tonumber(r[3] or "0")
+""" + users.FOLD_LUA + """
+if day ~= today then used = 0 end
+local premium = expiry > now
+local cost = premium and 0 or tonumber(ARGV[4])
+local allowed = premium or used + cost <= tonumber(ARGV[1])
+if allowed then used = used + cost else cost = 0 end
+redis.call("HSET", KEYS[1], "p", expiry, "d", today, "n", used, "c", ARGV[5], "t", ARGV[3])
+redis.call("EXPIREAT", KEYS[1], math.max(expiry, now + tonumber(ARGV[6])))
+return {allowed and 1 or 0, used, cost, expiry}
+"""
+
+# KEYS[1] user record; ARGV[1] units to give back, ARGV[2] the day they were taken: after midnight
+# there is nothing to give back. Never lets a refund push the count below zero.
+REFUND_LUA = """
+local r = redis.call("HMGET", KEYS[1], "d", "n")
+local v = tonumber(r[2] or "0")
+if r[1] ~= ARGV[2] then return v end
+local n = math.min(v, tonumber(ARGV[1] or "1"))
+if n > 0 then return redis.call("HINCRBY", KEYS[1], "n", -n) end
+return v
+"""
+
+class Reservation:
+    """Daily quota taken up front (`charged` units, 0 for premium); refunded if the work it pays for fails.
+
+    Use as a context manager around the LLM call and reply: leaving the block
+    normally commits the units, an exception refunds them and propagates.
+    """
+    def __init__(self, user_key, day, allowed, used, charged, premium=False):
+        self.user_key = user_key
+        self.day = day
+        self.allowed = allowed
+        self.used = used
+        self.charged = charged
+        self.premium = premium
+
+    def __bool__(self): return self.allowed
+
+    def commit(self): self.charged = 0
+
+    def refund(self):
+        if self.charged:
+            eval_script(REFUND_LUA, [self.user_key], [self.charged, self.day])
+            local.invalidate(self.user_key)
+        self.charged = 0
+
+    def release(self, units):
+        """Give back part of a multi-unit reservation (items of a bulk run that failed)."""
+        units = min(units, self.charged)
+        if units <= 0: return
+        eval_script(REFUND_LUA, [self.user_key], [units, self.day])
+        local.invalidate(self.user_key)
+        self.charged -= units
+
+    def __enter__(self): return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None: self.commit()
+        else: self.refund()
+        return False
+
+def reserve(bot, uid, limit, cost=1, command=""):
+    """Check premium, roll the day bucket and take `cost` units in a single atomic EVAL on the user's record for `bot`.
+
+    Redelivered updates never get here (`Bot.handle_update` claims every update id first).
+    Cached premium users and already-exhausted free users in the local cache are answered
+    without the EVAL.
+    """
+    user_key, today = users.key(bot, uid), users.today()
+    record = local.get(user_key)
+    if record is not MISSING:
+        if record.premium(): return Reservation(user_key, today, True, 0, 0, premium=True)
+        elif record.uses_today() + cost > int(limit):
+            return Reservation(user_key, today, False, record.uses_today(), 0)
+    now = int(time.time())
+    keys = [user_key, users.legacy_premium_key(uid), users.legacy_day_key(uid)]
+    try:
+        result = eval_script(RESERVE_LUA, keys, [limit, today, now, cost, command, users.RECORD_TTL,
+                                                 int(users.USER_LEGACY_KEYS), users.NO_EXPIRY])
+    except Exception:
+        log.warning("quota check failed for %s", user_key, exc_info=True); result = None
+    if not result:
+        # Redis unreachable or erroring: fail open (uncharged) like the old GET-based check did.
+        return Reservation(user_key, today, True, 0, 0)
+    allowed, used, charged, expiry = (int(x) for x in result)
+    local.set(user_key, users.Record(expiry, today, used, command, now))
+    return Reservation(user_key, today, bool(allowed), used, charged, premium=expiry > now)
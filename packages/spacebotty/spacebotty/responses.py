@@ -0,0 +1,105 @@
+import os, re, json, zlib, base64, hashlib, threading
+from spacebotty.cache import MISSING, TTLCache
+from spacebotty.llm import OPENAI_MODEL
+from spacebotty.upstash import pipeline
+
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "true").lower() == "true"
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 60 * 60)))
+# Keep this many different answers per prompt, and regenerate one every REFRESH-th serve,
+# so repeated presets still get varied, fresh-looking output.
+RESPONSE_CACHE_VARIANTS = int(os.getenv("RESPONSE_CACHE_VARIANTS", "3"))
+RESPONSE_CACHE_REFRESH = int(os.getenv("RESPONSE_CACHE_REFRESH", "10"))
+# Optional in-process tier in front of Redis (0 disables it).
+RESPONSE_CACHE_LOCAL = int(os.getenv("RESPONSE_CACHE_LOCAL", "256"))
+
+local_tier = TTLCache(maxsize=RESPONSE_CACHE_LOCAL, ttl=float(os.getenv("RESPONSE_CACHE_LOCAL_TTL", "300")))
+_stats = {}
+_lock = threading.Lock()
+
+def normalize(topic):
+    return re.sub(r"\s+", " ", (topic or "").strip().lower()).rstrip(".!?")
+
+def cache_key(model, system, prompt, topic):
+    # The prompt with the raw topic cut out stands in for the command's template, so a template
+    # edit invalidates its entries while "/hooks Home  Workout" and "/hooks home workout" share one.
+    template = prompt.replace(topic, "\x00") if topic else prompt
+    raw = "\x1f".join([model, system, template, normalize(topic)])
+    return "llm:" + hashlib.sha256(raw.encode()).hexdigest()
+
+def _encode(text, tokens):
+    return base64.b64encode(zlib.compress(json.dumps({"t": text, "u": tokens}).encode())).decode()
+
+def _decode(raw):
+    try: return json.loads(zlib.decompress(base64.b64decode(raw)))
+    except (ValueError, zlib.error): return None
+
+class Lookup:
+    """Result of `lookup`: `text` is a cached answer, or None when the caller must generate one."""
+    def __init__(self, bot, key, text=None, tokens=0):
+        self.bot = bot
+        self.key = key
+        self.text = text
+        self.tokens = tokens
+
+def _slot(key):
+    slot = local_tier.get(key)
+    if slot is not MISSING:
+        with _lock: slot["serves"] += 1
+        return slot
+    raws, serves, pinned = pipeline([["LRANGE", key, 0, -1], ["INCR", f"{key}:serves"], ["EXISTS", f"{key}:pinned"]])
+    slot = {"variants": [v for v in map(_decode, raws or []) if v], "serves": int(serves or 1),
+            "pinned": bool(pinned)}
+    local_tier.set(key, slot)
+    return slot
+
+def lookup(bot, system, prompt, topic="", model=None):
+    if not RESPONSE_CACHE: return Lookup(bot, None)
+    key = cache_key(model or OPENAI_MODEL, system, prompt, topic)
+    slot = _slot(key)
+    variants, serves = slot["variants"], slot["serves"]
+    # Prewarmed (pinned) pools are rotated by the scheduled refresh, never by a user request.
+    stale = len(variants) < RESPONSE_CACHE_VARIANTS or serves % RESPONSE_CACHE_REFRESH == 0
+    if not variants or (stale and not slot.get("pinned")):
+        return Lookup(bot, key)
+    hit = variants[serves % len(variants)]
+    return Lookup(bot, key, hit["t"], hit.get("u", 0))
+
+def _push_cmds(key, text, tokens, ttl):
+    return [["LPUSH", key, _encode(text, tokens)], ["LTRIM", key, 0, RESPONSE_CACHE_VARIANTS - 1],
+            ["EXPIRE", key, ttl], ["EXPIRE", f"{key}:serves", ttl]]
+
+def store(entry, text, tokens):
+    """Add a freshly generated answer to the entry's variant pool."""
+    if entry.key is None or not text: return
+    pipeline(_push_cmds(entry.key, text, tokens, RESPONSE_CACHE_TTL)
+             + [["HINCRBY", f"stats:responses:{entry.bot}", "misses", 1]])
+    slot = local_tier.get(entry.key)
+    if slot is not MISSING:
+        with _lock: slot["variants"] = ([{"t": text, "u": tokens}] + slot["variants"])[:RESPONSE_CACHE_VARIANTS]
+    _count(entry.bot, "misses")
+
+def pin(key, answers, ttl=RESPONSE_CACHE_TTL):
+    """Push prewarmed (text, tokens) answers, dropping the oldest, and pin the pool."""
+    cmds = [c for text, tokens in answers if text for c in _push_cmds(key, text, tokens, ttl)]
+    if cmds: pipeline(cmds + [["SETEX", f"{key}:pinned", ttl, 1]])
+    local_tier.invalidate(key)
+
+def record_hit(entry):
+    pipeline([["HINCRBY", f"stats:responses:{entry.bot}", "hits", 1],
+              ["HINCRBY", f"stats:responses:{entry.bot}", "saved_tokens", entry.tokens]])
+    _count(entry.bot, "hits", entry.tokens)
+
+def _count(bot, field, tokens=0):
+    with _lock:
+        s = _stats.setdefault(bot, {"hits": 0, "misses": 0, "saved_tokens": 0})
+        s[field] += 1; s["saved_tokens"] += tokens
+
+def stats(bot=None):
+    """Hit ratio and saved tokens: this instance's counters, or the shared per-bot totals from Redis."""
+    if bot is None:
+        with _lock: return {b: dict(s) for b, s in _stats.items()}
+    fields = pipeline([["HGETALL", f"stats:responses:{bot}"]])[0] or []
+    totals = {k: int(v) for k, v in zip(fields[::2], fields[1::2])}
+    served = totals.get("hits", 0) + totals.get("misses", 0)
+    totals["hit_ratio"] = totals.get("hits", 0) / served if served else 0.0
+    return totals
@@ -0,0 +1,184 @@
+import os, bisect, time, datetime, logging, threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from spacebotty import llm, trace
+from spacebotty.upstash import command, pipeline
+
+log = logging.getLogger("spacebotty.routing")
+
+# Model tiers: commands pick one (Command(tier=...)); premium users move one tier up.
+MODELS = {
+    "fast": os.getenv("OPENAI_MODEL_FAST", "gpt-5-nano"),
+    "standard": llm.OPENAI_MODEL,
+    "large": os.getenv("OPENAI_MODEL_LARGE", "gpt-5"),
+}
+TIERS = ["fast", "standard", "large"]
+# Where a slow request is hedged to: a different, faster-or-equal model.
+FALLBACK = {"fast": "standard", "standard": "fast", "large": "standard"}
+PREMIUM_UPGRADE = os.getenv("PREMIUM_MODEL_UPGRADE", "true").lower() == "true"
+
+HEDGE = os.getenv("HEDGE_REQUESTS", "true").lower() == "true"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+# Deadline before enough samples exist, and the bounds for the p95-derived one (seconds).
+HEDGE_DEFAULT = float(os.getenv("HEDGE_DEFAULT", "6"))
+HEDGE_MIN = float(os.getenv("HEDGE_MIN", "1"))
+HEDGE_MAX = float(os.getenv("HEDGE_MAX", "8"))
+# Observations buffered per histogram before they are added to the shared Redis copy.
+LATENCY_FLUSH = int(os.getenv("LATENCY_FLUSH", "20"))
+
+# Bucket upper bounds in seconds, roughly 25% apart from 50 ms to 2 min.
+BUCKETS = [round(0.05 * 1.25 ** i, 3) for i in range(36)]
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("HEDGE_POOL", "16")), thread_name_prefix="hedge")
+_lock = threading.Lock()
+
+class Histogram:
+    """Latency counts in fixed buckets, shared through a per-day Redis hash.
+
+    `kind` separates time to first token ("ttft", streams) from full completions ("total").
+    """
+    def __init__(self, model, kind):
+        self.key = f"latency:{model}:{kind}"
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.pending = [0] * (len(BUCKETS) + 1)
+        self.loaded = None
+
+    def _day_key(self): return f"{self.key}:{datetime.date.today().isoformat()}"
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with _lock:
+            self.counts[i] += 1; self.pending[i] += 1
+            flush = sum(self.pending) >= LATENCY_FLUSH
+        if flush: self.flush()
+
+    def flush(self):
+        with _lock:
+            deltas, self.pending = self.pending, [0] * len(self.pending)
+        cmds = [["HINCRBY", self._day_key(), i, n] for i, n in enumerate(deltas) if n]
+        # Metrics never fail a request: if Upstash is unreachable these samples stay local.
+        try:
+            if cmds: pipeline(cmds + [["EXPIRE", self._day_key(), 3 * 24 * 60 * 60]])
+        except Exception: log.warning("latency flush for %s failed", self.key)
+
+    def load(self):
+        # Once per day and instance: start from the samples every instance has recorded so far.
+        day = datetime.date.today()
+        if self.loaded == day: return
+        self.loaded = day
+        try: fields = command("HGETALL", self._day_key()) or []
+        except Exception: fields = []
+        shared = {int(k): int(v) for k, v in zip(fields[::2], fields[1::2])}
+        with _lock: self.counts = [shared.get(i, 0) + n for i, n in enumerate(self.pending)]
+
+    def count(self): return sum(self.counts)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, or None without samples."""
+        total = self.count()
+        if not total: return None
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= q * total: return BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1] * 1.25
+        return None
+
+_histograms = {}
+
+def histogram(model, kind):
+    h = _histograms.get((model, kind))
+    if h is None:
+        with _lock: h = _histograms.setdefault((model, kind), Histogram(model, kind))
+    return h
+
+def deadline(model, kind):
+    """Seconds to wait for `model` before hedging: its p95 latency, clamped to [HEDGE_MIN, HEDGE_MAX]."""
+    h = histogram(model, kind)
+    h.load()
+    if h.count() < HEDGE_MIN_SAMPLES: return HEDGE_DEFAULT
+    return min(max(h.quantile(HEDGE_QUANTILE), HEDGE_MIN), HEDGE_MAX)
+
+def pick(tier, premium=False):
+    """(primary, fallback) models for a command tier and the user's plan."""
+    tier = tier if tier in MODELS else "standard"
+    if premium and PREMIUM_UPGRADE: tier = TIERS[min(TIERS.index(tier) + 1, len(TIERS) - 1)]
+    primary, fallback = MODELS[tier], MODELS[FALLBACK[tier]]
+    return primary, (fallback if fallback != primary else None)
+
+def _timed(model, kind, fn, running=None):
+    if running: running.set()
+    started = time.monotonic()
+    result = fn()
+    histogram(model, kind).observe(time.monotonic() - started)
+    return result
+
+def hedged(primary, fallback, kind, start, discard=None):
+    """`start(model)` on the primary; if it is still running at the deadline, also on the fallback.
+
+    Returns (model, result) of whichever finishes first without an error; the other
+    request is left to finish on the pool and its result passed to `discard`.
+    Errors surface only when both fail. The deadline runs from when the primary leaves
+    the pool's queue, so time spent waiting for a worker does not trigger a hedge.
+    """
+    running = threading.Event()
+    first = trace.run_in_context(_pool, _timed, primary, kind, lambda: start(primary), running)
+    if not HEDGE or not fallback:
+        return primary, first.result()
+    running.wait()
+    done, _ = wait([first], timeout=deadline(primary, kind))
+    if done and not first.exception(): return primary, first.result()
+    models = {first: primary}
+    second = trace.run_in_context(_pool, _timed, fallback, kind, lambda: start(fallback)); models[second] = fallback
+    log.info("hedging %s -> %s", primary, fallback)
+    pending = set(models)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            if f.exception(): continue
+            for loser in pending:
+                if discard: loser.add_done_callback(lambda l: l.exception() or discard(l.result()))
+            return models[f], f.result()
+    return primary, first.result()  # both failed: raise the primary's error
+
+def complete(system, prompt, tier="standard", premium=False, max_tokens=None):
+    """A `llm.Completion` from the routed model (hedged); `.model` names the model that answered."""
+    primary, fallback = pick(tier, premium)
+    model, text = hedged(primary, fallback, "total",
+                         lambda m: llm.complete(system, prompt, model=m, max_tokens=max_tokens))
+    text.model = model
+    return text
+
+class Stream:
+    """`llm.Stream` whose first token is hedged: the model that starts answering first is kept."""
+    def __init__(self, system, prompt, tier="standard", premium=False, max_tokens=None):
+        self.args = (system, prompt, max_tokens)
+        self.models = pick(tier, premium)
+        self.model = self.models[0]
+        self.stream = None
+
+    def _open(self, model):
+        system, prompt, max_tokens = self.args
+        stream = llm.stream(system, prompt, model=model, max_tokens=max_tokens)
+        chunks = iter(stream)
+        return stream, chunks, next(chunks, None)
+
+    @property
+    def usage(self): return self.stream.usage if self.stream else None
+
+    @property
+    def cut(self): return self.stream.cut if self.stream else False
+
+    def __iter__(self):
+        self.model, (self.stream, chunks, first) = hedged(*self.models, "ttft", self._open,
+                                                          discard=lambda loser: loser[1].close())
+        if first is None: return
+        yield first
+        yield from chunks
+
+def stream(system, prompt, tier="standard", premium=False, max_tokens=None):
+    return Stream(system, prompt, tier, premium, max_tokens)
+
+def stats():
+    """Latency quantiles (seconds) per model and kind, from this instance's view of the histograms."""
+    return {f"{model}:{kind}": {"count": h.count(), "p50": h.quantile(0.5), "p95": h.quantile(0.95),
+                                "p99": h.quantile(0.99)} for (model, kind), h in list(_histograms.items())}
@@ -0,0 +1,463 @@
+"""Local stand-ins for Telegram, Upstash REST and the chat completions API.
+
+    python -m spacebotty.standin [--port 8780] [--llm "ttft=0.4,per_token=0.01"] [--telegram "..."] [--redis "..."]
+
+Starts three keep-alive HTTP servers (Telegram on --port + 1, Upstash on + 2, completions on
++ 3) and prints the environment that points the bots at them. Behaviours use the
+`fake.Behaviour` syntax, so latency and error rates can be dialled in per service.
+Everything is in memory; `GET /_stats` on any of them returns request counts.
+"""
+import sys, json, time, fnmatch, hashlib, argparse, threading, itertools, collections
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from spacebotty import fake
+
+class RedisError(Exception):
+    pass
+
+class MiniRedis:
+    """The subset of Redis the bots use, with expiry; Lua scripts are replaced by native twins."""
+    def __init__(self):
+        self.data, self.expires = {}, {}
+        self.lock = threading.RLock()
+        self.scripts = {}
+
+    def register(self, script, fn):
+        self.scripts[hashlib.sha1(script.encode()).hexdigest()] = fn
+
+    def execute(self, args):
+        name, *rest = [str(a) for a in args]
+        fn = getattr(self, "cmd_" + name.lower().replace(" ", "_"), None)
+        if fn is None: raise RedisError(f"ERR unknown command '{name}'")
+        with self.lock: return fn(*rest)
+
+    def _live(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None); self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _int(self, key):
+        value = self._live(key)
+        try: return int(value or 0)
+        except ValueError: raise RedisError("ERR value is not an integer or out of range")
+
+    # strings
+    def cmd_ping(self, *args): return "PONG"
+    def cmd_get(self, key): return self._live(key)
+    def cmd_set(self, key, value, *opts):
+        opts = [o.upper() for o in opts]
+        if "NX" in opts and self._live(key) is not None: return None
+        self.data[key] = value; self.expires.pop(key, None)
+        if "EX" in opts: self.expires[key] = time.monotonic() + int(opts[opts.index("EX") + 1])
+        return "OK"
+    def cmd_setex(self, key, seconds, value): return self.cmd_set(key, value, "EX", seconds)
+    def cmd_incrby(self, key, n):
+        value = self._int(key) + int(n); self.data[key] = str(value); return value
+    def cmd_incr(self, key): return self.cmd_incrby(key, 1)
+    def cmd_decr(self, key): return self.cmd_incrby(key, -1)
+    def cmd_decrby(self, key, n): return self.cmd_incrby(key, -int(n))
+    # keys
+    def cmd_del(self, *keys):
+        n = 0
+        for k in keys:
+            if self._live(k) is not None: self.data.pop(k); self.expires.pop(k, None); n += 1
+        return n
+    def cmd_exists(self, *keys): return sum(1 for k in keys if self._live(k) is not None)
+    def cmd_expire(self, key, seconds):
+        if self._live(key) is None: return 0
+        self.expires[key] = time.monotonic() + int(seconds); return 1
+    def cmd_expireat(self, key, timestamp):
+        return self.cmd_expire(key, int(timestamp) - time.time())
+    def cmd_scan(self, cursor, *opts):
+        # One pass: every live key matching MATCH, cursor "0".
+        pattern = opts[opts.index("MATCH") + 1] if "MATCH" in opts else "*"
+        return ["0", [k for k in list(self.data) if self._live(k) is not None and fnmatch.fnmatchcase(k, pattern)]]
+    def cmd_ttl(self, key):
+        if self._live(key) is None: return -2
+        deadline = self.expires.get(key)
+        return -1 if deadline is None else max(int(deadline - time.monotonic() + 0.999), 0)
+    # lists (index 0 is the left end)
+    def _list(self, key):
+        value = self._live(key)
+        if value is None: value = self.data[key] = []
+        return value
+    def cmd_lpush(self, key, *values):
+        items = self._list(key)
+        for v in values: items.insert(0, v)
+        return len(items)
+    def cmd_rpush(self, key, *values):
+        items = self._list(key); items.extend(values); return len(items)
+    def cmd_llen(self, key): return len(self._live(key) or [])
+    def cmd_lrange(self, key, start, stop):
+        items, stop = self._live(key) or [], int(stop)
+        return items[int(start):(stop + 1) if stop != -1 else None]
+    def cmd_ltrim(self, key, start, stop):
+        items = self._live(key)
+        if items is not None:
+            stop = int(stop); items[:] = items[int(start):(stop + 1) if stop != -1 else None]
+            if not items: self.cmd_del(key)
+        return "OK"
+    def cmd_lmove(self, src, dst, wherefrom, whereto):
+        items = self._live(src)
+        if not items: return None
+        value = items.pop(0 if wherefrom.upper() == "LEFT" else -1)
+        if not items: self.cmd_del(src)
+        target = self._list(dst)
+        if whereto.upper() == "LEFT": target.insert(0, value)
+        else: target.append(value)
+        return value
+    def cmd_lrem(self, key, count, value):
+        items, count, removed = self._live(key) or [], int(count), 0
+        order = range(len(items) - 1, -1, -1) if count < 0 else range(len(items))
+        for i in [i for i in order if items[i] == value][:abs(count) or None]:
+            items[i] = None; removed += 1
+        items[:] = [v for v in items if v is not None]
+        if self._live(key) == []: self.cmd_del(key)
+        return removed
+    # hashes
+    def _hash(self, key):
+        value = self._live(key)
+        if value is None: value = self.data[key] = {}
+        return value
+    def cmd_hset(self, key, *pairs):
+        h, added = self._hash(key), 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in h; h[field] = value
+        return added
+    def cmd_hget(self, key, field): return (self._live(key) or {}).get(field)
+    def cmd_hmget(self, key, *fields): return [(self._live(key) or {}).get(f) for f in fields]
+    def cmd_hgetall(self, key): return [x for kv in (self._live(key) or {}).items() for x in kv]
+    def cmd_hdel(self, key, *fields):
+        h = self._live(key) or {}
+        return sum(1 for f in fields if h.pop(f, None) is not None)
+    def cmd_hincrby(self, key, field, n):
+        h = self._hash(key); value = int(h.get(field) or 0) + int(n); h[field] = str(value); return value
+    # streams: a list of (id, fields), ids "<ms>-<seq>"
+    def cmd_xadd(self, key, *args):
+        args = list(args)
+        cap = next((int(a) for a in args[args.index("MAXLEN") + 1:][:2] if a.isdigit()), None) if "MAXLEN" in args else None
+        fields = args[args.index("*") + 1:]
+        entries, ms = self._list(key), int(time.time() * 1000)
+        last = _stream_id(entries[-1][0]) if entries else (0, 0)
+        sid = (ms, 0) if ms > last[0] else (last[0], last[1] + 1)
+        entries.append((f"{sid[0]}-{sid[1]}", fields))
+        if cap is not None: del entries[:max(len(entries) - cap, 0)]
+        return entries[-1][0]
+    def cmd_xrange(self, key, start, end, *opts):
+        low = (0, -1) if start == "-" else _stream_id(start.lstrip("("))
+        high = (float("inf"), 0) if end == "+" else _stream_id(end)
+        exclusive = start.startswith("(")
+        found = [[sid, list(fields)] for sid, fields in self._live(key) or []
+                 if (low < _stream_id(sid) if exclusive else low <= _stream_id(sid)) and _stream_id(sid) <= high]
+        return found[:int(opts[opts.index("COUNT") + 1])] if "COUNT" in opts else found
+    def cmd_xtrim(self, key, strategy, threshold):
+        entries = self._live(key) or []
+        keep = [e for e in entries if _stream_id(e[0]) >= _stream_id(threshold)] if strategy.upper() == "MINID" \
+            else entries[max(len(entries) - int(threshold), 0):]
+        removed = len(entries) - len(keep); entries[:] = keep
+        return removed
+    # sorted sets: {member: score}
+    def cmd_zadd(self, key, *pairs):
+        z = self._live(key)
+        if z is None: z = self.data[key] = {}
+        added = sum(1 for member in pairs[1::2] if member not in z)
+        z.update((member, float(score)) for score, member in zip(pairs[::2], pairs[1::2]))
+        return added
+    def cmd_zrem(self, key, *members):
+        z = self._live(key) or {}
+        removed = sum(1 for m in members if z.pop(m, None) is not None)
+        if self._live(key) == {}: self.cmd_del(key)
+        return removed
+    def cmd_zcard(self, key): return len(self._live(key) or {})
+    def cmd_zrangebyscore(self, key, low, high):
+        lo, hi = float(low.lstrip("(")), float(high.lstrip("("))  # float() reads -inf/+inf; "(" is inclusive here
+        return [m for m, score in sorted((self._live(key) or {}).items(), key=lambda kv: kv[1]) if lo <= score <= hi]
+    def cmd_zremrangebyscore(self, key, low, high):
+        z = self._live(key) or {}
+        lo, hi = float(low.lstrip("(")), float(high.lstrip("("))
+        gone = [m for m, score in z.items() if lo <= score <= hi]
+        for m in gone: del z[m]
+        if self._live(key) == {}: self.cmd_del(key)
+        return len(gone)
+    # HyperLogLog, kept exact as sets
+    def cmd_pfadd(self, key, *items):
+        s = self._live(key)
+        if s is None: s = self.data[key] = set()
+        before = len(s); s.update(items)
+        return int(len(s) > before)
+    def cmd_pfcount(self, *keys):
+        return len(set().union(*(self._live(k) or set() for k in keys)))
+    # scripts
+    def cmd_evalsha(self, sha, numkeys, *rest):
+        if not self.scripts: _natives(self)
+        fn = self.scripts.get(sha)
+        if fn is None: raise RedisError("NOSCRIPT No matching script. Please use EVAL.")
+        n = int(numkeys)
+        return fn(self, list(rest[:n]), list(rest[n:]))
+    def cmd_eval(self, script, numkeys, *rest):
+        return self.cmd_evalsha(hashlib.sha1(script.encode()).hexdigest(), numkeys, *rest)
+
+def _stream_id(sid):
+    ms, _, seq = sid.partition("-")
+    return int(ms), int(seq or 0)
+
+def _fold(r, keys, args, record, now):
+    # Native twin of users.FOLD_LUA; returns (expiry, day, used) taken from the old keys.
+    expiry, day, used = int(record[0] or 0), record[1], int(record[2] or 0)
+    if args[6] == "1" and record[0] is None and record[1] is None:
+        if r.cmd_get(keys[1]) == "1":
+            ttl = r.cmd_ttl(keys[1]); expiry = now + ttl if ttl > 0 else int(args[7])
+        old = r.cmd_get(keys[2])
+        if old is not None and expiry <= now: day, used = args[1], int(old)
+    return expiry, day, used
+
+def _reserve(r, keys, args):
+    # Native twin of quota.RESERVE_LUA.
+    now, today = int(args[2]), args[1]
+    expiry, day, used = _fold(r, keys, args, r.cmd_hmget(keys[0], "p", "d", "n"), now)
+    if day != today: used = 0
+    premium = expiry > now
+    cost = 0 if premium else int(args[3])
+    allowed = premium or used + cost <= int(args[0])
+    if allowed: used += cost
+    else: cost = 0
+    r.cmd_hset(keys[0], "p", str(expiry), "d", today, "n", str(used), "c", args[4], "t", args[2])
+    r.cmd_expireat(keys[0], max(expiry, now + int(args[5])))
+    return [int(allowed), used, cost, expiry]
+
+def _refund(r, keys, args):
+    # Native twin of quota.REFUND_LUA.
+    day, v = r.cmd_hmget(keys[0], "d", "n"); v = int(v or 0)
+    if day != args[1]: return v
+    n = min(v, int(args[0]) if args else 1)
+    return r.cmd_hincrby(keys[0], "n", -n) if n > 0 else v
+
+def _migrate(r, keys, args):
+    # Native twin of users.MIGRATE_LUA.
+    now, record = int(args[2]), r.cmd_hmget(keys[0], "p", "d", "n")
+    if record[0] is not None or record[1] is not None: return 0
+    expiry, day, used = _fold(r, keys, args, record, now)
+    if expiry == 0 and day is None: return 0
+    r.cmd_hset(keys[0], "p", str(expiry), "d", day or args[1], "n", str(used))
+    r.cmd_expireat(keys[0], max(expiry, now + int(args[5])))
+    return 1
+
+def _enter(r, keys, args):
+    # Native twin of inflight.ENTER_LUA.
+    if r.cmd_exists(keys[0]): return [0, 0]
+    r.cmd_zremrangebyscore(keys[1], "-inf", args[2])
+    n = r.cmd_zcard(keys[1])
+    if int(args[0]) > 0 and n >= int(args[0]): return [-1, n]
+    r.cmd_zadd(keys[1], int(args[2]) + int(args[1]), keys[0]); r.cmd_expire(keys[1], args[1])
+    r.cmd_set(keys[0], "1", "EX", args[1])
+    return [1, n + 1]
+
+def _leave(r, keys, args):
+    # Native twin of inflight.LEAVE_LUA.
+    r.cmd_del(keys[0]); r.cmd_zrem(keys[1], keys[0])
+    return r.cmd_zcard(keys[1])
+
+def _claim(r, keys, args):
+    # Native twin of jobs.CLAIM_LUA.
+    raws = []
+    for _ in range(int(args[0])):
+        raw = r.cmd_lmove(keys[0], keys[1], "RIGHT", "LEFT")
+        if raw is None: break
+        r.cmd_zadd(keys[2], args[1], raw); raws.append(raw)
+    return raws
+
+def _reclaim(r, keys, args):
+    # Native twin of jobs.RECLAIM_LUA.
+    stale, moved = set(r.cmd_zrangebyscore(keys[2], "-inf", args[0])), 0
+    r.cmd_zrem(keys[2], *stale)
+    for raw in r.cmd_lrange(keys[1], 0, -1):
+        if raw in stale:
+            stale.discard(raw); r.cmd_lrem(keys[1], 1, raw); r.cmd_rpush(keys[0], raw); moved += 1
+    return moved
+
+def _natives(r):
+    # Imported on first use: quota reads the Upstash settings at import, which a caller may set after start().
+    from spacebotty import inflight, jobs, quota, users
+    r.register(quota.RESERVE_LUA, _reserve); r.register(quota.REFUND_LUA, _refund)
+    r.register(users.MIGRATE_LUA, _migrate)
+    r.register(inflight.ENTER_LUA, _enter); r.register(inflight.LEAVE_LUA, _leave)
+    r.register(jobs.CLAIM_LUA, _claim); r.register(jobs.RECLAIM_LUA, _reclaim)
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections is routine here, not worth a traceback.
+        if not isinstance(sys.exc_info()[1], ConnectionError): super().handle_error(request, client_address)
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real upstreams
+    disable_nagle_algorithm = True  # headers and body are separate writes; avoid the delayed-ACK stall
+
+    def log_message(self, *args): pass
+
+    def body(self):
+        return self.rfile.read(int(self.headers.get("content-length") or 0))
+
+    def send(self, status, payload, content_type="application/json", headers=()):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type); self.send_header("Content-Length", str(len(data)))
+        for k, v in headers: self.send_header(k, v)
+        self.end_headers(); self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/_stats": return self.send(200, dict(self.server.standin.counts[self.server.service]))
+        self.get()
+
+    def do_POST(self):
+        self.server.standin.count(self.server.service, self.path)
+        behaviour = self.server.behaviour
+        behaviour.sleep(behaviour.ttft)
+        if behaviour.fails(): return self.fail(behaviour.error_status)
+        self.post()
+
+    def get(self): self.send(404, {"error": "not found"})
+
+class TelegramHandler(Handler):
+    def fail(self, status):
+        self.body()
+        self.send(status, {"ok": False, "error_code": status, "description": "Too Many Requests: retry after 1",
+                           "parameters": {"retry_after": 1}}, headers=[("Retry-After", "1")] if status == 429 else [])
+
+    def get(self):
+        # /file/bot<token>/documents/<file_id>
+        data = self.server.standin.files.get(self.path.rsplit("/", 1)[-1])
+        if data is None: return self.send(404, b"", "application/octet-stream")
+        self.send(200, data, "application/octet-stream")
+
+    def post(self):
+        # /bot<token>/<method>
+        _, bot, method = self.path.split("/", 2)
+        raw = self.body()
+        try: payload = json.loads(raw) if raw[:1] == b"{" else {}
+        except ValueError: payload = {}
+        self.send(200, {"ok": True, "result": self.server.standin.telegram(method, payload, bot[3:])})
+
+class UpstashHandler(Handler):
+    def fail(self, status):
+        self.body(); self.send(status, {"error": f"ERR stand-in failure {status}"})
+
+    def post(self):
+        r, args = self.server.standin.redis, json.loads(self.body() or b"[]")
+        if self.path.rstrip("/") in ("/pipeline", "/multi-exec"):
+            with r.lock: return self.send(200, [self.run(r, cmd) for cmd in args])
+        reply = self.run(r, args)
+        self.send(200 if "result" in reply else 400, reply)
+
+    def run(self, r, cmd):
+        try: return {"result": r.execute(cmd)}
+        except RedisError as e: return {"error": str(e)}
+        except (TypeError, ValueError, IndexError) as e: return {"error": f"ERR {e}"}
+
+class CompletionsHandler(Handler):
+    def fail(self, status):
+        self.body(); self.send(status, {"error": {"message": "stand-in failure", "type": "server_error"}})
+
+    def post(self):
+        body, behaviour = json.loads(self.body() or b"{}"), self.server.llm
+        if not body.get("stream"): return self.send(200, fake.completion(body, behaviour))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream"); self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in fake.chunks(body, behaviour): self.chunk(f"data: {json.dumps(event)}\n\n".encode())
+        self.chunk(b"data: [DONE]\n\n"); self.chunk(b"")
+
+    def chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n"); self.wfile.flush()
+
+class StandIn:
+    """The three servers plus their in-memory state: `redis`, sent Telegram `messages`, uploadable `files`."""
+    SERVICES = (("telegram", TelegramHandler), ("upstash", UpstashHandler), ("completions", CompletionsHandler))
+
+    def __init__(self, port=8780, llm=None, telegram=None, redis_behaviour=None, host="127.0.0.1"):
+        self.host, self.port = host, port
+        self.llm = llm or fake.Behaviour()
+        self.behaviours = {"telegram": telegram or fake.Behaviour(), "upstash": redis_behaviour or fake.Behaviour(),
+                           "completions": fake.Behaviour(error_rate=self.llm.error_rate,
+                                                         error_status=self.llm.error_status)}
+        self.redis = MiniRedis()
+        self.files = {}
+        self.messages = collections.deque(maxlen=10000)
+        self.updates = collections.defaultdict(list)  # token -> updates waiting for getUpdates
+        self._update_ids = itertools.count(1)
+        self._arrived = threading.Condition()
+        self.counts = {name: collections.Counter() for name, _ in self.SERVICES}
+        self.servers = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def count(self, service, path):
+        key = path.rsplit("/", 1)[-1] if service == "telegram" else (path.strip("/") or "command")
+        with self._lock: self.counts[service][key] += 1
+
+    def push_update(self, token, update):
+        """Queue `update` for the bot's getUpdates; returns the update_id it was given."""
+        with self._arrived:
+            update = dict(update, update_id=next(self._update_ids))
+            self.updates[token].append(update); self._arrived.notify_all()
+        return update["update_id"]
+
+    def get_updates(self, token, payload):
+        # Long poll: wait up to `timeout` seconds; `offset` confirms (drops) everything before it.
+        offset, limit = int(payload.get("offset") or 0), int(payload.get("limit") or 100)
+        deadline = time.monotonic() + float(payload.get("timeout") or 0)
+        with self._arrived:
+            while True:
+                pending = self.updates[token] = [u for u in self.updates[token] if u["update_id"] >= offset]
+                left = deadline - time.monotonic()
+                if pending or left <= 0: return pending[:limit]
+                self._arrived.wait(left)
+
+    def telegram(self, method, payload, token=""):
+        if method == "getUpdates": return self.get_updates(token, payload)
+        if method in ("sendChatAction", "answerPreCheckoutQuery", "setWebhook", "deleteWebhook"): return True
+        if method == "getFile": return {"file_id": payload.get("file_id"), "file_path": f"documents/{payload.get('file_id')}"}
+        if method == "getMe": return {"id": 1, "is_bot": True, "username": "standin_bot"}
+        self.messages.append((method, payload))
+        return {"message_id": next(self._ids), "date": int(time.time()), "chat": {"id": payload.get("chat_id")},
+                "text": payload.get("text")}
+
+    def start(self):
+        for offset, (name, handler) in enumerate(self.SERVICES, 1):
+            server = Server((self.host, self.port + offset), handler)
+            server.standin, server.service, server.behaviour = self, name, self.behaviours[name]
+            server.llm = fake.Behaviour(self.llm.ttft, self.llm.per_token, self.llm.tokens, self.llm.jitter)
+            self.servers[name] = server
+            threading.Thread(target=server.serve_forever, daemon=True, name=f"standin-{name}").start()
+        return self
+
+    def stop(self):
+        for server in self.servers.values(): server.shutdown(); server.server_close()
+
+    def env(self):
+        """Environment variables that point spacebotty at these servers."""
+        base = lambda offset: f"http://{self.host}:{self.port + offset}"
+        return {"TELEGRAM_API_URL": base(1), "UPSTASH_REDIS_REST_URL": base(2), "UPSTASH_REDIS_REST_TOKEN": "standin",
+                "OPENAI_BASE_URL": base(3) + "/v1", "OPENAI_API_KEY": "standin", "LLM_BACKEND": "http"}
+
+    def stats(self): return {name: dict(c) for name, c in self.counts.items()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-ins for Telegram, Upstash REST and chat completions.")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--llm", default="ttft=0.4,per_token=0.01,jitter=0.3", help="completions behaviour")
+    parser.add_argument("--telegram", default="", help="Telegram behaviour")
+    parser.add_argument("--redis", default="", help="Upstash behaviour")
+    args = parser.parse_args(argv)
+    standin = StandIn(args.port, fake.Behaviour.parse(args.llm), fake.Behaviour.parse(args.telegram),
+                      fake.Behaviour.parse(args.redis)).start()
+    for k, v in standin.env().items(): print(f"export {k}={v}", flush=True)
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        standin.stop()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
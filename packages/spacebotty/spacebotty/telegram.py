@@ -0,0 +1,128 @@
+import os, time
+from spacebotty import outbox, trace, transport
+from spacebotty.outbox import MAX_MESSAGE_LEN, RateLimited
+
+API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+# Telegram tolerates roughly one edit per second per chat; stay a little above that.
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.2"))
+# Seconds a streamed answer may run before it is cut and sent as it is (0: no limit). Keep it
+# under the function's maxDuration (vercel.json: 10) with room for the final edit.
+STREAM_DEADLINE = float(os.getenv("STREAM_DEADLINE", "7"))
+STREAM_PLACEHOLDER = "✍️ …"
+STREAM_CURSOR = " ▌"
+CUT_NOTE = "\n\n✂️ Cut short. It was not counted: send it again for a full answer."
+
+class Reply(str):
+    """Text sent by `stream_reply`; `cut` when STREAM_DEADLINE or the token limit stopped the generation."""
+    cut = False
+
+def call(token, method, payload, files=None, timeout=None, coalesce=False):
+    """One Bot API call, paced by `outbox` (per-bot and per-chat limits, retry_after, coalescing).
+
+    A sendMessage longer than one message goes out in parts (buttons on the last one);
+    the last part's response is returned.
+    """
+    # `timeout` overrides the host policy (getUpdates holds the request open for its long-poll timeout).
+    extra = {"timeout": timeout} if timeout else {}
+    if method == "sendMessage" and len(payload.get("text") or "") > MAX_MESSAGE_LEN:
+        *parts, last = split_text(payload["text"])
+        head = {k: v for k, v in payload.items() if k != "reply_markup"}
+        for part in parts: call(token, method, dict(head, text=part), coalesce=coalesce)
+        payload = dict(payload, text=last)
+
+    def post(payload):
+        # Uploads (sendDocument) go as multipart form fields; everything else as JSON.
+        with trace.span("telegram", method):
+            if files: return transport.post(f"{API_URL}/bot{token}/{method}", data=payload, files=files, **extra)
+            return transport.post(f"{API_URL}/bot{token}/{method}", json=payload, **extra)
+    return outbox.send(token, method, payload, post, coalesce)
+
+def download(token, file_id):
+    """Bytes of an uploaded file (bots may fetch files up to 20 MB), or None if Telegram has no path for it."""
+    info = _result(call(token, "getFile", {"file_id": file_id}))
+    if not info or not info.get("file_path"): return None
+    with trace.span("telegram", "download"):
+        r = transport.get(f"{API_URL}/file/bot{token}/{info['file_path']}")
+    r.raise_for_status()
+    return r.content
+
+def split_text(text, limit=MAX_MESSAGE_LEN):
+    """Cut `text` into messages of at most `limit` chars at paragraph, line or word breaks.
+
+    A code block cut in two is closed at the end of one part and reopened in the next.
+    """
+    parts, fence = [], False
+    while text:
+        head = "```\n" if fence else ""
+        if len(head) + len(text) <= limit: part, text = text, ""
+        else:
+            room = limit - len(head) - 4
+            cut = next((i + len(sep) for sep in ("\n\n", "\n", " ") if (i := text.rfind(sep, room // 2, room)) > 0), room)
+            part, text = text[:cut].rstrip(), text[cut:]
+        part = head + part
+        fence = part.count("```") % 2 == 1
+        parts.append(part + "\n```" if fence and text else part)
+    return parts
+
+def split_command(text):
+    """("/cmd", "botname", "args") for "/cmd@BotName args", tokenized once; command is "" for plain text."""
+    if not text.startswith("/"): return "", "", text
+    parts = text.split(maxsplit=1)
+    command, _, mention = parts[0].partition("@")
+    return command.lower(), mention.lower(), parts[1].strip() if len(parts) > 1 else ""
+
+def parse_command(update):
+    """(chat_id, uid, command) for a message update; command is "" for non-command text."""
+    msg = update.get("message") or update.get("edited_message") or {}
+    command = split_command(msg.get("text") or "")[0]
+    return (msg.get("chat") or {}).get("id"), (msg.get("from") or {}).get("id"), command
+
+def _result(resp):
+    try: body = resp.json()
+    except (AttributeError, ValueError): return None
+    return body.get("result") if body.get("ok") else None
+
+def stream_reply(tg, chat_id, chunks, parse_mode="Markdown", interval=STREAM_EDIT_INTERVAL, deadline=STREAM_DEADLINE):
+    """Send a placeholder, then grow it with throttled editMessageText calls as `chunks` arrive.
+
+    Intermediate edits are plain text (half-written Markdown is rejected by
+    Telegram); the final edit applies `parse_mode` and falls back to plain text.
+    Text beyond one message is sent as follow-up messages. Returns the full text
+    as a `Reply`; past `deadline` seconds the stream is closed and what arrived
+    is sent with CUT_NOTE, and the reply is marked `cut`. So is a stream that ends
+    `cut` itself (an empty answer, or one stopped by the token limit).
+    """
+    stop = time.monotonic() + deadline if deadline else None
+    sent = _result(tg("sendMessage", {"chat_id": chat_id, "text": STREAM_PLACEHOLDER}))
+    message_id = sent and sent.get("message_id")
+    text, shown, last_edit, cut = "", "", 0.0, False
+
+    def edit(body, mode=None):
+        payload = {"chat_id": chat_id, "message_id": message_id, "text": body}
+        if mode: payload["parse_mode"] = mode
+        return tg("editMessageText", payload)
+
+    source, chunks = chunks, iter(chunks)
+    try:
+        for chunk in chunks:
+            text += chunk
+            if stop and time.monotonic() >= stop:
+                cut = True; getattr(chunks, "close", lambda: None)(); break
+            if message_id and time.monotonic() - last_edit >= interval:
+                preview = text[:MAX_MESSAGE_LEN - len(STREAM_CURSOR)] + STREAM_CURSOR
+                if preview != shown: edit(preview); shown = preview
+                last_edit = time.monotonic()
+    except Exception:
+        if message_id: edit("⚠️ Generation failed, please try again.")
+        raise
+
+    text, cut = text.strip(), cut or bool(getattr(source, "cut", False))
+    parts = split_text((text + CUT_NOTE).strip() if cut else text) or [""]
+    if message_id:
+        if _result(edit(parts[0], parse_mode)) is None: edit(parts[0])
+    else:
+        tg("sendMessage", {"chat_id": chat_id, "text": parts[0], "parse_mode": parse_mode})
+    for part in parts[1:]:
+        tg("sendMessage", {"chat_id": chat_id, "text": part})
+    text = Reply(text); text.cut = cut
+    return text
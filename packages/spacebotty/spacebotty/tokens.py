@@ -0,0 +1,69 @@
+import os, re, logging
+
+log = logging.getLogger("spacebotty.tokens")
+
+# Input budget for a command argument when its Command does not set one.
+PROMPT_ARG_TOKENS = int(os.getenv("PROMPT_ARG_TOKENS", "300"))
+# tiktoken encoding used when the package is installed (pip install "spacebotty[tokens]").
+TOKENIZER = os.getenv("TOKENIZER", "o200k_base")
+ELLIPSIS = " […] "
+
+_encoding = None
+_WORD = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+def encoding():
+    """The tiktoken encoding, loaded on first use; False when tiktoken is missing or cannot load it."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER)
+        except Exception as e:  # not installed, or the BPE file could not be fetched
+            log.info("token counts are estimated (%s)", e)
+            _encoding = False
+    return _encoding
+
+def estimate(text):
+    """Token count of `text`: exact with tiktoken, otherwise a conservative local estimate."""
+    enc = encoding()
+    if enc: return len(enc.encode(text))
+    # Roughly one token per word or punctuation mark, and at least one per 4 characters.
+    return max(len(_WORD.findall(text)), (len(text) + 3) // 4)
+
+def fit(text, budget):
+    """`text` cut to at most `budget` tokens, keeping its start and end around an ellipsis.
+
+    The opening of a paste (title, brand) and its end (price, shipping) carry the most
+    signal, so two thirds of the budget go to the head and one third to the tail.
+    """
+    if not budget or estimate(text) <= budget: return text
+    room = max(budget - estimate(ELLIPSIS), 2)
+    head, tail = room * 2 // 3, room - room * 2 // 3
+    enc = encoding()
+    if enc:
+        ids = enc.encode(text)
+        return enc.decode(ids[:head]).rstrip() + ELLIPSIS + enc.decode(ids[-tail:]).lstrip()
+    words = text.split(" ")
+    start, whole = _take(words, head)
+    end, _ = _take(words[whole:], tail, from_end=True)
+    return " ".join(start).rstrip() + ELLIPSIS + " ".join(end).lstrip()
+
+def _take(words, budget, from_end=False):
+    # Longest run of leading (or trailing) words that fits `budget` tokens, and how many are whole.
+    # A word over the whole budget (a long URL, text without spaces) is cut by characters instead.
+    out, used = [], 0
+    for word in (reversed(words) if from_end else words):
+        cost = estimate(word + " ")
+        if used + cost > budget:
+            whole = len(out)
+            part = _chars(word[::-1] if from_end else word, budget - used) if cost > budget else ""
+            if part: out.append(part[::-1] if from_end else part)
+            return (out[::-1] if from_end else out), whole
+        out.append(word); used += cost
+    return (out[::-1] if from_end else out), len(out)
+
+def _chars(text, budget):
+    # Longest prefix of `text` that fits `budget` tokens.
+    n = min(len(text), max(budget, 0) * 4)
+    while n and estimate(text[:n]) > budget: n = n * 3 // 4
+    return text[:n]
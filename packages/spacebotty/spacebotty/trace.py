@@ -0,0 +1,153 @@
+import os, sys, json, time, bisect, hashlib, logging, itertools, threading, contextvars
+from contextlib import contextmanager
+
+# Spans around outbound calls (upstash, telegram, llm) and command handlers, grouped per update.
+TRACE = os.getenv("TRACE", "true").lower() == "true"
+# One JSON line per update on stdout: bot, command, uid hash, status, cache, tokens, time per service.
+TRACE_LOG = os.getenv("TRACE_LOG", "true").lower() == "true"
+# Keyed hash for uids in log lines; without a salt a uid hash can be brute-forced.
+TRACE_SALT = os.getenv("TRACE_SALT", "")
+# Also export each update as an OpenTelemetry trace (needs opentelemetry-api and a configured SDK).
+TRACE_OTEL = os.getenv("TRACE_OTEL", "false").lower() == "true"
+
+# Prometheus histogram bucket bounds in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+log = logging.getLogger("spacebotty.trace")
+if TRACE_LOG and not log.handlers:
+    _handler = logging.StreamHandler(sys.stdout); _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler); log.setLevel(logging.INFO); log.propagate = False
+
+_current = contextvars.ContextVar("spacebotty_trace", default=None)
+_lock = threading.Lock()
+_otel = None
+
+class Metrics:
+    """Counters and histograms of this instance, rendered in the Prometheus text format."""
+    def __init__(self):
+        self.counters, self.histograms = {}, {}
+
+    def inc(self, name, labels, n=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name, labels, seconds):
+        h = self.histograms.get((name, labels))
+        if h is None: h = self.histograms[(name, labels)] = [0] * (len(BUCKETS) + 3)  # buckets, +Inf, sum, count
+        h[bisect.bisect_left(BUCKETS, seconds)] += 1
+        h[-2] += seconds; h[-1] += 1
+
+    def render(self):
+        with _lock: counters, histograms = dict(self.counters), {k: list(v) for k, v in self.histograms.items()}
+        fmt = lambda labels, extra=(): "{" + ",".join(f'{k}="{v}"' for k, v in (*labels, *extra)) + "}"
+        lines = [f"{name}{fmt(labels)} {value}" for (name, labels), value in sorted(counters.items())]
+        for (name, labels), h in sorted(histograms.items()):
+            lines += [f"{name}_bucket{fmt(labels, [('le', bound)])} {n}"
+                      for bound, n in zip(BUCKETS, itertools.accumulate(h[:len(BUCKETS)]))]
+            lines += [f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {h[-1]}",
+                      f"{name}_sum{fmt(labels)} {h[-2]:.6f}", f"{name}_count{fmt(labels)} {h[-1]}"]
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+# Called with (trace, status, seconds) for every finished update, after its metrics (see analytics).
+sinks = []
+
+class Trace:
+    """Tags and spans of one update; spans are (service, op, start, seconds, error)."""
+    def __init__(self, bot, update_id):
+        self.bot, self.update_id = bot, update_id
+        self.tags, self.spans = {}, []
+        self.wall, self.started = time.time_ns(), time.perf_counter()
+
+def uid_hash(uid):
+    return hashlib.blake2b(str(uid).encode(), digest_size=6, key=TRACE_SALT.encode()[:64]).hexdigest()
+
+def current(): return _current.get()
+
+def tag(**tags):
+    t = _current.get()
+    if t is not None: t.tags.update(tags)
+
+def add(key, n):
+    """Add `n` to a numeric tag of the current update (token usage across several completions)."""
+    t = _current.get()
+    if t is not None and n: t.tags[key] = t.tags.get(key, 0) + n
+
+@contextmanager
+def span(service, op=""):
+    """Time the block as one `service` call; outside an update it only feeds the metrics."""
+    if not TRACE:
+        yield; return
+    started, error = time.perf_counter(), False
+    try: yield
+    except Exception: error = True; raise
+    finally:
+        seconds = time.perf_counter() - started
+        t = _current.get()
+        if t is not None: t.spans.append((service, op, started, seconds, error))
+        else:
+            with _lock: _record_span("", service, op, seconds, error)
+
+@contextmanager
+def update(bot, update_id):
+    """Collect the spans of one update; on exit record its metrics and write its log line."""
+    if not TRACE:
+        yield None; return
+    t = Trace(bot, update_id)
+    token = _current.set(t); status = "ok"
+    try: yield t
+    except Exception: status = "error"; raise
+    finally:
+        _current.reset(token)
+        _finish(t, t.tags.pop("status", status), time.perf_counter() - t.started)
+
+def _record_span(bot, service, op, seconds, error):
+    labels = (("bot", bot), ("service", service), ("op", op))
+    metrics.observe("spacebotty_span_seconds", labels, seconds)
+    if error: metrics.inc("spacebotty_span_errors_total", labels)
+
+def _finish(t, status, seconds):
+    command, tags = t.tags.get("command", ""), t.tags
+    with _lock:
+        for service, op, _, took, error in t.spans: _record_span(t.bot, service, op, took, error)
+        metrics.inc("spacebotty_updates_total", (("bot", t.bot), ("command", command), ("status", status)))
+        metrics.observe("spacebotty_update_seconds", (("bot", t.bot), ("command", command)), seconds)
+        if "cache" in tags: metrics.inc("spacebotty_cache_total", (("bot", t.bot), ("result", tags["cache"])))
+        if tags.get("tokens"):
+            metrics.inc("spacebotty_llm_tokens_total", (("bot", t.bot), ("model", tags.get("model", ""))), tags["tokens"])
+    if TRACE_LOG: log.info(json.dumps(_line(t, status, seconds), separators=(",", ":")))
+    if TRACE_OTEL: _export(t, status, seconds)
+    for sink in sinks: sink(t, status, seconds)
+
+def _line(t, status, seconds):
+    services = {}
+    for service, _, _, took, _ in t.spans:
+        n, ms = services.get(service, (0, 0.0)); services[service] = (n + 1, ms + took * 1000)
+    line = {"bot": t.bot, "update": t.update_id, **t.tags, "status": status, "ms": round(seconds * 1000, 1)}
+    line["spans"] = {service: [n, round(ms, 1)] for service, (n, ms) in services.items()}
+    return line
+
+def _export(t, status, seconds):
+    global _otel
+    if _otel is None:
+        try:
+            from opentelemetry import trace as otel
+            _otel = (otel, otel.get_tracer("spacebotty"))
+        except ImportError:
+            log.warning("TRACE_OTEL is set but opentelemetry-api is not installed"); _otel = False
+    if not _otel: return
+    otel, tracer = _otel
+    ns = lambda started: t.wall + int((started - t.started) * 1e9)
+    attributes = {"bot": t.bot, "update_id": t.update_id or 0, "status": status,
+                  **{k: v for k, v in t.tags.items() if isinstance(v, (str, int, float, bool))}}
+    root = tracer.start_span("update", start_time=t.wall, attributes=attributes)
+    context = otel.set_span_in_context(root)
+    for service, op, started, took, error in t.spans:
+        child = tracer.start_span(f"{service} {op}".strip(), context=context, start_time=ns(started),
+                                  attributes={"service": service, "op": op, "error": error})
+        child.end(end_time=ns(started + took))
+    root.end(end_time=t.wall + int(seconds * 1e9))
+
+def run_in_context(pool, fn, *args):
+    """`pool.submit` that carries the caller's trace into the worker thread."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
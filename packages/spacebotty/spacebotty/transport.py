@@ -0,0 +1,194 @@
+import os, ssl, json, time, threading, http.client
+from urllib.parse import urlsplit
+
+# JSON POSTs (Upstash commands, Telegram methods, completions and their streams) go over stdlib
+# http.client, so a cold instance never imports requests/urllib3 to answer an update.
+# Uploads, downloads and Batch API calls use the requests session below.
+TRANSPORT_FAST = os.getenv("TRANSPORT_FAST", "true").lower() == "true"
+
+class HostPolicy:
+    """Connection pool size, timeout and retry rules for one upstream host."""
+    def __init__(self, pool_size=8, timeout=9, retry_statuses=(), retries=2, backoff=0.25):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retry_statuses = tuple(retry_statuses)
+        self.retries = retries
+        self.backoff = backoff
+
+    def retry(self):
+        from urllib3.util.retry import Retry
+        # Connection errors are always safe to retry; status retries only where the host
+        # tells us the request was not applied (429) or the call is side-effect free.
+        return Retry(total=self.retries, connect=self.retries, read=0, backoff_factor=self.backoff,
+                     status_forcelist=self.retry_statuses, allowed_methods=None,
+                     respect_retry_after_header=True, raise_on_status=False)
+
+def _netloc(url):
+    return urlsplit(url or "").netloc
+
+# (connect, read) timeouts stay under Vercel's 10s maxDuration.
+# Keyed by host[:port] of the configured URLs, so stand-ins on localhost ports keep their upstream's rules.
+TELEGRAM_HOST = _netloc(os.getenv("TELEGRAM_API_URL") or "https://api.telegram.org")
+OPENAI_HOST = _netloc(os.getenv("OPENAI_BASE_URL") or "https://api.openai.com")
+UPSTASH_HOST = _netloc(os.getenv("UPSTASH_REDIS_REST_URL"))
+POLICIES = {
+    # Telegram 429s are retried by spacebotty.outbox, which knows the chat they were for.
+    TELEGRAM_HOST: HostPolicy(pool_size=int(os.getenv("TELEGRAM_POOL_SIZE", "16")), timeout=(3, 9)),
+    OPENAI_HOST: HostPolicy(pool_size=int(os.getenv("OPENAI_POOL_SIZE", "8")), timeout=(3, 9),
+                            retry_statuses=(429, 500, 502, 503, 504), retries=1),
+}
+if UPSTASH_HOST:
+    POLICIES[UPSTASH_HOST] = HostPolicy(pool_size=int(os.getenv("UPSTASH_POOL_SIZE", "8")),
+                                        timeout=(2, float(os.getenv("UPSTASH_TIMEOUT", "3"))),
+                                        retry_statuses=(429,))
+DEFAULT_POLICY = HostPolicy()
+
+_sessions = {}
+_lock = threading.Lock()
+
+def policy(host): return POLICIES.get(host, DEFAULT_POLICY)
+
+def session(url):
+    """Keep-alive session for the URL's host[:port], created on first use and kept for the warm instance."""
+    host = urlsplit(url).netloc
+    s = _sessions.get(host)
+    if s is None:
+        with _lock:
+            s = _sessions.get(host)
+            if s is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                p = policy(host)
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=p.pool_size, max_retries=p.retry())
+                s.mount("https://", adapter); s.mount("http://", adapter)
+                _sessions[host] = s
+    return s
+
+class Response:
+    """The parts of `requests.Response` the callers use, for http.client replies.
+
+    A streamed response (`stream=True`) owns its connection until closed; use it as a
+    context manager like the requests one.
+    """
+    def __init__(self, status, reason, headers, content, url, raw=None, release=None):
+        self.status_code, self.reason, self.headers, self.url = status, reason, headers, url
+        self._content, self.raw, self._release = content, raw, release
+        self.encoding = "utf-8"
+
+    @property
+    def ok(self): return self.status_code < 400
+
+    @property
+    def content(self):
+        if self._content is None: self._content = self.raw.read()
+        return self._content
+
+    @property
+    def text(self): return self.content.decode(self.encoding, "replace")
+
+    def json(self): return json.loads(self.content)
+
+    def iter_lines(self, decode_unicode=False, **_):
+        for line in self.raw:
+            line = line.rstrip(b"\r\n")
+            yield line.decode(self.encoding) if decode_unicode else line
+
+    def raise_for_status(self):
+        if self.status_code < 400: return
+        from requests import HTTPError  # same exception type as the requests path; only paid on errors
+        kind = "Client" if self.status_code < 500 else "Server"
+        raise HTTPError(f"{self.status_code} {kind} Error: {self.reason} for url: {self.url}", response=self)
+
+    def close(self):
+        if self._release: self._release(self); self._release = None
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+_local = threading.local()
+_fast_counts = {}
+_ssl = None
+
+def _conns(): return _local.__dict__.setdefault("conns", {})
+
+def _connection(parts, connect_timeout):
+    global _ssl
+    conn = _conns().pop(parts.netloc, None)
+    if conn is None:
+        if parts.scheme == "https":
+            _ssl = _ssl or ssl.create_default_context()
+            conn = http.client.HTTPSConnection(parts.hostname, parts.port, timeout=connect_timeout, context=_ssl)
+        else:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=connect_timeout)
+    return conn
+
+def _keep(parts, conn, r):
+    # Back to this thread's idle connections if the reply was read to the end; else it can't be reused.
+    if r.isclosed() and not r.will_close and parts.netloc not in _conns(): _conns()[parts.netloc] = conn
+    else: conn.close()
+
+def _fast(method, url, payload, headers, timeout, stream=False):
+    """One JSON request on a keep-alive connection of this thread, with the host's retry rules.
+
+    The connection is taken out of the thread's idle set while in use, so a stream still
+    being read never shares it with another request.
+    """
+    parts = urlsplit(url)
+    p = policy(parts.netloc)
+    connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    body = json.dumps(payload).encode()
+    headers = {"Content-Type": "application/json", "Content-Length": str(len(body)), **(headers or {})}
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    counts = _fast_counts.setdefault(parts.netloc, [0, 0])
+    for attempt in range(p.retries + 1):
+        conn = _connection(parts, connect)
+        reused, sent = conn.sock is not None, False
+        try:
+            if not reused:
+                conn.connect(); conn.sock.settimeout(read); counts[1] += 1
+            counts[0] += 1
+            conn.request(method, path, body, headers); sent = True
+            r = conn.getresponse()
+            content = None if stream and r.status < 400 else r.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            # Safe to send again when nothing reached the server, or when a reused connection was
+            # closed by the server while idle; read timeouts are not retried.
+            stale = reused and isinstance(e, ConnectionError)
+            if attempt == p.retries or (sent and not stale): raise
+            continue
+        if r.status in p.retry_statuses and attempt < p.retries:
+            _keep(parts, conn, r)
+            time.sleep(float(r.headers.get("Retry-After") or p.backoff * 2 ** attempt))
+            continue
+        if content is not None:
+            _keep(parts, conn, r)
+            return Response(r.status, r.reason, r.headers, content, url)
+        return Response(r.status, r.reason, r.headers, None, url, raw=r, release=lambda _: _keep(parts, conn, r))
+
+def request(method, url, **kwargs):
+    kwargs.setdefault("timeout", policy(urlsplit(url).netloc).timeout)
+    if TRANSPORT_FAST and method == "POST" and "json" in kwargs and kwargs.keys() <= {"json", "headers", "timeout", "stream"}:
+        return _fast(method, url, kwargs["json"], kwargs.get("headers"), kwargs["timeout"], kwargs.get("stream", False))
+    return session(url).request(method, url, **kwargs)
+
+def get(url, **kwargs): return request("GET", url, **kwargs)
+def post(url, **kwargs): return request("POST", url, **kwargs)
+
+def stats():
+    """Per-host request and connection counts; `reused` is how many requests skipped a handshake."""
+    out = {}
+    for host, s in list(_sessions.items()):
+        reqs = conns = 0
+        for adapter in set(s.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None: continue
+                reqs += pool.num_requests; conns += pool.num_connections
+        out[host] = {"requests": reqs, "connections": conns, "reused": max(reqs - conns, 0)}
+    for host, (reqs, conns) in list(_fast_counts.items()):
+        slot = out.setdefault(host, {"requests": 0, "connections": 0, "reused": 0})
+        slot["requests"] += reqs; slot["connections"] += conns; slot["reused"] = max(slot["requests"] - slot["connections"], 0)
+    return out
@@ -0,0 +1,46 @@
+import os, hashlib
+from spacebotty import trace, transport
+
+REDIS_URL = os.getenv("UPSTASH_REDIS_REST_URL")
+REDIS_TOKEN = os.getenv("UPSTASH_REDIS_REST_TOKEN")
+HEADERS = {"Authorization": f"Bearer {REDIS_TOKEN}"}
+
+def _post(path, payload):
+    # Pooled keep-alive connection from the shared transport: no TLS handshake per command.
+    with trace.span("upstash", path.strip("/") or payload[0].upper()):
+        r = transport.post(f"{REDIS_URL}{path}", json=payload, headers=HEADERS)
+    try: return r.json()  # command errors come back as 400 + {"error": ...}
+    except ValueError: return None
+
+def _results(replies, n):
+    # Upstash answers a batch with [{"result": ...} | {"error": ...}, ...]; errors map to None.
+    if not isinstance(replies, list): return [None] * n
+    return [rep.get("result") if isinstance(rep, dict) else None for rep in replies]
+
+def command_reply(*args):
+    """Raw reply ({"result": ...} or {"error": ...}), or None when Upstash could not be reached."""
+    reply = _post("", [str(a) for a in args])
+    return reply if isinstance(reply, dict) else None
+
+def command(*args):
+    reply = command_reply(*args)
+    return reply.get("result") if reply else None
+
+def pipeline(cmds):
+    """Send several commands in one `/pipeline` request; returns one result per command."""
+    if not cmds: return []
+    return _results(_post("/pipeline", [[str(a) for a in c] for c in cmds]), len(cmds))
+
+def multi_exec(cmds):
+    """Like `pipeline`, but executed as a MULTI/EXEC transaction."""
+    if not cmds: return []
+    return _results(_post("/multi-exec", [[str(a) for a in c] for c in cmds]), len(cmds))
+
+def eval_script(script, keys, args=()):
+    """EVALSHA, falling back to EVAL once so the script body is only sent on a script-cache miss."""
+    sha = hashlib.sha1(script.encode()).hexdigest()
+    tail = [len(keys), *keys, *args]
+    reply = _post("", [str(a) for a in ["EVALSHA", sha, *tail]])
+    if reply and "NOSCRIPT" in str(reply.get("error", "")):
+        reply = _post("", [str(a) for a in ["EVAL", script, *tail]])
+    return reply.get("result") if reply else None
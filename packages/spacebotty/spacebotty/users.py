@@ -0,0 +1,118 @@
+import os, time, datetime
+from spacebotty.cache import MISSING, local
+from spacebotty.upstash import command, eval_script, pipeline
+
+# While true, a user without a record is read from (and on the next quota EVAL copied out of) the
+# old per-key layout: user:<uid>:premium and user:<uid>:uses:<date>. Those keys were shared by
+# all bots, so each bot copies them and none deletes them. Turn off once
+# `python api/telegram.py migrate-users [bot]` has converted every premium user for every bot.
+USER_LEGACY_KEYS = os.getenv("USER_LEGACY_KEYS", "true").lower() == "true"
+# A record expires this many days after its last write, never before the premium expiry it holds.
+USER_RECORD_DAYS = int(os.getenv("USER_RECORD_DAYS", "90"))
+RECORD_TTL = USER_RECORD_DAYS * 24 * 60 * 60
+# Expiry given to an old premium flag that had no TTL.
+NO_EXPIRY = 4102444800  # 2100-01-01
+
+# One hash per bot and user, `user:<bot>:<uid>` (quota and premium are per bot): p premium expiry (unix seconds), d day bucket (YYYYMMDD),
+# n uses on that day, c last command, t its time (unix seconds).
+FIELDS = ("p", "d", "n", "c", "t")
+
+# Lua for quota.RESERVE_LUA and MIGRATE_LUA: with ARGV[7] == "1" and no record yet, take premium
+# expiry (from the flag's TTL) and today's uses from KEYS[2]/KEYS[3]. They are left in place for
+# the other bots and expire on their own. The old code counted premium users' commands too; those
+# uses are not carried over.
+# Expects `now`, `today` and `r` (HMGET p d n) to be set; updates `expiry`, `day`, `used`.
+FOLD_LUA = """
+if ARGV[7] == "1" and not r[1] and not r[2] then
+  if redis.call("GET", KEYS[2]) == "1" then
+    local ttl = redis.call("TTL", KEYS[2])
+    expiry = ttl > 0 and now + ttl or tonumber(ARGV[8])
+  end
+  local old = redis.call("GET", KEYS[3])
+  if old and expiry <= now then day, used = today, tonumber(old) end
+end
+"""
+
+# KEYS[1] record, KEYS[2]/KEYS[3] old premium flag and today's counter; ARGV[3] now, ARGV[2] today,
+# ARGV[6] record TTL, ARGV[7] "1", ARGV[8] NO_EXPIRY (same slots as quota.RESERVE_LUA).
+# Returns 1 when old keys were folded into a new record.
+MIGRATE_LUA = """
+local now, today = tonumber(ARGV[3]), ARGV[2]
+local r = redis.call("HMGET", KEYS[1], "p", "d", "n")
+if r[1] or r[2] then return 0 end
+local expiry, day, used = 0, nil, 0
+""" + FOLD_LUA + """
+if expiry == 0 and not day then return 0 end
+redis.call("HSET", KEYS[1], "p", expiry, "d", day or today, "n", used)
+redis.call("EXPIREAT", KEYS[1], math.max(expiry, now + tonumber(ARGV[6])))
+return 1
+"""
+
+def key(bot, uid): return f"user:{bot}:{uid}"
+def legacy_premium_key(uid): return f"user:{uid}:premium"
+def legacy_day_key(uid): return f"user:{uid}:uses:{datetime.date.today().isoformat()}"
+def today(): return int(datetime.date.today().strftime("%Y%m%d"))
+
+class Record:
+    """A user's state: premium expiry, uses on `day`, and the last command that went through the quota."""
+    def __init__(self, premium_until=0, day=0, uses=0, command="", at=0):
+        self.premium_until = premium_until
+        self.day = day
+        self.uses = uses
+        self.command = command
+        self.at = at
+
+    def premium(self, now=None): return self.premium_until > (now or time.time())
+
+    def uses_today(self): return self.uses if self.day == today() else 0
+
+def _record(fields):
+    p, d, n, c, t = fields or [None] * len(FIELDS)
+    if p is None and d is None: return None
+    return Record(int(p or 0), int(d or 0), int(n or 0), c or "", int(t or 0))
+
+def _legacy(flag, ttl, uses):
+    if flag == "1": return Record(int(time.time()) + ttl if ttl and ttl > 0 else NO_EXPIRY)
+    return Record(0, today() if uses else 0, int(uses or 0))
+
+def read(bot, uids):
+    """Records for `uids`: the local cache first, the rest with one pipelined round trip.
+
+    With USER_LEGACY_KEYS, users that have no record yet cost a second round trip for the old keys.
+    """
+    records = {uid: local.get(key(bot, uid)) for uid in uids}
+    missing = [uid for uid, r in records.items() if r is MISSING]
+    if missing:
+        fetched = dict(zip(missing, map(_record, pipeline([["HMGET", key(bot, uid), *FIELDS] for uid in missing]))))
+        old = [uid for uid, r in fetched.items() if r is None] if USER_LEGACY_KEYS else []
+        if old:
+            replies = pipeline([c for uid in old for c in (["GET", legacy_premium_key(uid)], ["TTL", legacy_premium_key(uid)],
+                                                         ["GET", legacy_day_key(uid)])])
+            fetched.update((uid, _legacy(*replies[i * 3:i * 3 + 3])) for i, uid in enumerate(old))
+        for uid, r in fetched.items():
+            records[uid] = r or Record()
+            local.set(key(bot, uid), records[uid])
+    return [records[uid] for uid in uids]
+
+def set_premium(bot, uid, seconds):
+    now, user = int(time.time()), key(bot, uid)
+    until = now + int(seconds)
+    pipeline([["HSET", user, "p", until], ["EXPIREAT", user, max(until, now + RECORD_TTL)]])
+    local.invalidate(user)
+    return until
+
+def migrate(bot, batch=100):
+    """Copy every old premium flag into `bot`'s records; returns the count.
+
+    The flags stay for the other bots: run this once per bot. Day counters of users without premium need no migration: they expire at midnight, and
+    until then the quota EVAL folds them in on the user's next command.
+    """
+    folded, cursor = 0, "0"
+    while True:
+        cursor, keys = command("SCAN", cursor, "MATCH", "user:*:premium", "COUNT", batch) or ("0", [])
+        for old in keys:
+            uid = old.split(":")[1]
+            folded += int(eval_script(MIGRATE_LUA, [key(bot, uid), old, legacy_day_key(uid)],
+                                      ["", today(), int(time.time()), "", "", RECORD_TTL, "1", NO_EXPIRY]) or 0)
+            local.invalidate(key(bot, uid))
+        if str(cursor) == "0": return folded
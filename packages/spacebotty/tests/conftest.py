@@ -0,0 +1,66 @@
+import os, hashlib
+import pytest
+
+# No update log lines or analytics stream from the tests.
+os.environ.update(TRACE_LOG="false", ANALYTICS="off")
+
+from spacebotty import cache, standin, upstash
+
+class LuaRedis(standin.MiniRedis):
+    """MiniRedis whose EVAL/EVALSHA run the real Lua scripts (through lupa) instead of the native twins."""
+    def __init__(self, lupa):
+        super().__init__()
+        self.lupa, self.bodies = lupa, {}
+
+    def cmd_evalsha(self, sha, numkeys, *rest):
+        script = self.bodies.get(sha)
+        if script is None: raise standin.RedisError("NOSCRIPT No matching script. Please use EVAL.")
+        n = int(numkeys)
+        return self.run(script, rest[:n], rest[n:])
+
+    def cmd_eval(self, script, numkeys, *rest):
+        sha = hashlib.sha1(script.encode()).hexdigest()
+        self.bodies[sha] = script
+        return self.cmd_evalsha(sha, numkeys, *rest)
+
+    def run(self, script, keys, args):
+        lua = self.lupa.LuaRuntime(unpack_returned_tuples=True)
+        def call(*argv): return self._to_lua(lua, self.execute([_arg(a) for a in argv]))
+        g = lua.globals()
+        g.redis = lua.table_from({"call": call})
+        g.KEYS, g.ARGV = lua.table_from(list(keys)), lua.table_from(list(args))
+        return self._from_lua(lua.execute(script))
+
+    def _to_lua(self, lua, value):
+        # Redis -> Lua: nil is false, arrays become tables.
+        if value is None: return False
+        if isinstance(value, list): return lua.table_from([self._to_lua(lua, v) for v in value])
+        return value
+
+    def _from_lua(self, value):
+        # Lua -> Redis: false is nil, true is 1, numbers are truncated, tables stop at the first nil.
+        if value is None or value is False: return None
+        if value is True: return 1
+        if isinstance(value, float): return int(value)
+        if self.lupa.lua_type(value) == "table":
+            items, i = [], 1
+            while value[i] is not None: items.append(self._from_lua(value[i])); i += 1
+            return items
+        return value
+
+def _arg(a):
+    # Redis converts numeric arguments of redis.call to strings; integral floats lose the ".0".
+    return str(int(a)) if isinstance(a, float) and a == int(a) else str(a)
+
+@pytest.fixture
+def redis(monkeypatch):
+    """An in-memory Redis behind `spacebotty.upstash`, running the real Lua scripts."""
+    r = LuaRedis(pytest.importorskip("lupa"))
+    def reply(cmd):
+        try: return {"result": r.execute(cmd)}
+        except standin.RedisError as e: return {"error": str(e)}
+    monkeypatch.setattr(upstash, "_post", lambda path, payload: reply(payload) if not path.strip("/") else
+                        [reply(c) for c in payload])
+    cache.local.clear()
+    yield r
+    cache.local.clear()
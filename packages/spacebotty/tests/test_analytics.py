@@ -0,0 +1,18 @@
+from spacebotty import analytics, engine, trace
+from spacebotty.profiles import PROFILES
+
+def test_events_are_rolled_up_once_into_the_summary(redis, monkeypatch):
+    monkeypatch.setattr(analytics, "ANALYTICS", "redis"); monkeypatch.setattr(analytics, "_buffer", [])
+    monkeypatch.setattr(trace, "sinks", [analytics.record])  # conftest turns analytics off
+    monkeypatch.setenv("LINKEDIN_BOT_TOKEN", "1:a"); monkeypatch.setenv("LINKEDIN_FREE_DAILY", "0")
+    bot = engine.Engine([PROFILES["linkedin"]]).bots["linkedin"]
+    monkeypatch.setattr(bot, "tg", lambda method, payload, files=None, coalesce=False: None)
+    command = next(iter(bot.profile.commands))
+    for update_id, (uid, text) in enumerate([(1, "/start"), (1, f"{command} topic"), (2, f"{command} topic"),
+                                             (1, "/buy")]):
+        bot.handle_update({"update_id": update_id, "message": {"chat": {"id": uid}, "from": {"id": uid}, "text": text}})
+    assert analytics.aggregate() == 4 and analytics.aggregate() == 0  # the cursor moved with the counters
+    summary = analytics.summary("linkedin", hours=1)
+    assert summary["commands"][command]["status"] == {"paywall": 2}
+    assert summary["commands"]["/start"]["calls"] == 1 and summary["commands"]["/start"]["p50"] is not None
+    assert summary["funnel"] == {"paywall_users": 2, "buy_users": 1, "paying_users": 0, "paywall_to_buy": 0.5}
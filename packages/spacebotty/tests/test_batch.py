@@ -0,0 +1,30 @@
+from spacebotty import batch, llm
+
+def reply(text, tokens=60, finish_reason="stop"):
+    out = llm.Completion(text); out.usage, out.finish_reason = {"total_tokens": tokens}, finish_reason
+    return out
+
+def test_combined_reply_is_split_and_dropped_items_retried():
+    sent = []
+    def generate(prompt):
+        sent.append(prompt)
+        if prompt.startswith("Handle each"): return reply("<<<1>>>\none\n<<<3>>>\nthree")
+        return reply(f"alone: {prompt}", 10)
+    answers = batch.complete_many("system", ["a", "b", "c"], size=3, generate=generate)
+    assert answers == ["one", "alone: b", "three"] and sent[1:] == ["b"]
+    assert [llm.total_tokens(a.usage) for a in answers] == [20, 10, 20]
+
+def test_answer_cut_by_the_token_limit_is_retried():
+    def generate(prompt):
+        if prompt.startswith("Handle each"): return reply("<<<1>>>\none\n<<<2>>>\ntw", finish_reason="length")
+        return reply(f"alone: {prompt}")
+    assert batch.complete_many("system", ["a", "b"], size=2, generate=generate) == ["one", "alone: b"]
+
+def test_finished_batches_are_delivered_once(redis, monkeypatch):
+    pending, delivered = batch.Pending("linkedin"), []
+    pending.add("done", {"x": {"pin": "k1"}, "y": {"pin": "k2"}})
+    pending.add("running", {"z": {"pin": "k3"}})
+    monkeypatch.setattr(batch, "results", lambda batch_id: {"x": reply("ok"), "y": None} if batch_id == "done" else None)
+    assert pending.collect(lambda delivery, text: delivered.append((delivery["pin"], text))) == 1
+    assert pending.collect(lambda delivery, text: delivered.append((delivery["pin"], text))) == 0
+    assert delivered == [("k1", "ok")] and redis.execute(["HGETALL", pending.key])[::2] == ["running"]
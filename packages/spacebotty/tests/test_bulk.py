@@ -0,0 +1,50 @@
+import time
+from spacebotty import bulk, jobs, quota, users
+
+def test_only_failed_prompts_are_counted():
+    rows = [{"name": f"item {i}"} for i in range(3)]
+    def generate(prompts, command):
+        if command == "/desc": raise RuntimeError("model down")
+        return [f"{command} answer" for _ in prompts]
+    assert bulk.run(rows, ["/title", "/desc", "/hashtags"], lambda c, item: f"{c} {item}", generate) is None
+    assert bulk.failures(rows, ["/title", "/desc", "/hashtags"]) == (3, 3)
+    assert rows[0]["ai_title"] == "/title answer" and rows[0]["ai_desc"] == ""
+
+def test_short_multi_prompt_reply_fails_only_the_missing_items():
+    rows = [{"name": f"item {i}"} for i in range(4)]
+    bulk.run(rows, ["/title"], lambda c, item: item, lambda prompts, c: ["ok"] * (len(prompts) - 1), chunk=2)
+    assert bulk.failures(rows, ["/title"]) == (2, 2)
+
+def test_run_stops_at_the_deadline_and_resumes():
+    rows = [{"name": f"item {i}"} for i in range(4)]
+    def slow(prompts, command): time.sleep(0.05); return ["ok"] * len(prompts)
+    start = bulk.run(rows, ["/title"], lambda c, item: item, slow, concurrency=1, deadline=time.monotonic() + 0.07)
+    assert start == 2 and [r["ai_title"] for r in rows] == ["ok", "ok", "", ""]
+    assert bulk.run(rows, ["/title"], lambda c, item: item, slow, start=start) is None
+    assert bulk.failures(rows, ["/title"]) == (0, 0)
+
+class Sent:
+    def __init__(self, result): self.result = result
+    def json(self): return {"ok": True, "result": self.result}
+
+def test_run_over_the_budget_is_queued_and_resumed(redis, monkeypatch):
+    from spacebotty import batch, engine, telegram
+    from spacebotty.profiles import PROFILES
+    monkeypatch.setenv("SECONDHAND_BOT_TOKEN", "1:a"); monkeypatch.setenv("SECONDHAND_FREE_DAILY", "10")
+    bot = engine.Engine([PROFILES["secondhand"]]).bots["secondhand"]
+    calls = []
+    def tg(method, payload, files=None, coalesce=False):
+        calls.append((method, payload, files)); return Sent({"message_id": 5})
+    monkeypatch.setattr(bot, "tg", tg)
+    monkeypatch.setattr(telegram, "download", lambda token, file_id: b"name\n" + "\n".join(f"item {i}" for i in range(6)).encode())
+    def slow(prompts, command=None): time.sleep(0.1); return [f"{command} ok" for _ in prompts]
+    monkeypatch.setattr(bot, "_generate", slow)
+    monkeypatch.setattr(batch, "BATCH_MODE", "off")  # one part per item: 4 in flight, then the budget is spent
+    bot.bulk_budget = 0.05
+    bot.cmd_bulk(1, 1, {"file_id": "f", "file_name": "stock.csv", "file_size": 30}, "/title")
+    assert bot.queue.depth() == 1 and not [c for c in calls if c[0] == "sendDocument"]
+    while bot.queue.depth(): jobs.drain(bot.queue, bot.handle_update, budget=None)
+    document = [c for c in calls if c[0] == "sendDocument"]
+    assert len(document) == 1 and document[0][2]["document"][1].decode().count("/title ok") == 6
+    assert not [c for c in calls if c[0] == "sendMessage" and c[1].get("text", "").startswith("⏳")][1:]
+    assert users.read("secondhand", [1])[0].uses_today() == 6
@@ -0,0 +1,162 @@
+import pytest
+from spacebotty import engine, llm, responses, routing, telegram, users
+from spacebotty.profiles import PROFILES
+
+def make_engine(monkeypatch, **env):
+    for key, value in env.items(): monkeypatch.setenv(key, value)
+    return engine.Engine(PROFILES.values())
+
+def test_bot_query_wins_over_a_shared_secret(monkeypatch):
+    e = make_engine(monkeypatch, WEBHOOK_SECRET="shared")
+    header = {"x-telegram-bot-api-secret-token": "shared"}
+    assert e.route({"bot": ["linkedin"]}, header) is e.bots["linkedin"]
+    assert e.route({"bot": ["creators"]}, header) is e.bots["creators"]
+    assert e.route({}, header) is None  # a shared secret does not pick a bot
+
+def test_secret_routes_and_authenticates(monkeypatch):
+    e = make_engine(monkeypatch, LINKEDIN_WEBHOOK_SECRET="a", CREATORS_WEBHOOK_SECRET="b", SECONDHAND_WEBHOOK_SECRET="c")
+    assert e.route({}, {"x-telegram-bot-api-secret-token": "b"}) is e.bots["creators"]
+    assert e.route({"bot": ["linkedin"]}, {"x-telegram-bot-api-secret-token": "b"}) is None
+    assert e.route({"bot": ["linkedin"]}, {}) is None
+
+def test_failed_payment_handling_is_retried(redis, monkeypatch):
+    bot = make_engine(monkeypatch, LINKEDIN_BOT_TOKEN="1:a").bots["linkedin"]
+    sent = []
+    def tg(method, payload, files=None, coalesce=False):
+        if not sent: sent.append("timeout"); raise TimeoutError(method)
+        sent.append(method)
+    monkeypatch.setattr(bot, "tg", tg)
+    update = {"update_id": 7, "message": {"chat": {"id": 1}, "from": {"id": 1}, "successful_payment": {}}}
+    with pytest.raises(TimeoutError): bot.handle_update(update)
+    bot.handle_update(update)  # Telegram's retry
+    bot.handle_update(update)  # and a redelivery once it went through
+    assert sent == ["timeout", "sendMessage"] and users.read("linkedin", [1])[0].premium()
+
+def test_cut_stream_is_refunded(redis, monkeypatch):
+    bot = make_engine(monkeypatch, LINKEDIN_BOT_TOKEN="1:a", LINKEDIN_FREE_DAILY="3").bots["linkedin"]
+    monkeypatch.setattr(bot, "tg", lambda method, payload, files=None, coalesce=False: None)
+    def answer(chat_id, prompt, topic="", max_tokens=None, tier="standard", premium=False):
+        text = telegram.Reply("half"); text.cut = True; return text
+    monkeypatch.setattr(bot, "answer", answer)
+    command = next(iter(bot.profile.commands))
+    bot.run_command(1, 1, command, "topic")
+    assert users.read("linkedin", [1])[0].uses_today() == 0
+
+class Reasoned(llm.FakeBackend):
+    """A reasoning model that spent max_completion_tokens before writing any answer."""
+    def complete(self, body):
+        reply = super().complete(body)
+        reply["choices"][0].update(message={"role": "assistant", "content": ""}, finish_reason="length")
+        return reply
+
+    def events(self, body):
+        yield {"choices": [{"index": 0, "delta": {}, "finish_reason": "length"}]}
+        yield {"choices": [], "usage": {"total_tokens": 500}}
+
+@pytest.mark.parametrize("stream", ["true", "false"])
+def test_empty_answer_at_the_token_limit_is_refunded(redis, monkeypatch, stream):
+    from spacebotty import fake
+    bot = make_engine(monkeypatch, LINKEDIN_BOT_TOKEN="1:a", LINKEDIN_FREE_DAILY="3",
+                      LINKEDIN_STREAM_REPLIES=stream).bots["linkedin"]
+    sent = []
+    monkeypatch.setattr(bot, "tg", lambda method, payload, files=None, coalesce=False: sent.append(payload.get("text")))
+    monkeypatch.setattr(llm, "backend", Reasoned(fake.Behaviour.parse("")))
+    monkeypatch.setattr(routing, "HEDGE", False)
+    command = next(iter(bot.profile.commands)); spec = bot.profile.commands[command]
+    bot.run_command(1, 1, command, "topic")
+    assert sent[-1] == telegram.CUT_NOTE.strip()
+    assert users.read("linkedin", [1])[0].uses_today() == 0
+    key = responses.cache_key(routing.pick(spec.tier)[0], bot.system_prompt, spec.prompt("topic"), "topic")
+    assert redis.execute(["LLEN", key]) == 0
+
+def test_joined_duplicate_is_neither_charged_nor_answered(redis, monkeypatch):
+    bot = make_engine(monkeypatch, LINKEDIN_BOT_TOKEN="1:a").bots["linkedin"]
+    answered = []
+    monkeypatch.setattr(bot, "answer", lambda chat_id, *args, **kw: answered.append(chat_id))
+    command = next(iter(bot.profile.commands))
+    first = bot.claim(1, 1, command, bot.profile.commands[command].fit("topic"))
+    first.done.set()  # as if it finished while the duplicate waited
+    bot.run_command(1, 1, command, "topic")
+    with first: pass
+    assert not answered and users.read("linkedin", [1])[0].uses_today() == 0
+
+def test_answer_is_cached_under_the_model_that_answered(redis, monkeypatch):
+    bot = make_engine(monkeypatch, LINKEDIN_BOT_TOKEN="1:a", LINKEDIN_STREAM_REPLIES="false").bots["linkedin"]
+    monkeypatch.setattr(bot, "tg", lambda method, payload, files=None, coalesce=False: None)
+    primary, fallback = routing.pick("standard")
+    def hedged(prompt, max_tokens=None, tier="standard", premium=False):
+        text = llm.Completion("from the fallback"); text.model = fallback; return text
+    monkeypatch.setattr(bot, "llm_routed", hedged)
+    bot.answer(1, "prompt topic", "topic")
+    responses.local_tier.clear()
+    assert responses.lookup("linkedin", bot.system_prompt, "prompt topic", "topic", primary).text is None
+    assert redis.execute(["LLEN", responses.cache_key(fallback, bot.system_prompt, "prompt topic", "topic")]) == 1
+
+def test_redelivered_updates_send_nothing(redis, monkeypatch):
+    bot = make_engine(monkeypatch, LINKEDIN_BOT_TOKEN="1:a", LINKEDIN_FREE_DAILY="0").bots["linkedin"]
+    sent = []
+    monkeypatch.setattr(bot, "tg", lambda method, payload, files=None, coalesce=False: sent.append(payload.get("text")))
+    command = next(iter(bot.profile.commands))
+    for update_id, text in ((1, "/start"), (2, f"{command} topic"), (3, f"{command} topic")):
+        update = {"update_id": update_id, "message": {"chat": {"id": 1}, "from": {"id": 1}, "text": text}}
+        bot.handle_update(update)
+        bot.handle_update(update)  # Telegram's redelivery
+    # /start once, and the paywall once per command: the second one comes from the local cache.
+    assert len(sent) == 3
+
+def asgi_post(app, body, query=b"", headers=()):
+    import asyncio
+    sent, chunks = [], [body[:10], body[10:]]  # the body arrives in two events
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+    async def send(event): sent.append(event)
+    scope = {"type": "http", "method": "POST", "query_string": query, "headers": list(headers)}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"]
+
+def test_asgi_routes_updates_and_sends_typing_for_llm_commands(monkeypatch):
+    import json
+    e = make_engine(monkeypatch, LINKEDIN_WEBHOOK_SECRET="a", CREATORS_WEBHOOK_SECRET="b", SECONDHAND_WEBHOOK_SECRET="c")
+    bot, calls = e.bots["creators"], []
+    monkeypatch.setattr(bot, "accept_update", lambda update: calls.append(("accept", update["update_id"])))
+    monkeypatch.setattr(bot, "tg", lambda method, payload, files=None, coalesce=False: calls.append((method, payload["action"])))
+    command = next(iter(bot.profile.commands))
+    update = {"update_id": 3, "message": {"chat": {"id": 1}, "from": {"id": 1}, "text": f"{command} topic"}}
+    app = e.asgi_app()
+    assert asgi_post(app, json.dumps(update).encode(), headers=[(b"x-telegram-bot-api-secret-token", b"b")]) == 200
+    assert sorted(calls) == [("accept", 3), ("sendChatAction", "typing")]
+    assert asgi_post(app, b"{}", b"bot=creators", [(b"x-telegram-bot-api-secret-token", b"a")]) == 403
+
+def test_asgi_refuses_oversized_bodies(monkeypatch):
+    from spacebotty import asgi
+    e = make_engine(monkeypatch)
+    monkeypatch.setattr(e.bots["linkedin"], "accept_update", lambda update: pytest.fail("handled"))
+    monkeypatch.setattr(asgi, "MAX_BODY", 16)
+    assert asgi_post(e.asgi_app(), b'{"update_id": 1, "message": {}}', b"bot=linkedin") == 413
+
+def test_prewarmed_presets_are_served_without_a_model_call(redis, monkeypatch):
+    from spacebotty import batch
+    bot = make_engine(monkeypatch, SECONDHAND_BOT_TOKEN="1:a").bots["secondhand"]
+    monkeypatch.setattr(batch, "BATCH_MODE", "off")
+    generated = []
+    def generate(prompt, max_tokens=None, model=None):
+        generated.append(model); text = llm.Completion(f"warm {len(generated)}"); text.usage = {"total_tokens": 9}; return text
+    monkeypatch.setattr(bot, "llm", generate)
+    assert bot.warm_presets(variants=2) == 6  # /optimize's "[paste ...]" preset is not a prompt
+    assert generated[0] == bot.model_for("/title")
+    sent = []
+    monkeypatch.setattr(bot, "tg", lambda method, payload, files=None, coalesce=False: sent.append(payload.get("text")))
+    monkeypatch.setattr(bot, "llm_routed", lambda *a, **kw: pytest.fail("generated"))
+    monkeypatch.setattr(bot, "llm_stream", lambda *a, **kw: pytest.fail("generated"))
+    bot.run_command(1, 1, "/title", "Nike sneakers 42 barely used")
+    assert sent[-1] in {f"warm {n}" for n in range(1, 7)}
+
+def test_command_table_routes_mentions_and_falls_back_to_help(monkeypatch):
+    bot = make_engine(monkeypatch, SECONDHAND_BOT_TOKEN="1:a", SECONDHAND_BOT_USERNAME="@SellerBot").bots["secondhand"]
+    handler, arg = bot.route("/TITLE@sellerbot  Nike sneakers ")
+    assert handler is bot.routes["/title"] and arg == "Nike sneakers"
+    assert bot.route("/status")[0] is bot.routes["/status"] and bot.route("/bulk")[0] is bot.routes["/bulk"]
+    assert bot.route("/title@otherbot x") == (None, "x")  # addressed to another bot in the group
+    assert bot.route("hello")[0] == bot._help and bot.route("/nope")[0] == bot._help
+    assert "/bulk" not in make_engine(monkeypatch).bots["linkedin"].routes
@@ -0,0 +1,36 @@
+import time
+from spacebotty import inflight, upstash
+
+def test_duplicate_is_running_and_user_is_capped(redis, monkeypatch):
+    monkeypatch.setattr(inflight, "USER_INFLIGHT_MAX", 2)
+    first = inflight.claim("bot", 1, "/post", "topic")
+    assert first.status == "claimed"
+    assert inflight.claim("bot", 1, "/post", " Topic ").status == "joined"
+    inflight._flights.clear()  # as seen from another instance
+    assert inflight.claim("bot", 1, "/post", "topic").status == "running"
+    second = inflight.claim("bot", 1, "/post", "other")
+    busy = inflight.claim("bot", 1, "/post", "third")
+    assert (second.status, busy.status, busy.running) == ("claimed", "busy", 2)
+    with first: pass
+    with second: pass
+    assert not redis.execute(["EXISTS", inflight.lease_key(1)])
+    inflight._flights.clear()
+
+def test_refused_attempts_do_not_keep_a_leaked_lease_alive(redis, monkeypatch):
+    monkeypatch.setattr(inflight, "USER_INFLIGHT_MAX", 1)
+    leaked = inflight.claim("bot", 1, "/post", "killed mid-request")  # never leaves
+    assert leaked.status == "claimed"
+    now = time.time()
+    for seconds in (60, 110):  # the user retries while the lease is still live
+        monkeypatch.setattr(time, "time", lambda: now + seconds)
+        assert inflight.claim("bot", 1, "/post", f"retry {seconds}").status == "busy"
+    monkeypatch.setattr(time, "time", lambda: now + inflight.INFLIGHT_TTL + 1)
+    assert inflight.claim("bot", 1, "/post", "after expiry").status == "claimed"
+    inflight._flights.clear()
+
+def test_unreachable_redis_fails_open(monkeypatch):
+    def down(path, payload): raise ConnectionError("upstash down")
+    monkeypatch.setattr(upstash, "_post", down)
+    flight = inflight.claim("bot", 1, "/post", "topic")
+    assert flight.status == "claimed" and not flight.redis
+    with flight: pass
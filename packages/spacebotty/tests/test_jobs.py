@@ -0,0 +1,93 @@
+import time
+from spacebotty import jobs
+
+def push(queue, *ids):
+    for i in ids: queue.push({"update_id": i}, uid=1)
+
+def test_jobs_past_the_budget_go_back_in_order(redis):
+    queue, handled = jobs.Queue("t"), []
+    push(queue, 1, 2, 3, 4)
+    def slow(update): handled.append(update["update_id"]); time.sleep(0.05)
+    assert jobs.drain(queue, slow, budget=0.07) == 2
+    assert handled == [1, 2] and queue.depth() == 2 and not redis.execute(["LLEN", queue.processing])
+    assert jobs.drain(queue, lambda u: handled.append(u["update_id"]), budget=None) == 2
+    assert handled == [1, 2, 3, 4]
+
+def test_jobs_of_a_killed_drain_are_reclaimed_after_the_visibility_timeout(redis, monkeypatch):
+    queue, handled = jobs.Queue("t"), []
+    push(queue, 1, 2)
+    assert len(queue.claim(2)) == 2  # the function is killed before acknowledging
+    assert jobs.drain(queue, lambda u: handled.append(u["update_id"])) == 0
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + jobs.JOB_VISIBILITY + 1)
+    assert jobs.drain(queue, lambda u: handled.append(u["update_id"])) == 2
+    assert handled == [1, 2] and not redis.execute(["EXISTS", queue.claims])
+
+def test_failed_job_is_retried_then_parked(redis, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 2)
+    queue = jobs.Queue("t")
+    push(queue, 1)
+    def fail(update): raise RuntimeError("boom")
+    jobs.drain(queue, fail); jobs.drain(queue, fail)
+    assert queue.depth() == 0 and redis.execute(["LLEN", queue.dead]) == 1
+    assert not redis.execute(["EXISTS", queue.claims])
+
+def cron_engine(monkeypatch):
+    from spacebotty import engine
+    from spacebotty.profiles import PROFILES
+    monkeypatch.setattr(jobs, "CRON_SECRET", "s3cret")
+    e = engine.Engine(PROFILES.values())
+    e.cron["ping"] = lambda: "pong"
+    return e
+
+def test_cron_get_needs_the_secret_over_http(monkeypatch):
+    import http.client, threading
+    from http.server import HTTPServer
+    server = HTTPServer(("127.0.0.1", 0), cron_engine(monkeypatch).http_handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    def get(headers):
+        conn = http.client.HTTPConnection(*server.server_address)
+        conn.request("GET", "/api/telegram?ping=1", headers=headers)
+        r = conn.getresponse(); return r.status, r.read()
+    try:
+        assert get({"Authorization": "Bearer s3cret"}) == (200, b"pong")
+        assert get({"Authorization": "Bearer wrong"})[0] == 401
+        assert get({})[0] == 401
+    finally:
+        server.shutdown(); server.server_close()
+
+def test_cron_get_needs_the_secret_over_asgi(monkeypatch):
+    import asyncio
+    app = cron_engine(monkeypatch).asgi_app()
+    def get(headers):
+        sent = []
+        async def receive(): return {"type": "http.request", "body": b""}
+        async def send(event): sent.append(event)
+        asyncio.run(app({"type": "http", "method": "GET", "query_string": b"ping=1", "headers": headers}, receive, send))
+        return sent[0]["status"], sent[1]["body"]
+    assert get([(b"authorization", b"Bearer s3cret")]) == (200, b"pong")
+    assert get([(b"authorization", b"Bearer wrong")])[0] == 401
+    assert get([])[0] == 401
+
+def test_transport_stats_are_served_to_cron(redis, monkeypatch):
+    import json
+    from spacebotty import transport
+    monkeypatch.setattr(transport, "_fast_counts", {"api.telegram.org": [5, 1]})
+    stats = json.loads(cron_engine(monkeypatch).cron["transport"]())
+    assert stats["api.telegram.org"] == {"requests": 5, "connections": 1, "reused": 4}
+
+def test_cache_stats_are_served_to_cron(redis, monkeypatch):
+    import json
+    from spacebotty import users
+    users.read("linkedin", [1]); users.read("linkedin", [1])
+    stats = json.loads(cron_engine(monkeypatch).cron["cache"]())
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["size"] == 1
+
+def test_response_cache_stats_are_served_to_cron(redis, monkeypatch):
+    import json
+    from spacebotty import responses
+    responses.store(responses.Lookup("linkedin", "llm:k"), "answer", 40)
+    responses.record_hit(responses.Lookup("linkedin", "llm:k", "answer", 40))
+    stats = json.loads(cron_engine(monkeypatch).cron["responses"]())
+    assert stats["linkedin"] == {"hits": 1, "misses": 1, "saved_tokens": 40, "hit_ratio": 0.5}
+    assert stats["creators"] == {"hit_ratio": 0.0}
@@ -0,0 +1,57 @@
+import pytest
+from spacebotty import outbox
+
+class Response:
+    def __init__(self, status_code=200, retry_after=None):
+        self.status_code, self.text, self.headers = status_code, "", {}
+        self.retry_after = retry_after
+    def json(self): return {"parameters": {"retry_after": self.retry_after}}
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    monkeypatch.setattr(outbox, "TELEGRAM_MAX_WAIT", 1.0)
+    monkeypatch.setattr(outbox, "_bots", {}); monkeypatch.setattr(outbox, "_chats", {}); monkeypatch.setattr(outbox, "_boxes", {})
+
+def test_chat_burst_then_rate_limited(monkeypatch):
+    monkeypatch.setattr(outbox, "TELEGRAM_CHAT_BURST", 2.0); monkeypatch.setattr(outbox, "TELEGRAM_CHAT_RATE", 0.1)
+    post = lambda payload: Response()
+    for _ in range(2): outbox.send("t", "sendMessage", {"chat_id": 1, "text": "hi"}, post)
+    with pytest.raises(outbox.RateLimited): outbox.send("t", "sendMessage", {"chat_id": 1, "text": "hi"}, post)
+    outbox.send("t", "sendMessage", {"chat_id": 2, "text": "hi"}, post)  # other chats are not held up
+    for _ in range(5): outbox.send("t", "editMessageText", {"chat_id": 1, "message_id": 1, "text": "hi"}, post)
+
+def test_429_on_an_edit_blocks_only_its_chat(monkeypatch):
+    monkeypatch.setattr(outbox, "TELEGRAM_RETRIES", 0)
+    limited = lambda payload: Response(429, retry_after=30)
+    with pytest.raises(outbox.RateLimited):
+        outbox.send("t", "editMessageText", {"chat_id": 1, "message_id": 1, "text": "hi"}, limited)
+    ok = lambda payload: Response()
+    assert outbox.send("t", "sendMessage", {"chat_id": 2, "text": "hi"}, ok).status_code == 200
+    assert outbox.send("t", "editMessageText", {"chat_id": 2, "message_id": 1, "text": "hi"}, ok).status_code == 200
+    for method in ("sendMessage", "editMessageText"):
+        with pytest.raises(outbox.RateLimited): outbox.send("t", method, {"chat_id": 1, "message_id": 1, "text": "hi"}, ok)
+
+def test_replies_queued_behind_a_waiting_message_are_merged_into_it(monkeypatch):
+    import threading, time
+    monkeypatch.setattr(outbox, "TELEGRAM_CHAT_BURST", 1.0); monkeypatch.setattr(outbox, "TELEGRAM_CHAT_RATE", 5.0)
+    posted = []
+    def post(payload): posted.append(payload["text"]); return Response()
+    outbox.send("t", "sendMessage", {"chat_id": 1, "text": "a"}, post)
+    def reply(payload, delay): time.sleep(delay); outbox.send("t", "sendMessage", payload, post, coalesce=True)
+    threads = [threading.Thread(target=reply, args=(payload, delay)) for payload, delay in (
+        ({"chat_id": 1, "text": "b"}, 0),
+        ({"chat_id": 1, "text": "c"}, 0.05),
+        ({"chat_id": 1, "text": "d", "reply_markup": {}}, 0.1))]  # buttons are never merged
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert posted == ["a", "b\n\nc", "d"]
+
+def test_long_message_is_split_with_buttons_on_the_last_part(monkeypatch):
+    from spacebotty import telegram
+    sent = []
+    monkeypatch.setattr(outbox, "send", lambda token, method, payload, post, coalesce=False: sent.append(payload))
+    text = "\n\n".join(f"paragraph {i} " + "x" * 1000 for i in range(6))
+    telegram.call("t", "sendMessage", {"chat_id": 1, "text": text, "reply_markup": {"inline_keyboard": []}})
+    assert len(sent) == 2 and all(len(p["text"]) <= outbox.MAX_MESSAGE_LEN for p in sent)
+    assert "reply_markup" not in sent[0] and "reply_markup" in sent[1]
+    assert sent[1]["text"].startswith("paragraph 4")
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+from spacebotty import polling
+
+class FakeBot:
+    name = "test"
+    def __init__(self, fail):
+        self.fail, self.handled = fail, []
+    def prefetch(self, uids): pass
+    def handle_update(self, update):
+        if self.fail.get(update["update_id"], 0) > 0:
+            self.fail[update["update_id"]] -= 1; raise RuntimeError("boom")
+        self.handled.append(update["update_id"])
+
+def message(update_id, chat):
+    return {"update_id": update_id, "message": {"chat": {"id": chat}, "from": {"id": chat}, "text": "hi"}}
+
+def refetch(p, batch): return [u for u in batch if u["update_id"] >= p.offset]
+
+def test_failure_in_one_chat_replays_only_that_chat():
+    bot = FakeBot({11: 1})
+    batch = [message(10, 1), message(11, 1), message(12, 2), message(13, 1), message(14, 2)]
+    with ThreadPoolExecutor(2) as pool:
+        p = polling.Poller(bot, pool)
+        assert not p.process(batch)
+        assert p.offset == 11 and sorted(bot.handled) == [10, 12, 14]  # 13 waits behind 11
+        assert p.process(refetch(p, batch))
+    assert p.offset == 15 and bot.handled[3:] == [11, 13]  # chat 2 is not sent again
+    assert not p.attempts and not p.completed
+
+def test_chat_order_holds_across_retries():
+    bot = FakeBot({2: 2})
+    batch = [message(1, 7), message(2, 7), message(3, 7), message(4, 8)]
+    with ThreadPoolExecutor(2) as pool:
+        p = polling.Poller(bot, pool)
+        while not p.process(refetch(p, batch) if p.offset else batch): pass
+    assert [i for i in bot.handled if i != 4] == [1, 2, 3] and bot.handled.count(4) == 1
+
+def test_update_is_skipped_after_poll_attempts(monkeypatch):
+    monkeypatch.setattr(polling, "POLL_ATTEMPTS", 2)
+    bot = FakeBot({5: 99})
+    with ThreadPoolExecutor(1) as pool:
+        p = polling.Poller(bot, pool)
+        assert not p.process([message(5, 1), message(6, 1)]) and p.offset == 5
+        assert p.process([message(5, 1), message(6, 1)])
+    assert p.offset == 7 and bot.handled == [6]
@@ -0,0 +1,67 @@
+import datetime, time
+from spacebotty import cache, quota, upstash, users
+
+BOT = "linkedin"
+
+def test_free_user_is_refused_past_the_limit_and_refunded(redis):
+    assert [bool(quota.reserve(BOT, 1, 2)) for _ in range(3)] == [True, True, False]
+    quota.reserve(BOT, 9, 2).refund()  # someone else's refund leaves this user alone
+    r = quota.reserve(BOT, 1, 2)
+    assert not r and r.used == 2
+    assert redis.execute(["HGET", users.key(BOT, 1), "n"]) == "2"
+
+def test_refund_gives_the_unit_back(redis):
+    with_reservation = quota.reserve(BOT, 1, 1)
+    with_reservation.refund()
+    assert redis.execute(["HGET", users.key(BOT, 1), "n"]) == "0"
+    assert quota.reserve(BOT, 1, 1)
+
+def test_premium_user_passes_whatever_the_count(redis):
+    redis.execute(["HSET", users.key(BOT, 1), "p", int(time.time()) + 3600, "d", users.today(), "n", 5])
+    r = quota.reserve(BOT, 1, 3)
+    assert r and r.premium and r.charged == 0
+    assert redis.execute(["HGET", users.key(BOT, 1), "n"]) == "5"
+
+def test_legacy_premium_user_is_folded_without_the_old_counter(redis):
+    redis.execute(["SETEX", users.legacy_premium_key(1), 3600, "1"])
+    redis.execute(["SET", f"user:1:uses:{datetime.date.today().isoformat()}", "6"])
+    assert users.read(BOT, [1])[0].uses_today() == 0
+    cache.local.clear()  # a cached premium user skips the EVAL outside an update
+    r = quota.reserve(BOT, 1, 3)
+    assert r and r.premium and r.charged == 0
+    assert redis.execute(["HMGET", users.key(BOT, 1), "n"]) == ["0"]
+    assert redis.execute(["EXISTS", users.legacy_premium_key(1)])  # still there for the other bots
+
+def test_every_bot_copies_the_shared_legacy_keys(redis):
+    redis.execute(["SETEX", users.legacy_premium_key(1), 3600, "1"])
+    redis.execute(["SET", f"user:2:uses:{datetime.date.today().isoformat()}", "2"])
+    for bot in ("linkedin", "creators"):
+        r = quota.reserve(bot, 1, 3)
+        assert r and r.premium
+        assert quota.reserve(bot, 2, 3) and not quota.reserve(bot, 2, 3)
+    assert users.migrate("secondhand") == 1 and users.read("secondhand", [1])[0].premium()
+
+def test_legacy_free_user_keeps_todays_uses(redis):
+    redis.execute(["SET", f"user:1:uses:{datetime.date.today().isoformat()}", "2"])
+    assert quota.reserve(BOT, 1, 3) and not quota.reserve(BOT, 1, 3)
+
+def test_migrate_folds_premium_flags(redis):
+    redis.execute(["SETEX", users.legacy_premium_key(1), 3600, "1"])
+    redis.execute(["SET", f"user:1:uses:{datetime.date.today().isoformat()}", "4"])
+    assert users.migrate(BOT) == 1
+    record = users.read(BOT, [1])[0]
+    assert record.premium() and record.uses_today() == 0
+
+def test_quota_and_premium_are_per_bot(redis):
+    users.set_premium("creators", 1, 3600)
+    assert [bool(quota.reserve("secondhand", 1, 2)) for _ in range(3)] == [True, True, False]
+    assert quota.reserve(BOT, 1, 2) and not quota.reserve(BOT, 1, 2).premium
+    assert users.read("creators", [1])[0].premium() and not users.read(BOT, [1])[0].premium()
+
+def test_unreachable_redis_fails_open_uncharged(monkeypatch):
+    def down(path, payload): raise ConnectionError("upstash down")
+    monkeypatch.setattr(upstash, "_post", down)
+    cache.local.clear()
+    r = quota.reserve(BOT, 1, 1)
+    assert r and r.charged == 0 and not r.premium
+    r.refund()  # nothing to give back, nothing sent
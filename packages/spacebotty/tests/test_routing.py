@@ -0,0 +1,20 @@
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+from spacebotty import routing
+
+def test_hedge_deadline_starts_when_the_primary_runs(monkeypatch):
+    monkeypatch.setattr(routing, "_pool", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(routing, "deadline", lambda model, kind: 0.2)
+    release = threading.Event()
+    routing._pool.submit(release.wait)  # the only worker is busy
+    threading.Timer(0.3, release.set).start()
+    started = []
+    def start(model): started.append(model); time.sleep(0.05); return model
+    assert routing.hedged("primary", "fallback", "total", start) == ("primary", "primary")
+    assert started == ["primary"]  # queued past the deadline, then answered within it
+
+def test_hedge_runs_the_fallback_past_the_deadline(monkeypatch):
+    monkeypatch.setattr(routing, "deadline", lambda model, kind: 0.05)
+    def start(model):
+        time.sleep(0.5 if model == "primary" else 0.01); return model
+    assert routing.hedged("primary", "fallback", "total", start) == ("fallback", "fallback")
@@ -0,0 +1,46 @@
+import datetime, time
+import pytest
+from spacebotty import cache, inflight, jobs, quota, standin, upstash, users
+from conftest import LuaRedis
+
+def serve(monkeypatch, r):
+    def reply(cmd):
+        try: return {"result": r.execute(cmd)}
+        except standin.RedisError as e: return {"error": str(e)}
+    monkeypatch.setattr(upstash, "_post", lambda path, payload: reply(payload) if not path.strip("/") else
+                        [reply(c) for c in payload])
+    cache.local.clear()
+
+def scenario(clock):
+    # Every Lua script, through the same calls the bots make.
+    out = []
+    upstash.command("SETEX", users.legacy_premium_key(1), 3600, "1")
+    upstash.command("SET", f"user:2:uses:{datetime.date.today().isoformat()}", "2")
+    for uid, cost in ((1, 2), (2, 1), (2, 1), (3, 4), (3, 1)):
+        r = quota.reserve("linkedin", uid, 3, cost, "/x")
+        out.append((bool(r), r.used, r.charged, r.premium))
+    r.release(1); r.refund(); quota.reserve("linkedin", 4, 3, 1, "/x").refund()
+    out.append(users.migrate("creators"))
+    flights = [inflight.claim("linkedin", 1, "/x", topic) for topic in ("a", "b", "c", "d")]
+    out.append([(f.status, f.running) for f in flights])
+    for f in flights: f.__exit__(None, None, None)
+    queue = jobs.Queue("parity")
+    for i in range(3): queue.push({"update_id": i}, uid=1)
+    out.append(queue.claim(2))
+    clock[0] += jobs.JOB_VISIBILITY + 1
+    out.append(queue.reclaim())
+    return out
+
+def test_native_twins_match_the_lua_scripts(monkeypatch):
+    lupa = pytest.importorskip("lupa")
+    monkeypatch.setattr(inflight, "USER_INFLIGHT_MAX", 2)
+    clock = [time.time()]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    runs = []
+    for r in (standin.MiniRedis(), LuaRedis(lupa)):
+        serve(monkeypatch, r)
+        clock[0] = 1_800_000_000.0
+        replies = scenario(clock)
+        runs.append((replies, r.data, sorted(r.expires)))
+    cache.local.clear()
+    assert runs[0] == runs[1]
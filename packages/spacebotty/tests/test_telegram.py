@@ -0,0 +1,26 @@
+import time
+from spacebotty import telegram
+
+class Response:
+    def __init__(self, result): self.result = result
+    def json(self): return {"ok": True, "result": self.result}
+
+def fake_tg(calls):
+    def tg(method, payload, files=None, coalesce=False):
+        calls.append((method, payload.get("text"))); return Response({"message_id": 1})
+    return tg
+
+def test_stream_is_cut_at_the_deadline():
+    calls, closed = [], []
+    def chunks():
+        try:
+            yield "first "; time.sleep(0.05); yield "second "; yield "never"
+        finally: closed.append(True)
+    text = telegram.stream_reply(fake_tg(calls), 1, chunks(), interval=10, deadline=0.02)
+    assert text == "first second" and text.cut and closed
+    assert calls[-1][1].endswith(telegram.CUT_NOTE.strip())
+
+def test_stream_without_deadline_is_whole():
+    calls = []
+    text = telegram.stream_reply(fake_tg(calls), 1, iter(["a ", "b"]), deadline=0)
+    assert text == "a b" and not text.cut and calls[-1] == ("editMessageText", "a b")
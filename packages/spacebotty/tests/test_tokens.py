@@ -0,0 +1,19 @@
+import pytest
+from spacebotty import tokens
+from spacebotty.engine import Command
+
+@pytest.fixture
+def estimated(monkeypatch):
+    monkeypatch.setattr(tokens, "_encoding", False)  # as without tiktoken
+
+@pytest.mark.parametrize("text", ["x" * 3000, "intro words " + "x" * 3000, "word " * 1000, "a b " + "y" * 3000 + " end"],
+                         ids=["no spaces", "long tail", "words", "long middle"])
+def test_fit_stays_within_budget_and_keeps_both_ends(estimated, text):
+    cut = tokens.fit(text, 300)
+    assert 150 < tokens.estimate(cut) <= 300
+    head, tail = cut.split(tokens.ELLIPSIS)
+    assert text.startswith(head) and text.rstrip().endswith(tail.rstrip())
+
+def test_commands_do_not_load_the_tokenizer(monkeypatch):
+    monkeypatch.setattr(tokens, "encoding", lambda: pytest.fail("tokenizer loaded at import"))
+    Command("topic", "usage", "Write about {topic}.")
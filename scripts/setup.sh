@@ -19,8 +19,12 @@ function health_check() {
 function set_webhook() {
   local token="$1"; shift
   local url="$1"; shift
-  echo "→ Setting webhook for ${url}"
-  curl -s "https://api.telegram.org/bot${token}/setWebhook?url=${url}/api/telegram" | jq . || true
+  local bot="$1"; shift
+  # Single engine deployment (apps/engine): one URL, bots told apart by ?bot=<name>.
+  local hook="${url}/api/telegram"
+  if [[ -n "${ENGINE_URL:-}" ]]; then hook="${ENGINE_URL}/api/telegram?bot=${bot}"; fi
+  echo "→ Setting webhook for ${hook}"
+  curl -s "https://api.telegram.org/bot${token}/setWebhook" --data-urlencode "url=${hook}" | jq . || true
 }
 
 function get_info() {
@@ -33,6 +37,9 @@ echo "=== Checking required variables ==="
 require_var LINKEDIN_BOT_TOKEN
 require_var CREATORS_BOT_TOKEN
 require_var SECONDHAND_BOT_TOKEN
+if [[ -n "${ENGINE_URL:-}" ]]; then
+  LINKEDIN_URL="${ENGINE_URL}"; CREATORS_URL="${ENGINE_URL}"; SECONDHAND_URL="${ENGINE_URL}"
+fi
 require_var LINKEDIN_URL
 require_var CREATORS_URL
 require_var SECONDHAND_URL
@@ -40,19 +47,19 @@ require_var SECONDHAND_URL
 echo ""
 echo "=== LINKEDIN ==="
 health_check "${LINKEDIN_URL}"
-set_webhook "${LINKEDIN_BOT_TOKEN}" "${LINKEDIN_URL}"
+set_webhook "${LINKEDIN_BOT_TOKEN}" "${LINKEDIN_URL}" linkedin
 get_info "${LINKEDIN_BOT_TOKEN}"
 
 echo ""
 echo "=== CREATORS ==="
 health_check "${CREATORS_URL}"
-set_webhook "${CREATORS_BOT_TOKEN}" "${CREATORS_URL}"
+set_webhook "${CREATORS_BOT_TOKEN}" "${CREATORS_URL}" creators
 get_info "${CREATORS_BOT_TOKEN}"
 
 echo ""
 echo "=== SECONDHAND ==="
 health_check "${SECONDHAND_URL}"
-set_webhook "${SECONDHAND_BOT_TOKEN}" "${SECONDHAND_URL}"
+set_webhook "${SECONDHAND_BOT_TOKEN}" "${SECONDHAND_URL}" secondhand
 get_info "${SECONDHAND_BOT_TOKEN}"
 
 echo ""